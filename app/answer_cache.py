@@ -0,0 +1,70 @@
+# app/answer_cache.py
+import threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from app.config import ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+from app import metrics
+
+class AnswerCache:
+    """Caché LRU con TTL, compartida por todas las sesiones del proceso.
+       max_entries <= 0 la desactiva (todo es miss y no guarda nada)."""
+
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return False, None
+            ts, value = item
+            if self.ttl > 0 and time.monotonic() - ts > self.ttl:
+                del self._data[key]
+                self.expired += 1
+                self.misses += 1
+                return False, None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        found, value = self.get(key)
+        if metrics.enabled():  # p. ej. answer_cache.answer.hit / answer_cache.compose.miss
+            kind = key[0] if isinstance(key, tuple) and key else "other"
+            metrics.incr(f"answer_cache.{kind}.{'hit' if found else 'miss'}")
+        if found:
+            return value
+        value = compute()  # fuera del lock: dos sesiones pueden calcular lo mismo a la vez
+        self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"size": len(self._data), "max_entries": self.max_entries, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "expired": self.expired, "hit_rate": (self.hits / total) if total else 0.0}
+
+# Instancia del proceso: respuestas de answer_with_sources y de la composición.
+# retrieval la vacía cada vez que publica índices nuevos.
+ANSWER_CACHE = AnswerCache()
@@ -0,0 +1,30 @@
+# app/build_index.py
+"""Arma los índices fuera de la app y los publica como índice compartido.
+
+    python -m app.build_index --shared data/.index_shared [--no-cache]
+
+Los workers (Streamlit o app.server) que corren con GOBI_INDEX_SHARED_DIR apuntando a
+esa carpeta abren el build con mmap en vez de armar su propia copia. Volver a correrlo
+publica un build nuevo; los procesos que ya arrancaron siguen con el anterior hasta que
+reinician.
+"""
+import argparse
+
+from app.config import INDEX_SHARED_DIR
+from app.index_store import snapshot_key, save_shared
+from app.retrieval import init_indexes, index_version
+
+def main():
+    ap = argparse.ArgumentParser(description="Construye el índice compartido de GOBI")
+    ap.add_argument("--shared", default=INDEX_SHARED_DIR or "data/.index_shared",
+                    help="carpeta de salida (la misma que GOBI_INDEX_SHARED_DIR)")
+    ap.add_argument("--no-cache", action="store_true", help="ignora el snapshot y re-extrae todo")
+    args = ap.parse_args()
+
+    doc_index, kb_index = init_indexes(use_cache=not args.no_cache, use_shared=False)
+    index_version(doc_index, kb_index)  # la misma versión en todos los procesos
+    out = save_shared(snapshot_key(), doc_index, kb_index, args.shared)
+    print(f"[INFO] Índice compartido: {len(doc_index['chunks'])} chunks en {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# app/compose.py
+# Composición de respuestas (resumen, parafraseo, pasos, fallback). Sin dependencias de UI:
+# la usan el motor (app.engine), la app de Streamlit y el servicio HTTP.
+import re
+import random
+from typing import Iterator
+
+import numpy as np
+import scipy.sparse as sp
+
+from app.config import SUMMARY_DUP_THRESHOLD
+from app.lazy import lazy_import
+from app.textrules import RuleSet, keyword_set
+
+_sk_text = lazy_import("sklearn.feature_extraction.text")
+
+# --- Split de oraciones ---
+_SENT_SPLIT = re.compile(r"(?<=[\.!?])\s+")
+
+def split_sentences(text: str) -> list[str]:
+    s = re.sub(r"\s+", " ", text or "").strip()
+    return [t.strip() for t in _SENT_SPLIT.split(s) if t.strip()]
+
+# --- Resumen extractivo (TF-IDF) ---
+_SENT_KEY = re.compile(r"\W+")
+
+def _distinct(sents: list[str]) -> list[int]:
+    """Índices de la primera aparición de cada oración (sin mayúsculas ni puntuación)."""
+    seen, keep = set(), []
+    for i, s in enumerate(sents):
+        key = _SENT_KEY.sub(" ", s.lower()).strip()
+        if key not in seen:
+            seen.add(key)
+            keep.append(i)
+    return keep
+
+def _drop_near_dups(X, thr: float = SUMMARY_DUP_THRESHOLD) -> list[int]:
+    """Filas de X (l2) que no tienen coseno >= thr con una fila anterior ya conservada."""
+    if thr <= 0 or X.shape[0] < 2:
+        return list(range(X.shape[0]))
+    S = X @ X.T
+    S = S.toarray() if sp.issparse(S) else np.asarray(S)
+    keep: list[int] = []
+    for i in range(X.shape[0]):
+        if not keep or S[i, keep].max() < thr:
+            keep.append(i)
+    return keep
+
+def summarize_text(text: str, max_sent: int = 5, vectors=None) -> str:
+    """Las `max_sent` oraciones más centrales (similitud con el resto del texto), en su
+       orden original. `vectors(sents)` da una fila TF-IDF l2 por oración con el IDF del
+       corpus, precalculada al indexar (retrieval.sentence_vectors); si no se pasa o
+       devuelve None se ajusta un TF-IDF local sobre el propio texto.
+       Antes de puntuar se quitan las oraciones repetidas y casi repetidas (rótulos como
+       "ver figura siguiente"), y la centralidad no cuenta la similitud de cada oración
+       consigo misma: así una oración repetida no llena el resumen."""
+    sents = split_sentences(text)
+    if len(sents) <= max_sent:
+        return text
+    idx = _distinct(sents)
+    sents = [sents[i] for i in idx]
+    if len(sents) <= max_sent:
+        return " ".join(sents)
+    X = vectors(sents) if vectors is not None else None
+    if X is not None:
+        idx = _drop_near_dups(X)
+        X = X[idx]
+        self_sim = np.asarray(X.multiply(X).sum(axis=1)).ravel() if sp.issparse(X) else (X * X).sum(axis=1)
+        scores = np.asarray(X @ np.asarray(X.sum(axis=0)).ravel()).ravel() - self_sim
+        top = sorted(idx[i] for i in np.argsort(-scores, kind="stable")[:max_sent])
+        return " ".join(sents[i] for i in top)
+    vect = _sk_text.TfidfVectorizer(strip_accents="unicode", ngram_range=(1, 2), min_df=1, max_df=0.9)
+    X = vect.fit_transform(sents)
+    idx = _drop_near_dups(X)
+    scores = (X[idx].power(2).sum(axis=1)).A1
+    top = sorted(idx[i] for i in scores.argsort()[::-1][:max_sent])  # conserva orden original
+    return " ".join(sents[i] for i in top)
+
+def summarize_to_words(text: str, max_words: int = 300, max_sent: int = 5, vectors=None) -> str:
+    s = summarize_text(text, max_sent=max_sent, vectors=vectors)
+    w = s.split()
+    return s if len(w) <= max_words else " ".join(w[:max_words]) + "…"
+
+# --- Stopwords ES (única) ---
+STOP_ES = {
+    "el","la","los","las","un","una","unos","unas","de","del","al","a","en","y","o","u",
+    "que","con","por","para","como","es","son","ser","estar","haber","no","sí","si","se",
+    "mi","mis","tu","tus","su","sus","lo"
+}
+
+# --- Parafraseo ligero (fusión de reglas) ---
+_REWRITE = [
+    (r"\bpor lo tanto\b", "en consecuencia"),
+    (r"\bes decir\b", "o sea"),
+    (r"\bpor ejemplo\b", "a modo de ejemplo"),
+    (r"\bmediante\b", "a través de"),
+    (r"\bbarra de herramientas\b", "barra superior"),
+    (r"\bverificaci[oó]n de documentos electr[oó]nicos firmados digitalmente\b", "validación de documentos firmados"),
+    (r"\bse (debe|deben)\b", "debe"),
+    (r"\bcon el cual\b", "con lo que"),
+    (r"\bmediante el cual\b", "con lo que"),
+]
+
+_REWRITE_RULES = RuleSet(_REWRITE, re.IGNORECASE)
+
+def light_rephrase_es(text: str) -> str:
+    return _REWRITE_RULES.sub(text)
+
+# --- Texto a pasos/bullets ---
+_STEP_CLEANUP = RuleSet([
+    (r"^\s*(Paso\s*\d+[:\-]?)\s*", ""),
+    (r"\bse debe\b", "debe"),
+    (r"\busted\b", ""),
+], re.I)
+
+_STEP_KEYWORDS = ("paso","clic","seleccione","ingrese","verifique","enviar","derivar","mesa de partes","glosa")
+
+def iter_steps(text: str, max_items: int = 6, keywords: tuple[str, ...] = _STEP_KEYWORDS) -> Iterator[str]:
+    """Viñetas de to_steps una a una (desde la segunda, con el salto de línea adelante)."""
+    sents = split_sentences(text)
+    kw = keyword_set(tuple(keywords))
+    kept = [s for s in sents if kw.search(s.lower())]
+    if not kept:
+        kept = sents[:max_items]
+    for k, s in enumerate(kept[:max_items]):
+        yield ("\n" if k else "") + "• " + _STEP_CLEANUP.sub(s).strip().capitalize()
+
+def to_steps(text: str, max_items: int = 6, keywords: tuple[str, ...] = _STEP_KEYWORDS) -> str:
+    return "".join(iter_steps(text, max_items, keywords))
+
+# --- Confirmación corta ---
+CONFIRM_PAT = re.compile(
+    r"^\s*¿?\s*(eso|esa|ese|este|esta)?\s*(es|era|sería)\s*(el|la)?\s*(paso|sección|apartado)\s*\d*\s*\?\s*$",
+    re.IGNORECASE,
+)
+
+def is_confirmation(q: str) -> bool:
+    return bool(CONFIRM_PAT.search((q or "").strip()))
+
+# --- Fallback empático/creativo ---
+def _keywords_es(text: str, limit: int = 6) -> list[str]:
+    t = re.sub(r"[^\wáéíóúüñÁÉÍÓÚÜÑ ]", " ", (text or "").lower())
+    toks = [w for w in t.split() if w not in STOP_ES and len(w) > 2]
+    return toks[:limit]
+
+FALLBACK_BANK = {
+    "neutral": [
+        "Entiendo tu situación. Ahora mismo no tengo información suficiente para responder con precisión.",
+        "Gracias por contarlo. Por el momento no cuento con datos concretos para dar una respuesta segura.",
+        "Quisiera ayudarte mejor, pero no tengo información disponible en este instante.",
+    ],
+    "positivo": [
+        "Gracias por la confianza. Aún no tengo datos concretos para responder con precisión.",
+        "Me alegra apoyar; de momento no tengo la información exacta a mano.",
+    ],
+    "triste": [
+        "Siento que estés pasando por esto. Ahora mismo no tengo la información necesaria para darte una respuesta certera.",
+        "Lamento la dificultad; no cuento con datos suficientes en este momento.",
+    ],
+    "enojado": [
+        "Entiendo la frustración. Por ahora no tengo información disponible para resolverlo con certeza.",
+        "Veo lo molesto que es; en este instante no dispongo de los datos para responder con precisión.",
+    ],
+    "ansioso": [
+        "Tranquilo, vamos paso a paso. Por ahora no tengo la información necesaria.",
+        "Voy a ayudarte; de momento no cuento con datos suficientes para una respuesta segura.",
+    ],
+}
+
+CLARIFY_BANK = [
+    "¿Podrías especificar el trámite o módulo involucrado?",
+    "¿Qué error exacto ves o en qué paso te quedas?",
+    "¿Desde cuándo te ocurre y en qué entorno (web, móvil, intranet)?",
+    "Si tuvieras un número de expediente o área, ¿cuál sería?",
+]
+
+def creative_fallback(user_text: str, emotion_es: str = "neutral") -> str:
+    base_pool = FALLBACK_BANK.get(emotion_es, FALLBACK_BANK["neutral"])
+    base = random.choice(base_pool)
+    kws = _keywords_es(user_text)
+    if kws:
+        base += f" He recogido esto de tu mensaje: {', '.join(kws[:3])}."
+    followups = " ".join(random.sample(CLARIFY_BANK, k=2))
+    return f"{base} {followups}"
+
+# --- “Respuesta humana” (resumen + parafraseo o pasos) ---
+# Corta después de cada fin de oración, dejando el espacio con la oración siguiente
+_PIECE_SPLIT = re.compile(r"(?<=[\.!?])(?=\s)")
+
+def iter_human_answer(raw_text: str, mode: str = "auto", max_words: int = 300,
+                      vectors=None) -> Iterator[str]:
+    """make_human_answer por partes (oraciones o viñetas), para mostrarla mientras se
+       compone: "".join(iter_human_answer(...)) == make_human_answer(...). El resumen
+       necesita puntuar todas las oraciones antes de elegir; el parafraseo y las viñetas
+       se hacen a medida que se piden."""
+    if not raw_text or not raw_text.strip():
+        return
+    if mode == "steps":
+        yield from iter_steps(raw_text)
+        return
+    core = summarize_to_words(raw_text, max_words=max_words, vectors=vectors)
+    for piece in _PIECE_SPLIT.split(core):  # las reglas de parafraseo no cruzan oraciones
+        yield light_rephrase_es(piece)
+
+def make_human_answer(raw_text: str, mode: str = "auto", max_words: int = 300, vectors=None) -> str:
+    return "".join(iter_human_answer(raw_text, mode=mode, max_words=max_words, vectors=vectors))
+
+_COMPRESS_RULES = RuleSet([
+    (r"\bpor lo tanto\b", "en consecuencia"),
+    (r"\bes decir\b", "o sea"),
+    (r"\bmediante\b", "a través de"),
+    (r"\bbarra de herramientas\b", "barra superior"),
+    (r"\s{2,}", " "),
+], re.I)
+
+def compress_rules(text: str) -> str:
+    """Pequeña limpieza + recorte de oraciones demasiado largas para evitar eco."""
+    out = _COMPRESS_RULES.sub(text)
+    pieces = []
+    for s in split_sentences(out):
+        pieces.append(s if len(s) < 240 else s[:240].rstrip() + "…")
+    return " ".join(pieces)
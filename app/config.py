@@ -1,5 +1,7 @@
 
 # App configuration for GOBI (Streamlit-only)
+import os
+
 DOCS_DIR = "data/docs"
 KB_CSV = "data/knowledge/chatbot_dato1.csv"  # You can replace later or leave empty
 MAX_WORDS = 300
@@ -7,6 +9,118 @@ TOP_K = 4
 CHUNK_SIZE = 1200
 CHUNK_OVERLAP = 200
 
+# KB: campo interno -> columna del CSV (un campo sin columna queda vacío). Se puede
+# sobrescribir con GOBI_KB_COLUMNS="pregunta=question,respuesta=answer"
+KB_COLUMNS = {
+    "pregunta": "pregunta_usuario",
+    "intencion": "intencion",
+    "emocion": "emocion_detectada",
+    "respuesta": "respuesta_tecnica",
+    "respuesta_emocional": "respuesta_emocional",
+    "link": "link",
+}
+KB_COLUMNS.update(kv.strip().split("=", 1) for kv in os.environ.get("GOBI_KB_COLUMNS", "").split(",") if "=" in kv)
+# Similitud mínima (coseno) con la pregunta más parecida para usar la respuesta de la KB.
+# 0 = sin umbral (basta con compartir algún término, como antes)
+KB_MIN_SCORE = float(os.environ.get("GOBI_KB_MIN_SCORE", "0"))
+# Emociones detectadas (app.emotion_ml) con las que se usa respuesta_emocional
+KB_EMOTIONAL_LABELS = ("enojado", "triste", "ansioso", "disgusto", "negativo")
+
+# Ranking de KB y documentos: "tfidf" (coseno) o "bm25". "lsa" (solo documentos; la KB
+# sigue con tfidf) busca por similitud semántica en un espacio LSA denso con índice IVF
+RETRIEVAL_MODE = os.environ.get("GOBI_RETRIEVAL_MODE", "tfidf")
+BM25_K1 = 1.5
+BM25_B = 0.75
+# LSA: componentes del SVD, recall@k buscado contra la búsqueda exacta (ajusta cuántas
+# listas IVF se recorren) y desde cuántos chunks conviene el IVF
+LSA_DIM = int(os.environ.get("GOBI_LSA_DIM", "128"))
+LSA_TARGET_RECALL = float(os.environ.get("GOBI_LSA_RECALL", "0.95"))
+LSA_IVF_MIN_ROWS = 2000
+
+# Ingesta: encabezados y pies. Una línea entre las BOILERPLATE_EDGE_LINES primeras o
+# últimas de la página que se repite así en al menos BOILERPLATE_MIN_SHARE de las
+# primeras BOILERPLATE_SAMPLE_PAGES páginas del documento (y en no menos de
+# BOILERPLATE_MIN_PAGES) queda solo en la primera. Solo la muestra se retiene en memoria.
+# BOILERPLATE_MIN_PAGES = 0: no se quita nada
+BOILERPLATE_MIN_PAGES = 2
+BOILERPLATE_MIN_SHARE = float(os.environ.get("GOBI_BOILERPLATE_MIN_SHARE", "0.5"))
+BOILERPLATE_EDGE_LINES = 3
+BOILERPLATE_SAMPLE_PAGES = 20
+# Chunks casi duplicados (Jaccard de shingles, estimado con MinHash) se colapsan en uno
+# que guarda todas sus ubicaciones. 0 = desactivado
+NEAR_DUP_THRESHOLD = float(os.environ.get("GOBI_NEAR_DUP_THRESHOLD", "0.8"))
+MINHASH_PERM = 64
+# Resumen extractivo: una oración igual (normalizada) o casi igual (coseno TF-IDF >=
+# SUMMARY_DUP_THRESHOLD) a otra anterior del mismo texto se descarta antes de puntuar
+SUMMARY_DUP_THRESHOLD = float(os.environ.get("GOBI_SUMMARY_DUP_THRESHOLD", "0.9"))
+
+# Procedimientos numerados de los instructivos: similitud mínima (coseno) para
+# responder un "cómo hago..." directamente con los pasos indexados
+PROCEDURE_MIN_SCORE = 0.3
+
+# Snapshot en disco de los índices (se invalida si cambian docs, KB o chunking).
+# Deja "" para desactivarlo.
+INDEX_CACHE_DIR = "data/.index_cache"
+
+# Índice compartido entre procesos (varios workers en un mismo nodo): directorio que
+# arma `python -m app.build_index --shared DIR`. Los arreglos se abren con mmap de solo
+# lectura, así el page cache guarda una sola copia física. "" = cada proceso arma el suyo.
+INDEX_SHARED_DIR = os.environ.get("GOBI_INDEX_SHARED_DIR", "")
+
+# Índice compacto (menos memoria por proceso): pesos float32, conteos int32 y términos
+# compartidos. Con INDEX_HASH_BITS > 0 además reemplaza el vocabulario por 2**bits
+# columnas de hash (no guarda términos; colisiones posibles, el ranking puede variar).
+INDEX_COMPACT = os.environ.get("GOBI_INDEX_COMPACT", "0") == "1"
+INDEX_HASH_BITS = int(os.environ.get("GOBI_INDEX_HASH_BITS", "0"))
+
+# Extracción en paralelo: procesos para leer documentos (1 = en serie).
+# Con varios archivos pendientes se reparte por archivo; con uno solo, por páginas.
+EXTRACT_WORKERS = int(os.environ.get("GOBI_EXTRACT_WORKERS", "1"))
+PDF_PAGES_PER_TASK = 8
+
+# OCR (GOBI_ENABLE_OCR=1): solo las páginas con menos de OCR_MIN_CHARS caracteres de texto
+# (escaneadas), en OCR_WORKERS procesos. El texto reconocido se guarda en OCR_CACHE_DIR
+# por hash del contenido de la página, así un reindexado no repite el OCR.
+OCR_ENABLED = os.environ.get("GOBI_ENABLE_OCR") == "1"
+OCR_DPI = int(os.environ.get("GOBI_OCR_DPI", "200"))
+OCR_WORKERS = int(os.environ.get("GOBI_OCR_WORKERS", "2"))
+OCR_LANG = "spa"
+OCR_MIN_CHARS = 20
+OCR_CACHE_DIR = "data/.ocr_cache"
+
+# Emociones: micro-batching entre sesiones (EMO_BATCH_MAX = 1 lo desactiva)
+EMO_BATCH_MAX = 16
+EMO_BATCH_WAIT_MS = 10
+
+# Caché de respuestas compartida entre sesiones (LRU + TTL en segundos; tamaño 0 la desactiva)
+ANSWER_CACHE_SIZE = 512
+ANSWER_CACHE_TTL = 600
+
+# Historial del chat por sesión: últimos HISTORY_WINDOW mensajes en memoria; los más
+# viejos van a un JSONL en HISTORY_SPILL_DIR ("" = carpeta temporal del sistema) y se
+# leen de a HISTORY_PAGE cuando se piden
+HISTORY_WINDOW = int(os.environ.get("GOBI_HISTORY_WINDOW", "40"))
+HISTORY_PAGE = 20
+HISTORY_SPILL_DIR = os.environ.get("GOBI_HISTORY_DIR", "")
+
+# Cada cuántos segundos revisar DOCS_DIR para ingesta incremental (0 = sin watcher)
+DOCS_WATCH_INTERVAL = 0
+
+# Servicio HTTP (python -m app.server): hilos para el pipeline y peticiones en vuelo máximas
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8000
+SERVER_WORKERS = 4
+SERVER_MAX_PENDING = 64
+
+# Arranque rápido: el motor carga los índices en un hilo de fondo (la UI ya responde y el
+# smalltalk no los espera) y recién después los modelos de emoción. 0 = carga en línea.
+# `python -m app.startup` falla si importar app.engine pasa STARTUP_IMPORT_BUDGET_MS
+FAST_START = os.environ.get("GOBI_FAST_START", "1") == "1"
+STARTUP_IMPORT_BUDGET_MS = int(os.environ.get("GOBI_IMPORT_BUDGET_MS", "600"))
+
+# Métricas por etapa: "" (apagadas), "memory", "json" o "memory,json"
+METRICS_SINKS = os.environ.get("GOBI_METRICS", "")
+
 # Public raw URL to serve documents when deployed (optional)
 # Example: "https://raw.githubusercontent.com/<USER>/<REPO>/main/data/docs"
 PUBLIC_DOC_BASE_URL = ""
@@ -0,0 +1,137 @@
+# app/dedup.py
+import math, re
+import unicodedata
+from collections import deque
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+from app.lazy import lazy_import
+
+_sk_utils = lazy_import("sklearn.utils")
+
+# Limpieza de repeticiones al indexar.
+#  - Encabezados y pies (logo, título del manual, "Página 3 de 20"): líneas de los bordes
+#    de la página (las primeras y últimas `edge_lines`) que se repiten en los bordes de
+#    una fracción de las primeras `sample_pages` páginas del documento. Solo esa muestra
+#    queda en memoria; el resto de las páginas se filtra a medida que llega. La primera
+#    aparición queda y las siguientes se van; una línea repetida en medio de la página
+#    (un paso que se repite en varios procedimientos) no se toca.
+#  - Chunks casi duplicados (párrafos estándar que se repiten entre instructivos): firma
+#    MinHash de los shingles de palabras de cada chunk; LSH por bandas da los pares
+#    candidatos y se confirman con la fracción de componentes iguales de la firma (que
+#    estima el Jaccard).
+
+_DIGITS = re.compile(r"\d+")
+_MIN_LINE_CHARS = 8  # "1.", "Aceptar": demasiado cortas para decir que son repetición
+
+def _line_key(line: str) -> Optional[str]:
+    s = unicodedata.normalize("NFD", line).encode("ascii", "ignore").decode("ascii")
+    s = " ".join(s.lower().split())
+    if len(s) < _MIN_LINE_CHARS:
+        return None
+    return _DIGITS.sub("#", s)  # "Página 2 de 9" y "Página 3 de 9" son la misma línea
+
+def _edge_keys(lines: List[str], edge_lines: int) -> Dict[int, str]:
+    """{índice de línea: clave} de las primeras y últimas `edge_lines` líneas no vacías."""
+    idx = [i for i, ln in enumerate(lines) if ln.strip()]
+    edge = idx if len(idx) <= 2 * edge_lines else idx[:edge_lines] + idx[-edge_lines:]
+    out = {}
+    for i in edge:
+        k = _line_key(lines[i])
+        if k is not None:
+            out[i] = k
+    return out
+
+def _drain(q: deque) -> Iterator:
+    """Vacía la cola al recorrerla (lo ya entregado no queda retenido)."""
+    while q:
+        yield q.popleft()
+
+def strip_repeated_lines(pages: Iterable[Tuple[Optional[int], str]], min_pages: int = 2,
+                         min_share: float = 0.5, edge_lines: int = 3,
+                         sample_pages: int = 20) -> Iterator[Tuple[Optional[int], str]]:
+    """Quita los encabezados y pies repetidos: una línea de los bordes de la página que
+       aparece en los bordes de al menos max(min_pages, min_share * páginas de la
+       muestra) de las primeras `sample_pages` páginas se deja solo en la primera, en
+       todo el documento. Se retienen como mucho `sample_pages` páginas a la vez. Los
+       trozos sin página (TXT, DOCX) pasan sin tocar; min_pages <= 0 desactiva la limpieza."""
+    if min_pages <= 0:
+        yield from pages
+        return
+    it = iter(pages)
+    head = deque(islice(it, max(1, sample_pages)))
+    edges = [_edge_keys(text.split("\n"), edge_lines) if page is not None else {} for page, text in head]
+    n_pages = sum(page is not None for page, _ in head)
+    count: Dict[str, int] = {}
+    for e in edges:
+        for k in set(e.values()):
+            count[k] = count.get(k, 0) + 1
+    need = max(min_pages, math.ceil(min_share * n_pages))
+    boiler = {k for k, c in count.items() if c >= need}
+    del count, edges
+
+    seen = set()
+    for page, text in chain(_drain(head), it):
+        if page is None or not boiler:
+            yield page, text
+            continue
+        lines = text.split("\n")
+        e = _edge_keys(lines, edge_lines)
+        drop = {i for i, k in e.items() if k in boiler and k in seen}
+        seen.update(k for k in e.values() if k in boiler)
+        yield page, "\n".join(ln for i, ln in enumerate(lines) if i not in drop) if drop else text
+
+# ---------------------- MinHash ----------------------
+_PRIME = (1 << 61) - 1
+
+def _perms(n_perm: int, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    rnd = np.random.default_rng(seed)
+    return (rnd.integers(1, 1 << 32, size=n_perm, dtype=np.uint64),
+            rnd.integers(0, 1 << 32, size=n_perm, dtype=np.uint64))
+
+def minhash_signatures(texts: List[str], n_perm: int = 64, shingle: int = 4) -> np.ndarray:
+    """Firma (len(texts) × n_perm, uint32) de los shingles de `shingle` palabras. Los
+       hashes son murmurhash3 con semilla fija: las firmas no dependen del proceso."""
+    a, b = _perms(n_perm)
+    murmurhash3_32 = _sk_utils.murmurhash3_32
+    out = np.full((len(texts), n_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for i, t in enumerate(texts):
+        w = t.split()
+        sh = {" ".join(w[j:j + shingle]) for j in range(max(1, len(w) - shingle + 1))}
+        h = np.array([murmurhash3_32(s, seed=7, positive=True) for s in sh if s], dtype=np.uint64)
+        if len(h):
+            # (a*h + b) mod p, con a, h < 2^32: el producto cabe en uint64
+            out[i] = (((np.outer(h, a) + b) % _PRIME) & 0xFFFFFFFF).min(axis=0)
+    return out
+
+def near_duplicate_groups(sigs: np.ndarray, threshold: float = 0.8,
+                          bands: int = 16) -> np.ndarray:
+    """Para cada fila, la fila representante de su grupo de casi duplicados (la menor
+       del grupo; ella misma si no tiene). Pares candidatos: filas con alguna banda de
+       la firma idéntica; se unen si su Jaccard estimado llega a `threshold`."""
+    n, n_perm = sigs.shape
+    parent = np.arange(n)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    r = n_perm // bands
+    for band in range(bands):
+        block = np.ascontiguousarray(sigs[:, band * r:(band + 1) * r])
+        _, inv = np.unique(block.view(np.dtype((np.void, block.dtype.itemsize * r))).ravel(),
+                           return_inverse=True)
+        order = np.argsort(inv, kind="stable")
+        bounds = np.flatnonzero(np.diff(inv[order])) + 1
+        for grp in np.split(order, bounds):
+            if len(grp) < 2:
+                continue
+            first = grp[0]
+            for j in grp[1:]:
+                a, b = find(first), find(j)
+                if a != b and np.mean(sigs[first] == sigs[j]) >= threshold:
+                    parent[max(a, b)] = min(a, b)
+    return np.array([find(i) for i in range(n)])
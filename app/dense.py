@@ -0,0 +1,137 @@
+# app/dense.py
+from typing import Any, Dict, Optional
+import numpy as np
+import scipy.sparse as sp
+
+from app.lazy import lazy_import
+from app.scoring import select_top_k
+
+_sk_decomp = lazy_import("sklearn.decomposition")
+
+# Recuperación densa (LSA) con un índice IVF aproximado, solo NumPy + CPU.
+#  - LSA: TruncatedSVD sobre la matriz TF-IDF del índice; cada chunk queda como un
+#    vector float32 de `dim` componentes, normalizado (producto punto = coseno). Junta
+#    términos que aparecen en contextos parecidos ("mandar" / "derivar").
+#  - IVF: k-means esférico sobre esos vectores; cada fila va a la lista de su centroide.
+#    Una consulta puntúa los centroides, recorre solo las `nprobe` listas más cercanas y
+#    ordena esos candidatos. nprobe se ajusta al construir para alcanzar el recall@k
+#    pedido contra la búsqueda exacta, con consultas cortas armadas con términos de
+#    filas del índice.
+
+def _l2(Z: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(Z, axis=1, keepdims=True)
+    return Z / np.maximum(norms, 1e-12)
+
+def _kmeans(Z: np.ndarray, n_lists: int, iters: int, rnd: np.random.Generator,
+            sample: int = 20000) -> np.ndarray:
+    """Centroides (l2) de k-means esférico. Entrena con una muestra de filas; los
+       centroides que se quedan vacíos se reinician en filas al azar."""
+    train = Z[rnd.choice(len(Z), size=min(sample, len(Z)), replace=False)]
+    C = train[rnd.choice(len(train), size=n_lists, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmax(train @ C.T, axis=1)
+        sums = np.zeros_like(C)
+        np.add.at(sums, assign, train)
+        empty = np.flatnonzero(np.bincount(assign, minlength=n_lists) == 0)
+        sums[empty] = train[rnd.choice(len(train), size=len(empty))]
+        C = _l2(sums)
+    return C
+
+def build_lsa(X: sp.spmatrix, dim: int = 128, n_lists: int = 0, target_recall: float = 0.95,
+              k: int = 4, min_rows: int = 2000, max_features: int = 50000,
+              seed: int = 0) -> Optional[Dict[str, Any]]:
+    """Proyección LSA + IVF. Con menos de `min_rows` filas no arma IVF (la búsqueda
+       exacta ya es más rápida). n_lists=0 usa ~sqrt(filas). None si no hay con qué.
+       El SVD usa solo los términos que aparecen en 2 o más filas (un término de una
+       sola fila no aporta co-ocurrencias), hasta `max_features` por df: los componentes
+       son densos y con todo el vocabulario de bigramas pesarían GBs."""
+    X = sp.csr_matrix(X)
+    n = X.shape[0]
+    df = np.bincount(X.indices, minlength=X.shape[1])
+    cols = np.flatnonzero(df >= min(2, n))
+    if len(cols) > max_features:
+        cols = np.sort(cols[np.argsort(-df[cols], kind="stable")[:max_features]])
+    dim = min(dim, n - 1, len(cols) - 1)
+    if dim < 1:
+        return None
+    Xc = X[:, cols]
+    svd = _sk_decomp.TruncatedSVD(n_components=dim, algorithm="randomized", n_iter=5, random_state=seed)
+    Z = _l2(svd.fit_transform(Xc).astype(np.float32))
+    # Z[i] es el vector de la fila rows[i]; con IVF las filas quedan agrupadas por lista
+    # (cada lista es un bloque contiguo de Z), sin IVF rows = 0..n-1
+    lsa = {"cols": cols, "components": svd.components_.astype(np.float32),
+           "Z": Z, "rows": np.arange(n, dtype=np.int64), "n": n, "ivf": None, "nprobe": 0}
+    if n >= min_rows:
+        _build_ivf(lsa, n_lists or int(np.sqrt(n)), np.random.default_rng(seed))
+        Q = _sample_queries(lsa, Xc, np.random.default_rng(seed + 1))
+        lsa["nprobe"] = tune_nprobe(lsa, Q, k, target_recall)
+    return lsa
+
+def _sample_queries(lsa: Dict[str, Any], Xc: sp.csr_matrix, rnd: np.random.Generator,
+                    n_queries: int = 200, n_terms: int = 3) -> np.ndarray:
+    """Consultas de prueba: los `n_terms` términos de más peso de filas al azar,
+       proyectados (una fila entera como consulta cae siempre en su propia lista y
+       sobreestima el recall)."""
+    Q = []
+    for i in rnd.choice(Xc.shape[0], size=min(n_queries, Xc.shape[0]), replace=False):
+        row = Xc[i]
+        if row.nnz:
+            keep = np.argsort(-row.data, kind="stable")[:n_terms]
+            q = sp.csr_matrix((np.ones(len(keep)), row.indices[keep], [0, len(keep)]), shape=row.shape)
+            Q.append(_project_cols(lsa, q))
+    return np.array(Q, dtype=np.float32)
+
+def _build_ivf(lsa: Dict[str, Any], n_lists: int, rnd: np.random.Generator, iters: int = 10) -> None:
+    Z = lsa["Z"]
+    C = _kmeans(Z, n_lists, iters, rnd)
+    assign = np.argmax(Z @ C.T, axis=1)
+    order = np.argsort(assign, kind="stable")
+    offsets = np.zeros(n_lists + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assign, minlength=n_lists), out=offsets[1:])
+    lsa.update(Z=Z[order], rows=order.astype(np.int64), ivf={"centroids": C, "offsets": offsets})
+
+def project(lsa: Dict[str, Any], q: sp.spmatrix) -> np.ndarray:
+    """Vector LSA (l2, float32) de una consulta TF-IDF 1×V."""
+    return _project_cols(lsa, sp.csr_matrix(q)[:, lsa["cols"]])
+
+def _project_cols(lsa: Dict[str, Any], q: sp.csr_matrix) -> np.ndarray:
+    z = np.asarray(q @ lsa["components"].T, dtype=np.float32).ravel()
+    norm = np.linalg.norm(z)
+    return z / norm if norm else z
+
+def exact_search(lsa: Dict[str, Any], z: np.ndarray, k: int) -> np.ndarray:
+    return select_top_k(lsa["rows"], lsa["Z"] @ z, lsa["n"], k)
+
+def ivf_search(lsa: Dict[str, Any], z: np.ndarray, k: int, nprobe: int = 0) -> np.ndarray:
+    """Top-k aproximado: solo las `nprobe` listas más cercanas (por defecto, el nprobe
+       ajustado al construir). Sin IVF, búsqueda exacta."""
+    ivf = lsa["ivf"]
+    if ivf is None:
+        return exact_search(lsa, z, k)
+    nprobe = min(nprobe or lsa["nprobe"], len(ivf["centroids"]))
+    cs = ivf["centroids"] @ z
+    lists = np.argpartition(-cs, nprobe - 1)[:nprobe]
+    # cada lista es un bloque contiguo de Z: se puntúa por tajadas, sin copiar filas
+    offs, Z, rows = ivf["offsets"], lsa["Z"], lsa["rows"]
+    lists.sort()
+    cand = [(offs[c], offs[c + 1]) for c in lists if offs[c + 1] > offs[c]]
+    scores = np.concatenate([Z[a:b] @ z for a, b in cand]) if cand else np.empty(0, np.float32)
+    pos = np.concatenate([rows[a:b] for a, b in cand]) if cand else np.empty(0, np.int64)
+    return select_top_k(pos, scores, lsa["n"], k)
+
+def recall_at_k(lsa: Dict[str, Any], Q: np.ndarray, k: int, nprobe: int) -> float:
+    """Fracción del top-k exacto que también devuelve el IVF, promediada sobre Q."""
+    hit = sum(len(np.intersect1d(exact_search(lsa, z, k), ivf_search(lsa, z, k, nprobe)))
+              for z in Q)
+    return hit / (k * len(Q))
+
+def tune_nprobe(lsa: Dict[str, Any], Q: np.ndarray, k: int, target: float) -> int:
+    """Menor nprobe (duplicando) cuyo recall@k sobre las consultas Q llega a `target`."""
+    n_lists = len(lsa["ivf"]["centroids"])
+    nprobe = 1
+    while nprobe < n_lists and recall_at_k(lsa, Q, k, nprobe) < target:
+        nprobe *= 2
+    return min(nprobe, n_lists)
+
+def lsa_top_k(lsa: Dict[str, Any], q: sp.spmatrix, k: int) -> np.ndarray:
+    return ivf_search(lsa, project(lsa, q), k)
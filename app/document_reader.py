@@ -1,62 +1,230 @@
 import os
-from typing import Optional
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-def _read_pdf(path: str) -> str:
+from app.config import (PDF_PAGES_PER_TASK, OCR_ENABLED, OCR_DPI, OCR_WORKERS, OCR_LANG,
+                        OCR_MIN_CHARS, OCR_CACHE_DIR)
+
+def _plumber_pages(path: str, first: int, last: int) -> List[str]:
+    """Texto de las páginas [first, last) con pdfplumber. Corre dentro de un worker."""
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(first, last)]
+
+def _plumber_serial(path: str) -> Iterator[Tuple[int, str]]:
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        for i, page in enumerate(pdf.pages, 1):
+            yield i, page.extract_text() or ""
+            page.flush_cache()  # no acumular los objetos de páginas ya leídas
+
+def _plumber_parallel(path: str, workers: int) -> Iterator[Tuple[int, str]]:
+    """Reparte las páginas en tramos contiguos entre `workers` procesos y las entrega en
+       orden, con a lo sumo 2*workers tramos en vuelo. Si un tramo falla se avisa y se
+       sigue con el resto, como en la ruta serial."""
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        n = len(pdf.pages)
+    step = max(1, PDF_PAGES_PER_TASK)
+    ranges = iter([(i, min(i + step, n)) for i in range(0, n, step)])
+    if n <= step:
+        yield from _plumber_serial(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        inflight = deque()
+        for a, b in ranges:
+            inflight.append((a, b, ex.submit(_plumber_pages, path, a, b)))
+            if len(inflight) >= 2 * workers:
+                break
+        while inflight:
+            a, b, fut = inflight.popleft()
+            nxt = next(ranges, None)
+            if nxt:
+                inflight.append((*nxt, ex.submit(_plumber_pages, path, *nxt)))
+            try:
+                texts = fut.result()
+            except Exception as e:
+                print(f"[WARN] pdfplumber falló en {path} (páginas {a + 1}-{b}): {e}")
+                continue
+            for off, t in enumerate(texts):
+                yield a + off + 1, t
+
+# ---------------------- OCR por página ----------------------
+# Solo pasan por OCR las páginas sin capa de texto (escaneadas), aunque el resto del PDF
+# sea digital. La clave de la caché es el hash del contenido de la página (su flujo de
+# dibujo y las imágenes que usa) + DPI + idioma: reindexar, renombrar o copiar el PDF no
+# repite el OCR de una página ya vista.
+
+def _page_hash(page) -> str:
+    """Hash de una página de pdfplumber: flujos de contenido + imágenes (XObject) que
+       referencia. Las páginas escaneadas comparten el flujo ("dibujar /Im0"), por eso
+       entran también las imágenes."""
+    from pdfminer.pdftypes import PDFStream, resolve1
+    h = hashlib.blake2b(digest_size=16)
+    obj = page.page_obj
+    streams = [resolve1(s) for s in (obj.contents or [])]
+    xobjs = resolve1((obj.resources or {}).get("XObject")) or {}
+    streams += [resolve1(xobjs[name]) for name in sorted(xobjs)]
+    for s in streams:
+        if isinstance(s, PDFStream):
+            h.update(s.get_rawdata() or b"")
+    h.update(f"|{OCR_DPI}|{OCR_LANG}".encode())
+    return h.hexdigest()
+
+def _ocr_cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], key + ".txt")
+
+def _ocr_cache_get(key: str) -> Optional[str]:
+    try:
+        with open(_ocr_cache_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _ocr_cache_put(key: str, text: str) -> None:
+    path = _ocr_cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)  # otro proceso nunca ve un archivo a medio escribir
+    except OSError as e:
+        print(f"[WARN] No se pudo guardar el OCR en caché ({path}): {e}")
+
+def _ocr_page(path: str, no: int, dpi: int, lang: str) -> str:
+    """Rasteriza la página `no` (1-based) y la pasa por Tesseract. Corre dentro de un worker."""
+    import pdfplumber
+    import pytesseract  # pip install pytesseract
+    # Nota: en Windows debes instalar Tesseract en el sistema:
+    # https://github.com/UB-Mannheim/tesseract/wiki
+    with pdfplumber.open(path) as pdf:
+        img = pdf.pages[no - 1].to_image(resolution=dpi).original  # PIL, vía pypdfium2
+    return pytesseract.image_to_string(img, lang=lang)
+
+def _with_ocr(path: str, pages: Iterable[Tuple[int, str]],
+              workers: int = OCR_WORKERS) -> Iterator[Tuple[int, str]]:
+    """Entrega las páginas en orden, reemplazando el texto de las que tienen menos de
+       OCR_MIN_CHARS caracteres por su OCR (caché o `workers` procesos). Las páginas
+       digitales que llegan detrás de una en OCR esperan en cola hasta que termine."""
+    import pdfplumber
+    pending = deque()  # (página, texto, (clave, futuro) o None)
+    ex, n_new, n_cached = None, 0, 0
+    with pdfplumber.open(path) as pdf:
+        try:
+            for no, t in pages:
+                job = None
+                if len(t.strip()) < OCR_MIN_CHARS:
+                    key = _page_hash(pdf.pages[no - 1])
+                    cached = _ocr_cache_get(key)
+                    if cached is not None:
+                        n_cached += 1
+                        t = cached if cached.strip() else t
+                    else:
+                        n_new += 1
+                        ex = ex or ProcessPoolExecutor(max_workers=max(1, workers))
+                        job = (key, ex.submit(_ocr_page, path, no, OCR_DPI, OCR_LANG))
+                pending.append((no, t, job))
+                while pending and (pending[0][2] is None or pending[0][2][1].done()):
+                    yield _ocr_result(path, *pending.popleft())
+            while pending:
+                yield _ocr_result(path, *pending.popleft())
+        finally:
+            if ex is not None:
+                ex.shutdown(cancel_futures=True)
+    if n_new or n_cached:
+        print(f"[INFO] OCR en {path}: {n_new} páginas nuevas, {n_cached} desde caché")
+
+def _ocr_result(path: str, no: int, t: str, job) -> Tuple[int, str]:
+    if job is not None:
+        key, fut = job
+        try:
+            text = fut.result()
+        except Exception as e:  # sin pytesseract/Tesseract o la página no se pudo rasterizar
+            print(f"[WARN] OCR falló en {path} (página {no}): {e}")
+            return no, t
+        _ocr_cache_put(key, text)  # también vacío: una página en blanco no se reintenta
+        t = text if text.strip() else t
+    return no, t
+
+def _iter_pdf_pages(path: str, workers: int = 1) -> Iterator[Tuple[int, str]]:
     """
-    Extrae texto de PDF intentando en este orden:
-      1) pdfplumber (PDFs digitales)
+    Páginas de un PDF como (número 1-based, texto con salto final), a medida que se extraen.
+    Intenta en este orden:
+      1) pdfplumber (PDFs digitales); con workers > 1 reparte las páginas en procesos.
+         Con GOBI_ENABLE_OCR=1 las páginas sin texto pasan por OCR (ver _with_ocr)
       2) PyMuPDF/fitz (si está instalado)
-      3) (opcional) OCR con Tesseract si todo lo anterior dio vacío
-    Devuelve cadena (puede ser "").
+    El paso 2 solo corre si el 1 no dio texto útil. Las páginas en blanco no se
+    entregan: así el paso 2 nunca repite una página que ya salió del 1.
     """
-    text = ""
+    got = False
 
-    # 1) Intento con pdfplumber
+    # 1) Intento con pdfplumber (+ OCR de las páginas escaneadas)
     try:
-        import pdfplumber  # pip install pdfplumber
-        with pdfplumber.open(path) as pdf:
-            for page in pdf.pages:
-                t = page.extract_text() or ""
-                if t:
-                    text += t + "\n"
+        pages = _plumber_parallel(path, workers) if workers > 1 else _plumber_serial(path)
+        if OCR_ENABLED:
+            pages = _with_ocr(path, pages)
+        for no, t in pages:
+            if t.strip():
+                got = True
+                yield no, t + "\n"
     except Exception as e:
         print(f"[WARN] pdfplumber falló en {path}: {e}")
+    if got:
+        return
 
     # 2) Si aún no hay texto, intento con fitz (si está disponible)
-    if not text.strip():
-        try:
-            import fitz  # PyMuPDF (pip install pymupdf)
-            with fitz.open(path) as doc:
-                for page in doc:
-                    # 'text' suele ir bien, 'blocks' a veces capta mejor tablas
-                    text += (page.get_text("text") or "") + "\n"
-        except ImportError:
-            print(f"[INFO] PyMuPDF (fitz) no instalado; omito fallback para {path}")
-        except Exception as e:
-            print(f"[WARN] PyMuPDF falló en {path}: {e}")
-
-    # 3) (Opcional) OCR si sigue vacío y quieres habilitarlo
-    #    Actívalo poniendo la variable de entorno GOBI_ENABLE_OCR=1
-    if not text.strip() and os.environ.get("GOBI_ENABLE_OCR") == "1":
-        try:
-            from pdf2image import convert_from_path   # pip install pdf2image pillow
-            import pytesseract                        # pip install pytesseract
-            # Nota: en Windows debes instalar Tesseract en el sistema:
-            # https://github.com/UB-Mannheim/tesseract/wiki
-            images = convert_from_path(path, dpi=200)
-            ocr_texts = []
-            for img in images:
-                ocr_texts.append(pytesseract.image_to_string(img, lang="spa"))
-            text = "\n".join(ocr_texts)
-            if not text.strip():
-                print(f"[INFO] OCR no obtuvo texto útil en {path}")
-        except Exception as e:
-            print(f"[WARN] OCR no disponible o falló en {path}: {e}")
-
-    return text or ""
-
-def load_text_from_path(path: str) -> Optional[str]:
-    """Lee texto de PDF, DOCX, DOC y TXT. Devuelve None si falla."""
+    try:
+        import fitz  # PyMuPDF (pip install pymupdf)
+        with fitz.open(path) as doc:
+            for no, page in enumerate(doc, 1):
+                # 'text' suele ir bien, 'blocks' a veces capta mejor tablas
+                t = page.get_text("text") or ""
+                if t.strip():
+                    yield no, t + "\n"
+    except ImportError:
+        print(f"[INFO] PyMuPDF (fitz) no instalado; omito fallback para {path}")
+    except Exception as e:
+        print(f"[WARN] PyMuPDF falló en {path}: {e}")
+
+def _read_pdf(path: str, workers: int = 1) -> str:
+    """Texto completo de un PDF (ver _iter_pdf_pages). Devuelve cadena (puede ser "")."""
+    return "".join(t for _, t in _iter_pdf_pages(path, workers))
+
+def iter_pages(path: str, workers: int = 1) -> Iterator[Tuple[Optional[int], str]]:
+    """Versión en streaming de load_text_from_path: produce (página, texto) sin tener el
+       documento entero en memoria. Concatenar los textos da el texto del documento.
+       La página es None en formatos sin paginación (TXT, DOCX)."""
+    if not os.path.isfile(path):
+        return
+    ext = os.path.splitext(path)[1].lower()
+
+    try:
+        if ext == ".txt":
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                for block in iter(lambda: f.read(1 << 16), ""):
+                    yield None, block
+
+        elif ext == ".pdf":
+            yield from _iter_pdf_pages(path, workers)
+
+        elif ext in (".docx", ".doc"):
+            import docx  # pip install python-docx
+            doc = docx.Document(path)
+            for p in doc.paragraphs:
+                yield None, p.text + "\n"
+
+        else:
+            print(f"[WARN] Formato no soportado: {path}")
+    except Exception as e:
+        print(f"[ERROR] No se pudo leer {path}: {e}")
+
+def load_text_from_path(path: str, workers: int = 1) -> Optional[str]:
+    """Lee texto de PDF, DOCX, DOC y TXT. Devuelve None si falla.
+       `workers` > 1 extrae las páginas de un PDF en paralelo."""
     if not os.path.isfile(path):
         return None
     ext = os.path.splitext(path)[1].lower()
@@ -67,7 +235,7 @@ def load_text_from_path(path: str) -> Optional[str]:
                 return f.read()
 
         elif ext == ".pdf":
-            text = _read_pdf(path)
+            text = _read_pdf(path, workers=workers)
             return text if text.strip() else ""  # devuelve "" si no hubo texto
 
         elif ext in (".docx", ".doc"):
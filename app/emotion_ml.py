@@ -1,6 +1,10 @@
 # app/emotion_ml.py
-from typing import Tuple
-import re, unicodedata
+from typing import List, Optional, Tuple
+from concurrent.futures import Future
+import queue, re, threading, time, unicodedata
+
+from app.config import EMO_BATCH_MAX, EMO_BATCH_WAIT_MS
+from app import metrics, startup
 
 def _lazy_load():
     from pysentimiento import create_analyzer
@@ -10,13 +14,60 @@ def _lazy_load():
 
 _EMO_ANALYZER = None
 _SENT_ANALYZER = None
+_LOAD_LOCK = threading.Lock()  # una sola carga aunque la pidan varios hilos
+_THREADS_LOCK = threading.Lock()  # arranque de los hilos de fondo (warmup, batcher)
 
 def _get_analyzers():
     global _EMO_ANALYZER, _SENT_ANALYZER
-    if _EMO_ANALYZER is None or _SENT_ANALYZER is None:
-        _EMO_ANALYZER, _SENT_ANALYZER = _lazy_load()
+    with _LOAD_LOCK:
+        if _EMO_ANALYZER is None or _SENT_ANALYZER is None:
+            _EMO_ANALYZER, _SENT_ANALYZER = _lazy_load()
     return _EMO_ANALYZER, _SENT_ANALYZER
 
+# ---------------------- precalentamiento ----------------------
+_READY = threading.Event()
+_WARMUP_THREAD = None
+_WARMUP_ERROR = None
+
+def _warmup():
+    global _WARMUP_ERROR
+    try:
+        with startup.stage("emotion_models"):
+            emo_an, sent_an = _get_analyzers()
+            # pasada de prueba por la misma ruta que usa detect_emotion_batch
+            emo_an.predict(["hola, necesito ayuda con un documento"])
+            sent_an.predict(["hola, necesito ayuda con un documento"])
+        _READY.set()
+    except Exception as e:
+        _WARMUP_ERROR = e
+        print(f"[WARN] No se pudieron cargar los modelos de emoción: {e}")
+
+def start_warmup() -> threading.Thread:
+    """Carga los modelos en un hilo de fondo (una vez por proceso) y hace una pasada de
+       prueba, para que el primer mensaje real tampoco pague la inicialización."""
+    global _WARMUP_THREAD
+    with _THREADS_LOCK:
+        if _WARMUP_THREAD is None:
+            _WARMUP_THREAD = threading.Thread(target=_warmup, name="gobi-emotion-warmup", daemon=True)
+            _WARMUP_THREAD.start()
+    return _WARMUP_THREAD
+
+def is_ready() -> bool:
+    return _READY.is_set()
+
+def warmup_status() -> str:
+    """"ready", "loading", "failed" o "idle" (aún no se pidió)."""
+    if _READY.is_set():
+        return "ready"
+    if _WARMUP_ERROR is not None:
+        return "failed"
+    return "loading" if _WARMUP_THREAD is not None else "idle"
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    """Espera la carga (termina antes si falló). True si los modelos quedaron listos."""
+    start_warmup().join(timeout)
+    return _READY.is_set()
+
 def _norm(s: str) -> str:
     s = s or ""
     s = unicodedata.normalize("NFD", s).encode("ascii","ignore").decode("utf-8")
@@ -28,24 +79,102 @@ _EMO_MAP = {
     "others": "neutral",
 }
 _SENT_MAP = {"POS": "positivo", "NEG": "negativo", "NEU": "neutral"}
+_EMO_THRESHOLD = 0.55  # umbral simple: por debajo se consulta también el de sentimiento
 
-def detect_emotion(text: str) -> Tuple[str, dict]:
-    t = _norm(text)
-    if not t:
-        return "neutral", {"model": "none", "score": 0.0}
+def _top(res) -> Tuple[str, float]:
+    return str(res.output), float(max(res.probas.values()) if res.probas else 0.0)
+
+def detect_emotion_batch(texts: List[str]) -> List[Tuple[str, dict]]:
+    """Como detect_emotion, pero con una sola pasada del modelo de emoción para todos los
+       textos y otra del de sentimiento solo para los de baja confianza."""
+    norm = [_norm(t) for t in texts]
+    out = [("neutral", {"model": "none", "score": 0.0}) for _ in norm]
+    idx = [i for i, t in enumerate(norm) if t]
+    if not idx:
+        return out
     emo_an, sent_an = _get_analyzers()
-    emo_res = emo_an.predict(t)
-    emo_label = str(emo_res.output)
-    emo_score = float(max(emo_res.probas.values()) if emo_res.probas else 0.0)
-    emo_es = _EMO_MAP.get(emo_label, "neutral")
-    if emo_score < 0.55:  # umbral simple
-        sent_res = sent_an.predict(t)
-        sent_label = str(sent_res.output)
-        sent_score = float(max(sent_res.probas.values()) if sent_res.probas else 0.0)
-        sent_es = _SENT_MAP.get(sent_label, "neutral")
-        if emo_label == "others" or sent_score > emo_score:
-            return sent_es, {"model": "sentiment", "label": sent_label, "score": sent_score}
-    return emo_es, {"model": "emotion", "label": emo_label, "score": emo_score}
+    emo = {i: _top(r) for i, r in zip(idx, emo_an.predict([norm[i] for i in idx]))}
+    low = [i for i in idx if emo[i][1] < _EMO_THRESHOLD]
+    sent = {i: _top(r) for i, r in zip(low, sent_an.predict([norm[i] for i in low]))} if low else {}
+
+    for i in idx:
+        emo_label, emo_score = emo[i]
+        if i in sent:
+            sent_label, sent_score = sent[i]
+            if emo_label == "others" or sent_score > emo_score:
+                out[i] = (_SENT_MAP.get(sent_label, "neutral"),
+                          {"model": "sentiment", "label": sent_label, "score": sent_score})
+                continue
+        out[i] = (_EMO_MAP.get(emo_label, "neutral"),
+                  {"model": "emotion", "label": emo_label, "score": emo_score})
+    return out
+
+# ---------------------- micro-batching ----------------------
+class _MicroBatcher:
+    """Despachador de proceso: junta las peticiones que llegan dentro de una ventana corta
+       (max_wait_ms) o hasta max_batch, y las resuelve con una sola llamada a
+       detect_emotion_batch. Cada llamador recibe su propio resultado por un Future."""
+
+    def __init__(self, max_batch: int, max_wait_ms: float):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._q: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, name="gobi-emotion-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self._q.put((text, fut))
+        return fut
+
+    def _loop(self):
+        while True:
+            batch = [self._q.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    batch.append(self._q.get(timeout=left))
+                except queue.Empty:
+                    break
+            try:
+                with metrics.timed("emotion_batch"):
+                    results = detect_emotion_batch([t for t, _ in batch])
+                metrics.incr("emotion.batches")
+                metrics.incr("emotion.batched_texts", len(batch))
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), res in zip(batch, results):
+                fut.set_result(res)
+
+_BATCHER = None
+
+def _get_batcher() -> _MicroBatcher:
+    global _BATCHER
+    with _THREADS_LOCK:
+        if _BATCHER is None:
+            _BATCHER = _MicroBatcher(EMO_BATCH_MAX, EMO_BATCH_WAIT_MS)
+    return _BATCHER
+
+def detect_emotion(text: str, wait: bool = False) -> Tuple[str, dict]:
+    """Emoción del mensaje. Mientras los modelos cargan en segundo plano (o si no se
+       pudieron cargar) responde "neutral" sin bloquear; wait=True espera la carga."""
+    if not _norm(text):
+        return "neutral", {"model": "none", "score": 0.0}
+    if wait:
+        wait_ready()
+    if not _READY.is_set():
+        status = warmup_status()
+        start_warmup()
+        metrics.incr(f"emotion.{'unavailable' if status == 'failed' else 'warming'}")
+        return "neutral", {"model": "unavailable" if status == "failed" else "warming", "score": 0.0}
+    if EMO_BATCH_MAX <= 1:
+        return detect_emotion_batch([text])[0]
+    return _get_batcher().submit(text).result()
 
 def empathetic_prefix(emotion_es: str) -> str:
     if emotion_es == "enojado":  return "Entiendo la frustración; vamos a solucionarlo. "
@@ -0,0 +1,186 @@
+# app/engine.py
+import threading
+from time import perf_counter
+from typing import Any, Dict, Iterator, Optional
+
+from app.config import MAX_WORDS, FAST_START
+from app.retrieval import (init_indexes, answer_parts, start_docs_watcher, index_version,
+                           sentence_vectors, find_procedure)
+from app.procedures import format_procedure, procedure_source, confirm_step, step_number
+from app.answer_cache import ANSWER_CACHE
+from app import metrics, startup
+from app.smalltalk import smalltalk_reply
+from app.emotion_ml import detect_emotion, empathetic_prefix, start_warmup
+from app.compose import is_confirmation, iter_human_answer, creative_fallback
+
+_STEP_HINTS = ["paso", "procedimiento", "cómo hago", "instrucción"]
+
+class ChatEngine:
+    """Pipeline completo de GOBI, sin UI: smalltalk -> emoción -> motor documental ->
+       composición. Los índices y modelos son los globales del proceso (init_indexes,
+       start_warmup), así que todas las sesiones comparten una sola copia.
+
+       reply() es síncrono y seguro entre hilos; el estado de cada conversación vive en
+       el dict `session` que pasa quien llama (Streamlit: st.session_state; HTTP: uno
+       por id de sesión). reply_stream() es lo mismo como eventos, para mostrar la
+       respuesta mientras se compone.
+
+       Arranque por etapas: índices y después modelos de emoción. Con background=True
+       (FAST_START) corren en un hilo y el constructor vuelve enseguida; el smalltalk
+       responde ya y el resto de las consultas espera a los índices."""
+
+    def __init__(self, warmup: bool = True, watch_docs: bool = True, background: bool = FAST_START):
+        self._indexes_ready = threading.Event()
+        if background:
+            threading.Thread(target=self._load, args=(warmup, watch_docs),
+                             name="gobi-index-load", daemon=True).start()
+        else:
+            self._load(warmup, watch_docs)
+
+    def _load(self, warmup: bool, watch_docs: bool) -> None:
+        try:
+            with startup.stage("indexes"):
+                init_indexes()
+        except Exception as e:  # las consultas siguen: sin índices cae en el fallback
+            print(f"[ERROR] No se pudieron cargar los índices: {e}")
+        finally:
+            self._indexes_ready.set()
+        if watch_docs:
+            start_docs_watcher()  # no hace nada si DOCS_WATCH_INTERVAL = 0
+        if warmup:
+            start_warmup()  # después de los índices: no compiten por CPU al arrancar
+
+    def indexes_ready(self) -> bool:
+        return self._indexes_ready.is_set()
+
+    def wait_indexes(self, timeout: Optional[float] = None) -> bool:
+        return self._indexes_ready.wait(timeout)
+
+    def reply(self, text: str, session: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Devuelve {"answer", "sources", "emotion": (label, info), "route"}."""
+        for ev in self.reply_stream(text, session):
+            pass
+        return ev["result"]
+
+    def reply_stream(self, text: str, session: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Eventos {"event": "delta", "text"}: trozos de la respuesta en orden (oraciones
+           o viñetas; unidos dan la respuesta), y al final {"event": "done", "result"}
+           con lo mismo que reply(), fuentes incluidas. El primer trozo sale apenas
+           termina la recuperación."""
+        t0, first = perf_counter(), True
+        with metrics.timed("reply"):  # incluye lo que tarde quien consume los eventos
+            for ev in self._reply((text or "").strip(), session if session is not None else {}):
+                if first and ev["event"] == "delta":
+                    metrics.observe("reply.first_delta", (perf_counter() - t0) * 1000)
+                    first = False
+                yield ev
+        metrics.incr(f"route.{ev['result']['route']}")
+
+    def _reply(self, q: str, session: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        # 1) Smalltalk primero (rápido)
+        with metrics.timed("smalltalk"):
+            st_reply = smalltalk_reply(q)
+        if st_reply:
+            yield from self._done(session, "smalltalk", st_reply, [],
+                                  ("neutral", {"model": "smalltalk", "score": 1.0}))
+            return
+        if not self.indexes_ready():
+            with metrics.timed("wait_indexes"):
+                self.wait_indexes()
+
+        # 2) Emoción
+        try:
+            with metrics.timed("detect_emotion"):
+                label, info = detect_emotion(q)
+        except Exception:
+            label, info = "neutral", {"model": "fallback", "score": 0.0}
+
+        # 3) Procedimientos indexados: seguimiento ("¿eso es el paso 2?") y "cómo hago..."
+        last = session.get("last_procedure")
+        if last and is_confirmation(q):
+            answer, step = confirm_step(last["proc"], step_number(q), last["step"])
+            if step:
+                session["last_procedure"] = {"proc": last["proc"], "step": step["n"]}
+            yield from self._done(session, "confirmation", empathetic_prefix(label) + answer,
+                                  [procedure_source(last["proc"], step)], (label, info))
+            return
+        mode = "steps" if any(k in q.lower() for k in _STEP_HINTS) else "auto"
+        if mode == "steps":
+            with metrics.timed("find_procedure"):
+                proc = find_procedure(q)
+            if proc:
+                session["last_procedure"] = {"proc": proc, "step": 1}
+                yield from self._done(session, "procedure", empathetic_prefix(label) + format_procedure(proc),
+                                      [procedure_source(proc)], (label, info))
+                return
+
+        # 4) Motor documental
+        session.pop("last_procedure", None)  # la conversación cambió de tema
+        try:
+            kb_text, raw_text, sources = answer_parts(q, max_words=MAX_WORDS, emotion=label)
+        except Exception:
+            kb_text, raw_text, sources = "", "", []
+
+        # 5) Composición (concisa)
+        if is_confirmation(q):
+            answer = empathetic_prefix(label) + "Sí: corresponde a esa sección/paso descrito arriba. ¿Quieres que lo resuma en 3 puntos o que pase al paso siguiente?"
+            yield from self._done(session, "confirmation", answer, sources, (label, info))
+            return
+        if not kb_text and not raw_text.strip():
+            yield from self._done(session, "fallback", creative_fallback(q, emotion_es=label), [], (label, info))
+            return
+
+        # La respuesta de la KB va tal cual y primero; solo el texto documental se resume.
+        # raw_text ya depende de (consulta normalizada, versión de índices): si otra
+        # sesión compuso lo mismo, se reutiliza; si no, se muestra a medida que se compone
+        prefix = empathetic_prefix(label)
+        if kb_text:
+            prefix += kb_text + ("\n\n" if raw_text else "")
+        if prefix:
+            yield {"event": "delta", "text": prefix}
+        if not raw_text:
+            yield self._result(session, mode, prefix, sources, (label, info))
+            return
+        key = ("compose", index_version(), mode, raw_text)
+        found, concise = ANSWER_CACHE.get(key)
+        metrics.incr(f"answer_cache.compose.{'hit' if found else 'miss'}")
+        if found:
+            yield {"event": "delta", "text": concise}
+        else:
+            pieces, ms = [], 0.0
+            parts = iter_human_answer(raw_text, mode=mode, max_words=300, vectors=sentence_vectors)
+            while True:
+                t0 = perf_counter()  # solo lo que tarda componer, no quien consume
+                piece = next(parts, None)
+                ms += (perf_counter() - t0) * 1000
+                if piece is None:
+                    break
+                pieces.append(piece)
+                yield {"event": "delta", "text": piece}
+            metrics.observe("compose", ms)
+            concise = "".join(pieces)
+            ANSWER_CACHE.put(key, concise)
+        yield self._result(session, mode, prefix + concise, sources, (label, info))
+
+    @classmethod
+    def _done(cls, session, route, answer, sources, emotion) -> Iterator[Dict[str, Any]]:
+        """Respuesta ya completa: un solo trozo y el cierre."""
+        yield {"event": "delta", "text": answer}
+        yield cls._result(session, route, answer, sources, emotion)
+
+    @staticmethod
+    def _result(session, route, answer, sources, emotion) -> Dict[str, Any]:
+        session["last_route"] = route
+        return {"event": "done",
+                "result": {"answer": answer, "sources": sources, "emotion": emotion, "route": route}}
+
+_ENGINE: Optional[ChatEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+def get_engine() -> ChatEngine:
+    """Motor único del proceso (se construye en la primera llamada)."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            _ENGINE = ChatEngine()
+    return _ENGINE
@@ -0,0 +1,73 @@
+# app/history.py
+import json, os, tempfile, uuid, weakref
+from array import array
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+from app.config import HISTORY_WINDOW, HISTORY_SPILL_DIR
+
+Turn = Tuple[str, str]  # (rol, mensaje): rol "user" o "bot"
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ChatHistory:
+    """Historial de una conversación con memoria acotada. Los últimos `window` mensajes
+       viven en memoria; al pasarse, el más viejo se agrega a un JSONL propio de la
+       sesión (se borra cuando se libera el objeto) y se guarda su offset, así older()
+       lee solo las líneas pedidas. Los índices son absolutos: el mensaje i sigue siendo
+       el i aunque ya esté en disco."""
+
+    def __init__(self, turns: Optional[List[Turn]] = None, window: int = HISTORY_WINDOW,
+                 spill_dir: str = HISTORY_SPILL_DIR):
+        self.window = max(1, window)
+        self.spill_dir = spill_dir or os.path.join(tempfile.gettempdir(), "gobi_history")
+        self._recent: "deque[Turn]" = deque()
+        self._offsets = array("q", [0])  # inicio de cada línea del JSONL + fin
+        self._path: Optional[str] = None
+        self.n_bot = 0
+        for role, msg in turns or []:
+            self.append(role, msg)
+
+    def __len__(self) -> int:
+        return self.n_spilled + len(self._recent)
+
+    @property
+    def n_spilled(self) -> int:
+        return len(self._offsets) - 1
+
+    def append(self, role: str, msg: str) -> None:
+        self._recent.append((role, msg))
+        self.n_bot += role == "bot"
+        if len(self._recent) > self.window:
+            self._spill(self._recent.popleft())
+
+    def _spill(self, turn: Turn) -> None:
+        if self._path is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._path = os.path.join(self.spill_dir, f"{uuid.uuid4().hex}.jsonl")
+            weakref.finalize(self, _remove, self._path)
+        line = (json.dumps(turn, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self._path, "ab") as f:
+            f.write(line)
+        self._offsets.append(self._offsets[-1] + len(line))  # 8 bytes por mensaje derramado
+
+    def tail(self, start: int = 0) -> Iterator[Tuple[int, Turn]]:
+        """(índice, turno) de los mensajes en memoria con índice >= start."""
+        first = self.n_spilled
+        for k, turn in enumerate(self._recent):
+            if first + k >= start:
+                yield first + k, turn
+
+    def older(self, n: int) -> List[Turn]:
+        """Los `n` mensajes derramados más recientes (los anteriores a la ventana), en orden."""
+        a = max(0, self.n_spilled - n)
+        if a == self.n_spilled:
+            return []
+        with open(self._path, "rb") as f:
+            f.seek(self._offsets[a])
+            data = f.read(self._offsets[-1] - self._offsets[a])
+        return [tuple(json.loads(ln)) for ln in data.decode("utf-8").splitlines()]
@@ -0,0 +1,258 @@
+# app/index_store.py
+import importlib.metadata, os, pickle, hashlib, shutil, uuid
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import (INDEX_CACHE_DIR, CHUNK_SIZE, CHUNK_OVERLAP, RETRIEVAL_MODE, BM25_K1, BM25_B,
+                        INDEX_COMPACT, INDEX_HASH_BITS, INDEX_SHARED_DIR, KB_COLUMNS,
+                        LSA_DIM, LSA_TARGET_RECALL, LSA_IVF_MIN_ROWS, BOILERPLATE_MIN_PAGES,
+                        BOILERPLATE_MIN_SHARE, BOILERPLATE_EDGE_LINES, BOILERPLATE_SAMPLE_PAGES,
+                        NEAR_DUP_THRESHOLD, MINHASH_PERM, OCR_ENABLED, OCR_DPI, OCR_LANG)
+
+# Súbelo cuando cambie la forma de los índices guardados
+SNAPSHOT_VERSION = 12
+_SNAPSHOT_FILE = "indexes.pkl"
+_SEGMENTS_FILE = "segments.pkl"  # segmentos guardados aparte (índice compartido y modo compacto)
+
+# ---------------------- huellas ----------------------
+def file_fingerprint(path: str) -> Optional[Dict[str, Any]]:
+    """Ruta, tamaño, mtime y hash del contenido. None si el archivo no existe."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha1": h.hexdigest()}
+
+def snapshot_key() -> Dict[str, Any]:
+    """Parte de la clave que invalida todo el snapshot: versión, OCR, chunking, limpieza
+       de duplicados, ranking y columnas de la KB.
+       Las huellas de cada archivo viajan dentro de los índices y se comparan una por una,
+       para reprocesar solo lo que cambió."""
+    try:  # sin importar sklearn (ver app/lazy.py): basta la versión instalada
+        skl = importlib.metadata.version("scikit-learn")
+    except importlib.metadata.PackageNotFoundError:
+        skl = ""
+    return {
+        "version": SNAPSHOT_VERSION,
+        "sklearn": skl,
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        # los postings BM25 solo se precalculan en ese modo
+        "bm25": (BM25_K1, BM25_B) if RETRIEVAL_MODE == "bm25" else None,
+        "lsa": (LSA_DIM, LSA_TARGET_RECALL, LSA_IVF_MIN_ROWS) if RETRIEVAL_MODE == "lsa" else None,
+        "compact": INDEX_COMPACT,
+        "hash_bits": INDEX_HASH_BITS,
+        "kb_columns": sorted(KB_COLUMNS.items()),
+        "dedup": (BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_SHARE, BOILERPLATE_EDGE_LINES, BOILERPLATE_SAMPLE_PAGES,
+                  NEAR_DUP_THRESHOLD, MINHASH_PERM),
+        "ocr": (OCR_ENABLED, OCR_DPI, OCR_LANG),
+    }
+
+# ---------------------- lectura / escritura ----------------------
+def _snapshot_path(cache_dir: str) -> str:
+    return os.path.join(cache_dir, _SNAPSHOT_FILE)
+
+def load_snapshot(key: Dict[str, Any], cache_dir: str = INDEX_CACHE_DIR) -> Optional[Tuple[dict, dict]]:
+    """Devuelve (doc_index, kb_index) si hay un snapshot con la misma clave; si no, None."""
+    if not cache_dir:
+        return None
+    path = _snapshot_path(cache_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+    except Exception as e:
+        print(f"[WARN] Snapshot de índices ilegible ({path}): {e}")
+        return None
+    if not isinstance(data, dict) or data.get("key") != key:
+        return None
+    doc_index = data["doc_index"]
+    if doc_index is not None and not doc_index.get("segments") and doc_index.get("files"):
+        doc_index["segments_file"] = os.path.join(cache_dir, _SEGMENTS_FILE)  # para load_segments
+    return doc_index, data["kb_index"]
+
+def _dump_atomic(obj: Any, path: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+def save_snapshot(key: Dict[str, Any], doc_index: dict, kb_index: dict,
+                  cache_dir: str = INDEX_CACHE_DIR) -> dict:
+    """Escritura atómica (archivo temporal + os.replace) para no dejar snapshots a medias.
+       Con INDEX_COMPACT los segmentos (solo sirven para la ingesta incremental) van
+       aparte, en segments.pkl, y se devuelve el doc_index sin ellos para dejar ese en
+       memoria: lleva las huellas de sus archivos ("files") y de dónde releerlos
+       (load_segments). Si no, o si no se pudo guardar, devuelve el mismo doc_index."""
+    if not cache_dir:
+        return doc_index
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        doc, segments = doc_index, doc_index.get("segments")
+        if INDEX_COMPACT and segments:
+            # primero los segmentos: un índice nuevo nunca apunta a segmentos viejos
+            _dump_atomic(segments, os.path.join(cache_dir, _SEGMENTS_FILE))
+            doc = dict(doc_index, segments={}, files={p: seg["fp"] for p, seg in segments.items()})
+            doc.pop("segments_file", None)
+        _dump_atomic({"key": key, "doc_index": doc, "kb_index": kb_index}, _snapshot_path(cache_dir))
+    except Exception as e:
+        print(f"[WARN] No se pudo guardar el snapshot de índices en {cache_dir}: {e}")
+        return doc_index
+    if doc is not doc_index:
+        doc["segments_file"] = os.path.join(cache_dir, _SEGMENTS_FILE)
+    return doc
+
+# ---------------------- índice compartido (mmap) ----------------------
+# Mismo pickle que el snapshot, pero cada arreglo numpy grande (datos/índices de las
+# matrices dispersas, postings, BM25, metas, texto de los chunks) va a su propio .npy y se
+# abre con mmap_mode="r": los procesos de un nodo comparten las páginas y abrir el índice
+# no copia nada. Cada build va a su carpeta y CURRENT apunta a la vigente, así un proceso
+# que aún tiene abierto el build anterior no ve archivos a medio escribir.
+_SHARED_MIN_BYTES = 1 << 12  # una página; lo más chico va dentro del pickle
+_SHARED_KEEP = 2  # builds que se conservan (el vigente + el anterior)
+
+class MappedTexts:
+    """Lista de solo lectura de textos guardados como un solo bloque UTF-8 + offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob, self.offsets = blob, offsets
+
+    @classmethod
+    def from_list(cls, texts: List[str]) -> "MappedTexts":
+        parts = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in parts], out=offsets[1:])
+        return cls(np.frombuffer(b"".join(parts), dtype=np.uint8), offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+class _ArrayPickler(pickle.Pickler):
+    def __init__(self, f, out_dir: str, prefix: str = "a"):
+        super().__init__(f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.out_dir, self.prefix = out_dir, prefix
+        self.saved: Dict[int, str] = {}  # id(arreglo) -> archivo (X y postings pueden ser el mismo)
+
+    def persistent_id(self, obj):
+        if type(obj) is not np.ndarray or obj.dtype.hasobject or obj.nbytes < _SHARED_MIN_BYTES:
+            return None
+        name = self.saved.get(id(obj))
+        if name is None:
+            name = self.saved[id(obj)] = f"{self.prefix}{len(self.saved):04d}.npy"
+            np.save(os.path.join(self.out_dir, name), np.ascontiguousarray(obj))
+        return name
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, f, in_dir: str):
+        super().__init__(f)
+        self.in_dir = in_dir
+
+    def persistent_load(self, name):
+        return np.load(os.path.join(self.in_dir, name), mmap_mode="r")
+
+def _stat_matches(fp: Optional[Dict[str, Any]]) -> bool:
+    """Compara tamaño y mtime (sin leer el archivo) con la huella guardada."""
+    try:
+        st = os.stat(fp["path"])
+    except OSError:
+        return False
+    return (st.st_size, st.st_mtime_ns) == (fp["size"], fp["mtime_ns"])
+
+def save_shared(key: Dict[str, Any], doc_index: dict, kb_index: dict,
+                shared_dir: str = INDEX_SHARED_DIR) -> str:
+    """Escribe un build nuevo del índice compartido y lo publica. Devuelve su carpeta.
+       Los segmentos (solo sirven para la ingesta incremental) van aparte, en
+       segments.pkl, y no se cargan al abrir el build; el índice lleva en su lugar las
+       huellas de cada archivo para detectar si quedó viejo."""
+    segments = doc_index.get("segments") or load_segments(doc_index) or {}
+    files = {p: seg["fp"] for p, seg in segments.items()}
+    doc = dict(doc_index, segments={}, files=files, chunks=MappedTexts.from_list(list(doc_index["chunks"])))
+    doc.pop("segments_file", None)
+    if doc.get("postings") is not None:
+        doc["X"] = doc["postings"]  # una sola copia de la matriz (la vista por columnas)
+
+    build = uuid.uuid4().hex[:12]
+    builds = os.path.join(shared_dir, "builds")
+    tmp = os.path.join(builds, f"{build}.tmp")
+    os.makedirs(tmp)
+    with open(os.path.join(tmp, "index.pkl"), "wb") as f:
+        _ArrayPickler(f, tmp).dump({"key": key, "doc_index": doc, "kb_index": kb_index})
+    with open(os.path.join(tmp, _SEGMENTS_FILE), "wb") as f:
+        _ArrayPickler(f, tmp, prefix="s").dump(segments)
+    os.replace(tmp, os.path.join(builds, build))
+
+    cur = os.path.join(shared_dir, "CURRENT")
+    with open(f"{cur}.{os.getpid()}.tmp", "w") as f:
+        f.write(build)
+    os.replace(f"{cur}.{os.getpid()}.tmp", cur)
+
+    # los builds viejos se borran; en Linux un proceso que aún los tenga mapeados sigue leyendo
+    old = sorted((d for d in os.listdir(builds) if not d.endswith(".tmp") and d != build),
+                 key=lambda d: os.path.getmtime(os.path.join(builds, d)))
+    for d in old[:max(0, len(old) - (_SHARED_KEEP - 1))]:
+        shutil.rmtree(os.path.join(builds, d), ignore_errors=True)
+    return os.path.join(builds, build)
+
+def load_shared(key: Dict[str, Any], paths: List[str], kb_path: Optional[str],
+                shared_dir: str = INDEX_SHARED_DIR) -> Optional[Tuple[dict, dict]]:
+    """(doc_index, kb_index) del build vigente, con los arreglos mapeados en memoria.
+       None si no hay build, la clave no coincide o algún documento/KB cambió desde
+       que se armó (se compara tamaño y mtime)."""
+    if not shared_dir:
+        return None
+    try:
+        with open(os.path.join(shared_dir, "CURRENT")) as f:
+            in_dir = os.path.join(shared_dir, "builds", f.read().strip())
+        with open(os.path.join(in_dir, "index.pkl"), "rb") as f:
+            data = _ArrayUnpickler(f, in_dir).load()
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[WARN] Índice compartido ilegible ({shared_dir}): {e}")
+        return None
+    if data.get("key") != key:
+        print(f"[WARN] Índice compartido en {shared_dir} armado con otra configuración; se ignora")
+        return None
+    doc_index, kb_index = data["doc_index"], data["kb_index"]
+    doc_index["segments_file"] = os.path.join(in_dir, _SEGMENTS_FILE)  # para load_segments
+    files = doc_index.get("files") or {}
+    kb_fp = kb_index.get("fp")
+    kb_ok = (kb_fp["path"] == kb_path and _stat_matches(kb_fp)) if kb_fp \
+        else not (kb_path and os.path.isfile(kb_path))
+    if not kb_ok or set(files) != set(paths) or not all(fp and _stat_matches(fp) for fp in files.values()):
+        print(f"[WARN] Índice compartido en {shared_dir} desactualizado; vuelve a armarlo")
+        return None
+    return doc_index, kb_index
+
+def load_segments(doc_index: dict) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Segmentos que quedaron fuera de `doc_index` (build compartido, mapeados en memoria,
+       o snapshot compacto). None si el índice no apunta a ninguno o el archivo ya no
+       está; quien los use debe comparar sus huellas, porque otro proceso pudo haberlo
+       reescrito."""
+    path = doc_index.get("segments_file")
+    if not path:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return _ArrayUnpickler(f, os.path.dirname(path)).load()
+    except Exception as e:
+        print(f"[WARN] Sin segmentos para la ingesta incremental ({path}): {e}")
+        return None
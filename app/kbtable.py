@@ -0,0 +1,47 @@
+# app/kbtable.py
+import csv
+from typing import Dict, List
+
+from app.index_store import MappedTexts
+
+# KB sin pandas: el CSV tiene unas decenas de filas y pandas tarda más en importarse
+# que todo lo demás del arranque. Lectura con el módulo csv y columnas guardadas como
+# MappedTexts (bloque UTF-8 + offsets), igual que los chunks del índice compartido.
+
+# Celdas que pandas.read_csv lee como NaN (y el cargador anterior dejaba en "")
+_NA = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+       "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+class KBTable:
+    """Tabla de la KB por columnas: table["pregunta"][i], table.row(i)."""
+
+    def __init__(self, columns: Dict[str, MappedTexts]):
+        self.columns = columns
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, List[str]]) -> "KBTable":
+        return cls({f: MappedTexts.from_list(v) for f, v in columns.items()})
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self, field: str) -> MappedTexts:
+        return self.columns[field]
+
+    def row(self, i: int) -> Dict[str, str]:
+        return {f: col[i] for f, col in self.columns.items()}
+
+def read_csv_columns(path: str) -> Dict[str, List[str]]:
+    """{encabezado: valores} de un CSV con encabezado, sin espacios en los extremos y
+       con las celdas vacías/NA como "". Las líneas en blanco se saltan (como pandas)."""
+    with open(path, "r", newline="", encoding="utf-8-sig") as f:
+        rows = csv.reader(f)
+        header = next(rows, [])
+        data = [r for r in rows if r]
+    out = {}
+    for j, name in enumerate(header):
+        if name in out:  # encabezado repetido: vale el primero
+            continue
+        vals = [r[j].strip() if j < len(r) else "" for r in data]
+        out[name] = ["" if v in _NA else v for v in vals]
+    return out
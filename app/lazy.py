@@ -0,0 +1,54 @@
+# app/lazy.py
+import importlib, sys, threading
+from time import perf_counter
+from typing import Any, Dict, List
+
+# Imports diferidos: sklearn tarda ~1 s en importarse y casi nada lo necesita antes de
+# cargar o consultar los índices. Un módulo declara `_sk_text = lazy_import("...")` y
+# recién el primer `_sk_text.TfidfVectorizer` paga el import. Lo que tardó cada import
+# diferido queda en deferred_imports() para el reporte de arranque (app.startup).
+
+_DEFERRED: Dict[str, float] = {}  # módulo -> ms de su primer import (en orden)
+_PRELOADED: List[str] = []  # módulos que ya estaban importados cuando se pidió el proxy
+_LOCK = threading.Lock()
+
+class LazyModule:
+    """Proxy de un módulo que se importa la primera vez que se le pide un atributo."""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._mod = None
+
+    def __getattr__(self, attr: str) -> Any:
+        # solo se llama para atributos que el proxy no tiene: los del módulo
+        mod = self._mod if self._mod is not None else self._load()
+        return getattr(mod, attr)
+
+    def _load(self):
+        with _LOCK:  # dos hilos pidiendo lo mismo: una sola medición
+            if self._mod is None:
+                if self._name in sys.modules and self._name not in _PRELOADED:
+                    _PRELOADED.append(self._name)
+                t0 = perf_counter()
+                self._mod = importlib.import_module(self._name)
+                _DEFERRED.setdefault(self._name, (perf_counter() - t0) * 1000)
+        return self._mod
+
+    def __repr__(self) -> str:
+        state = "cargado" if self._mod is not None else "diferido"
+        return f"<LazyModule {self._name} ({state})>"
+
+def lazy_import(name: str) -> LazyModule:
+    return LazyModule(name)
+
+def deferred_imports() -> Dict[str, float]:
+    """{módulo: ms} de los imports diferidos que ya ocurrieron. Si otro import ya había
+       traído el módulo, su tiempo aquí es ~0 (el costo quedó en quien lo trajo)."""
+    with _LOCK:
+        return dict(_DEFERRED)
+
+def preloaded_imports() -> List[str]:
+    """Módulos diferidos que otro código importó antes que su proxy (p. ej. un pickle
+       con objetos de sklearn): no se ahorró su import."""
+    with _LOCK:
+        return list(_PRELOADED)
@@ -0,0 +1,166 @@
+# app/metrics.py
+"""Instrumentación liviana por etapa: duraciones, contadores y gauges.
+
+    from app import metrics
+    with metrics.timed("retrieve_docs"):
+        ...
+    metrics.incr("answer_cache.hit")
+    metrics.gauge("doc_index.chunks", 35)
+
+El destino se elige con METRICS_SINKS (env GOBI_METRICS), separado por comas:
+  "memory"  histograma en memoria (snapshot() y prometheus_text())
+  "json"    una línea JSON por evento en stdout
+Vacío = desactivado: timed() devuelve un contexto nulo compartido y el resto retorna
+de inmediato, así el costo es una comparación por llamada. set_sinks() permite
+enchufar sinks propios (cualquier objeto con observe/incr/gauge).
+"""
+import json, sys, threading, time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, List, Optional
+
+from app.config import METRICS_SINKS
+
+# límites de los buckets en ms (el último es +Inf)
+BUCKETS_MS = (0.1, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class HistogramSink:
+    """Histograma por etapa + contadores + gauges, en memoria y seguro entre hilos."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._hist: Dict[str, List[float]] = {}  # etapa -> [cuentas por bucket..., suma, n]
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+
+    def observe(self, stage: str, ms: float) -> None:
+        with self._lock:
+            h = self._hist.get(stage)
+            if h is None:
+                h = self._hist[stage] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            h[bisect_left(self.buckets, ms)] += 1
+            h[-2] += ms
+            h[-1] += 1
+
+    def incr(self, name: str, n: float = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name: str, value: float) -> None:
+        with self._lock:
+            self.gauges[name] = value
+
+    def _quantile(self, h: List[float], q: float) -> Optional[float]:
+        n = h[-1]
+        if not n:
+            return None
+        acc = 0
+        for i, c in enumerate(h[:len(self.buckets) + 1]):
+            acc += c
+            if acc >= q * n:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """{"stages": {etapa: {count, sum_ms, mean_ms, p50_ms, p95_ms}}, "counters", "gauges"}.
+           p50/p95 son el límite superior del bucket donde caen."""
+        with self._lock:
+            stages = {
+                s: {"count": h[-1], "sum_ms": round(h[-2], 3), "mean_ms": round(h[-2] / h[-1], 3),
+                    "p50_ms": self._quantile(h, 0.50), "p95_ms": self._quantile(h, 0.95)}
+                for s, h in self._hist.items()
+            }
+            return {"stages": stages, "counters": dict(self.counters), "gauges": dict(self.gauges)}
+
+    def prometheus_text(self, prefix: str = "gobi") -> str:
+        """Exposición en formato de texto de Prometheus (duraciones en segundos)."""
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        with self._lock:
+            for stage, h in sorted(self._hist.items()):
+                acc = 0
+                for i, le in enumerate(self.buckets + (float("inf"),)):
+                    acc += h[i]
+                    le_s = "+Inf" if le == float("inf") else repr(le / 1000)
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le_s}"}} {acc}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {h[-2] / 1000}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {h[-1]}')
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            lines += [f'{prefix}_events_total{{name="{k}"}} {v}' for k, v in sorted(self.counters.items())]
+            lines.append(f"# TYPE {prefix}_value gauge")
+            lines += [f'{prefix}_value{{name="{k}"}} {v}' for k, v in sorted(self.gauges.items())]
+        return "\n".join(lines) + "\n"
+
+class JsonLogSink:
+    """Una línea JSON por evento (para enviar a un colector de logs)."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._lock = threading.Lock()
+
+    def _emit(self, **rec) -> None:
+        line = json.dumps({"ts": round(time.time(), 3), **rec}, ensure_ascii=False)
+        with self._lock:
+            print(line, file=self.stream, flush=True)
+
+    def observe(self, stage: str, ms: float) -> None:
+        self._emit(type="timing", stage=stage, ms=round(ms, 3))
+
+    def incr(self, name: str, n: float = 1) -> None:
+        self._emit(type="counter", name=name, n=n)
+
+    def gauge(self, name: str, value: float) -> None:
+        self._emit(type="gauge", name=name, value=value)
+
+# ---------------------- API del módulo ----------------------
+_SINKS: List[Any] = []
+_NULL = nullcontext()
+
+def set_sinks(sinks: List[Any]) -> None:
+    global _SINKS
+    _SINKS = list(sinks)
+
+def configure(spec: str = METRICS_SINKS) -> None:
+    kinds = [k.strip() for k in (spec or "").split(",") if k.strip()]
+    set_sinks([HistogramSink() if k == "memory" else JsonLogSink() for k in kinds
+               if k in ("memory", "json")])
+
+def enabled() -> bool:
+    return bool(_SINKS)
+
+@contextmanager
+def _timer(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - t0) * 1000)
+
+def timed(stage: str):
+    """Context manager que mide la etapa; contexto nulo si las métricas están apagadas."""
+    return _timer(stage) if _SINKS else _NULL
+
+def observe(stage: str, ms: float) -> None:
+    for s in _SINKS:
+        s.observe(stage, ms)
+
+def incr(name: str, n: float = 1) -> None:
+    for s in _SINKS:
+        s.incr(name, n)
+
+def gauge(name: str, value: float) -> None:
+    for s in _SINKS:
+        s.gauge(name, value)
+
+def memory_sink() -> Optional[HistogramSink]:
+    return next((s for s in _SINKS if isinstance(s, HistogramSink)), None)
+
+def snapshot() -> Dict[str, Any]:
+    m = memory_sink()
+    return m.snapshot() if m else {}
+
+def prometheus_text() -> str:
+    m = memory_sink()
+    return m.prometheus_text() if m else ""
+
+configure()
@@ -0,0 +1,143 @@
+# app/procedures.py
+"""Procedimientos numerados de los instructivos, extraídos al indexar.
+
+ProcedureParser recibe las páginas en el mismo orden en que se trocean (feed) y arma
+registros ordenados:
+    {"section", "page", "steps": [{"n", "text", "page"}, ...]}
+Un paso es una línea "1. ...", "2) ..." o "Paso 03: ..."; las líneas siguientes se le
+suman hasta el próximo paso o título. Un procedimiento sigue mientras los números sean
+consecutivos; "1" (o un salto) abre uno nuevo. Se descartan encabezados/pies que se
+repiten en cada página, "Página N de M" y rótulos de figuras.
+"""
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+_STEP = re.compile(r"^\s*(?:paso\s*0*(\d{1,2})\s*[:.\-–]?|(\d{1,2})[.)])\s+(?!\d)(.+)$", re.I)
+_HEADING = re.compile(r"^\s*(?:\d+(?:\.\d+)+\.?\s+\S|[A-Z]\)\s+\S|pasos?\s+(?:para|a seguir)\b)", re.I)
+_NOISE = re.compile(r"^\s*(?:p[aá]gina\s+\d+(?:\s+de\s+\d+)?|\d+|\(?(?:ver\s+)?figura\s*\d*\b.*)\s*$", re.I)
+_FOOTER = re.compile(r"p[aá]gina\s+\d+\s+de\s+\d+\s*$", re.I)
+_ACTION = ("clic", "presion", "seleccion", "ingres", "escog", "digit", "registr", "envi", "deriv",
+           "archiv", "verific", "acept", "buscar", "boton", "opcion", "menu", "grab")
+_MAX_STEP_CHARS = 600
+
+def _fold(s: str) -> str:
+    return (s.lower().replace("á", "a").replace("é", "e").replace("í", "i")
+            .replace("ó", "o").replace("ú", "u"))
+
+def _is_upper_heading(line: str, min_letters: int = 8) -> bool:
+    letters = [c for c in line if c.isalpha()]
+    return len(letters) >= min_letters and sum(c.isupper() for c in letters) >= 0.8 * len(letters)
+
+class ProcedureParser:
+    def __init__(self):
+        self.procedures: List[Dict[str, Any]] = []
+        self._cur: Optional[Dict[str, Any]] = None
+        self._section = ""
+        self._open = False  # hay un paso abierto que recibe las líneas siguientes
+        self._in_heading = False  # la línea anterior fue un título (puede seguir en esta)
+        self._edges: set = set()  # líneas del borde de páginas anteriores (encabezado/pie)
+
+    def feed(self, page: Optional[int], text: str) -> None:
+        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+        edges = set(lines[:2] + lines[-2:])
+        for ln in lines:
+            if ln in self._edges or _NOISE.match(ln) or _FOOTER.search(ln):
+                continue
+            self._line(page, ln)
+        self._edges |= edges
+
+    def _line(self, page: Optional[int], ln: str) -> None:
+        m = _STEP.match(ln)
+        if self._in_heading and not m and not _HEADING.match(ln) and _is_upper_heading(ln, 3):
+            self._section = f"{self._section} {ln}".strip(" :")  # título en varias líneas
+            return
+        self._in_heading = False
+        if m and not _is_upper_heading(ln):
+            n = int(m.group(1) or m.group(2))
+            cur = self._cur
+            if cur is None or n != cur["steps"][-1]["n"] + 1:
+                cur = self._cur = {"section": self._section, "page": page, "steps": []}
+                self.procedures.append(cur)
+            cur["steps"].append({"n": n, "text": m.group(3).strip(), "page": page})
+            self._open = True
+            return
+        if _HEADING.match(ln) or _is_upper_heading(ln):
+            self._section = re.sub(r"\s+\d+$", "", ln).strip(" :")  # sin n° de página (índice)
+            self._open = False
+            self._in_heading = bool(_HEADING.match(ln))  # "A) PASOS PARA ..." puede partirse
+            return
+        if self._open:
+            step = self._cur["steps"][-1]
+            if len(step["text"]) < _MAX_STEP_CHARS:
+                step["text"] = f"{step['text']} {ln}"
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Procedimientos con al menos dos pasos y, en la mitad de ellos, alguna acción
+           (clic, seleccionar, ingresar...): así no entran listas de definiciones."""
+        out = []
+        for p in self.procedures:
+            steps = p["steps"]
+            if len(steps) < 2 or steps[0]["n"] != 1:
+                continue
+            acts = sum(any(a in _fold(s["text"]) for a in _ACTION) for s in steps)
+            if 2 * acts >= len(steps):
+                for s in steps:
+                    s["text"] = s["text"][:_MAX_STEP_CHARS]
+                out.append(p)
+        return out
+
+def extract_procedures(pages) -> List[Dict[str, Any]]:
+    parser = ProcedureParser()
+    for page, text in pages:
+        parser.feed(page, text)
+    return parser.close()
+
+# ---------------------- búsqueda ----------------------
+_STOP = {"como", "hago", "hacer", "puedo", "para", "los", "las", "del", "una", "uno", "que", "con",
+         "por", "sus", "debe", "usuario", "sistema", "paso", "pasos", "procedimiento"}
+
+def proc_terms(text: str) -> List[str]:
+    """Analizador del índice de procedimientos: sin tildes ni palabras vacías, y cada
+       palabra recortada a 5 letras (deriva/derivar/derivo -> "deriv")."""
+    return [t[:5] for t in re.findall(r"\w+", _fold(text)) if len(t) > 2 and t not in _STOP]
+
+def search_text(proc: Dict[str, Any], doc: str) -> str:
+    """Texto con el que se indexa un procedimiento: título (documento + sección) dos veces
+       para que pese más que los pasos."""
+    title = f"{re.sub(r'[_-]+', ' ', doc.rsplit('.', 1)[0])} {proc['section']}"
+    return " ".join([title, title] + [s["text"] for s in proc["steps"]])
+
+# ---------------------- formato ----------------------
+_STEP_REF = re.compile(r"\bpaso\s*0*(\d{1,2})\b", re.I)
+
+def step_number(q: str) -> Optional[int]:
+    """Número de paso mencionado en la pregunta ("¿eso es el paso 2?"), si hay."""
+    m = _STEP_REF.search(q or "")
+    return int(m.group(1)) if m else None
+
+def format_procedure(proc: Dict[str, Any], max_items: int = 8) -> str:
+    head = f"{proc['section']} ({proc['doc']}):" if proc.get("section") else f"{proc['doc']}:"
+    lines = [f"{s['n']}. {s['text']}" for s in proc["steps"][:max_items]]
+    if len(proc["steps"]) > max_items:
+        lines.append(f"… y {len(proc['steps']) - max_items} pasos más.")
+    return "\n".join([head] + lines)
+
+def procedure_source(proc: Dict[str, Any], step: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    page = (step or proc).get("page")
+    url = proc["url"] + (f"#page={page}" if page else "")
+    return {"name": proc["doc"], "path": url, "page": page}
+
+def find_step(proc: Dict[str, Any], n: int) -> Optional[Dict[str, Any]]:
+    return next((s for s in proc["steps"] if s["n"] == n), None)
+
+def confirm_step(proc: Dict[str, Any], n: Optional[int], last: int) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """Respuesta a "¿eso es el paso N?" sobre el procedimiento de la conversación."""
+    step = find_step(proc, n if n is not None else last)
+    if step is None:
+        total = len(proc["steps"])
+        return (f"«{proc['section'] or proc['doc']}» tiene {total} pasos; no hay un paso {n}. "
+                "¿Quieres que te los repita?"), None
+    nxt = find_step(proc, step["n"] + 1)
+    tail = (f" El siguiente es el paso {nxt['n']}: {nxt['text']}" if nxt
+            else " Es el último paso del procedimiento.")
+    return f"Sí: el paso {step['n']} de «{proc['section'] or proc['doc']}» es: {step['text'].rstrip('.')}.{tail}", step
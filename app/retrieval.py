@@ -1,16 +1,38 @@
 
 # app/retrieval.py
-import os, re, unicodedata
-from typing import List, Dict, Any, Tuple, Optional
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import os, re, sys, hashlib, unicodedata, threading, uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
 
 from app.config import (
     DOCS_DIR, KB_CSV, CHUNK_SIZE, CHUNK_OVERLAP,
-    TOP_K, MAX_WORDS, PUBLIC_DOC_BASE_URL
+    TOP_K, MAX_WORDS, PUBLIC_DOC_BASE_URL, DOCS_WATCH_INTERVAL, EXTRACT_WORKERS,
+    RETRIEVAL_MODE, BM25_K1, BM25_B, PROCEDURE_MIN_SCORE, INDEX_COMPACT, INDEX_HASH_BITS,
+    KB_COLUMNS, KB_MIN_SCORE, KB_EMOTIONAL_LABELS, LSA_DIM, LSA_TARGET_RECALL, LSA_IVF_MIN_ROWS,
+    BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_SHARE, BOILERPLATE_EDGE_LINES, BOILERPLATE_SAMPLE_PAGES,
+    NEAR_DUP_THRESHOLD, MINHASH_PERM
 )
-from app.document_reader import load_text_from_path
+from app.document_reader import iter_pages
+from app.compose import split_sentences
+from app.procedures import ProcedureParser, proc_terms, search_text
+from app.answer_cache import ANSWER_CACHE
+from app import metrics
+from app.scoring import build_postings, top_k, build_bm25, bm25_top_k, hash_cols
+from app.dense import build_lsa, lsa_top_k
+from app.dedup import strip_repeated_lines, minhash_signatures, near_duplicate_groups
+from app.index_store import (file_fingerprint, snapshot_key, load_snapshot, save_snapshot, load_shared,
+                             load_segments)
+from app.kbtable import KBTable, read_csv_columns
+from app.lazy import lazy_import
+
+# sklearn se importa recién al construir o consultar índices (ver app/lazy.py)
+_sk_text = lazy_import("sklearn.feature_extraction.text")
+_sk_pre = lazy_import("sklearn.preprocessing")
+_sk_utils = lazy_import("sklearn.utils")
 
 # ---------------------- utils ----------------------
 def _norm(s: str) -> str:
@@ -19,52 +41,237 @@ def _norm(s: str) -> str:
     s = re.sub(r"\s+", " ", s.lower()).strip()
     return s
 
+_WS = re.compile(r"\s+")
+
+def _iter_chunks(pieces: Iterable[Tuple[Optional[int], str]],
+                 size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> Iterator[Tuple[str, Optional[int], Optional[int]]]:
+    """Ventanas de `size` caracteres (paso size - overlap) sobre el texto con espacios
+       colapsados, a medida que llegan los trozos (página, texto). Da los mismos chunks
+       que trocear el documento completo, pero solo guarda el tramo aún no emitido.
+       Cada chunk sale con (página inicial, página final), o None si no hay páginas."""
+    step = max(1, size - overlap)
+    buf, base, pos = "", 0, 0   # buf = texto normalizado desde la posición absoluta `base`
+    pending_space = False       # espacio al final del último trozo, aún sin confirmar
+    spans = deque()             # (inicio, fin, página) de cada tramo de texto
+
+    def window(i):
+        a, b = i, i + size
+        pages = [pg for (s0, s1, pg) in spans if s0 < b and s1 > a and pg is not None]
+        return (buf[a - base:b - base],
+                min(pages) if pages else None, max(pages) if pages else None)
+
+    for page, text in pieces:
+        norm = _WS.sub(" ", text)
+        core = norm.strip(" ")
+        if not core:
+            pending_space = pending_space or bool(norm)
+            continue
+        if (pending_space or norm[0] == " ") and base + len(buf) > 0:
+            buf += " "
+        start = base + len(buf)
+        buf += core
+        spans.append((start, start + len(core), page))
+        pending_space = norm[-1] == " "
+
+        while pos + size <= base + len(buf):
+            yield window(pos)
+            pos += step
+        if pos > base:  # descarta lo que ninguna ventana futura va a usar
+            buf, base = buf[pos - base:], pos
+            while spans and spans[0][1] <= pos:
+                spans.popleft()
+
+    while pos < base + len(buf):
+        yield window(pos)
+        pos += step
+
 def _chunk_text(s: str, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP) -> List[str]:
-    s = re.sub(r"\s+", " ", s).strip()
-    out, i = [], 0
-    while i < len(s):
-        out.append(s[i:i+size])
-        i += max(1, size - overlap)
-    return out
+    return [ch for ch, _, _ in _iter_chunks([(None, s)], size, overlap)]
 
 def _cap_words(text: str, maxw: int = MAX_WORDS) -> str:
     w = (text or "").split()
     return " ".join(w[:maxw]) + ("..." if len(w) > maxw else "")
 
+_VECT_KW = dict(strip_accents="unicode", ngram_range=(1,2), token_pattern=r"(?u)\b\w+\b")
+_MAX_DF = 0.9
+@lru_cache(maxsize=1)
+def _analyzer():
+    return _sk_text.CountVectorizer(**_VECT_KW).build_analyzer()  # unigramas + bigramas, como los índices
+
+def _postings(index: dict):
+    """Vista invertida del índice; se arma y guarda si el índice llegó sin ella."""
+    P = index.get("postings")
+    if P is None:
+        P = index["postings"] = build_postings(index["X"])
+    return P
+
+def _rank(index: dict, query: str, k: int) -> np.ndarray:
+    """Top-k filas del índice según RETRIEVAL_MODE ("bm25" / "lsa" si el índice trae
+       esos datos; si no, coseno TF-IDF)."""
+    if RETRIEVAL_MODE == "bm25" and index.get("bm25"):
+        return bm25_top_k(index["bm25"], _analyzer()(_norm(query)), k)
+    v = index["vectorizer"].transform([_norm(query)])
+    if RETRIEVAL_MODE == "lsa" and index.get("lsa"):
+        return lsa_top_k(index["lsa"], v, k)
+    return top_k(v, _postings(index), k)
+
+def _maybe_bm25(counts, terms, hash_bits: int = 0) -> Optional[Dict[str,Any]]:
+    if RETRIEVAL_MODE != "bm25":
+        return None
+    return build_bm25(counts, terms, k1=BM25_K1, b=BM25_B, hash_bits=hash_bits)
+
+def _maybe_lsa(X) -> Optional[Dict[str,Any]]:
+    if RETRIEVAL_MODE != "lsa":
+        return None
+    with metrics.timed("build_lsa"):
+        return build_lsa(X, dim=LSA_DIM, target_recall=LSA_TARGET_RECALL, k=TOP_K,
+                         min_rows=LSA_IVF_MIN_ROWS)
+
+# ---------------------- modo compacto ----------------------
+# INDEX_COMPACT: X y postings son la misma matriz CSC en float32, los conteos de los
+# segmentos van en int32, los términos se internan (una sola copia de cada string entre
+# segmentos y vectorizador) y las oraciones se indexan por una clave de 8 bytes.
+# INDEX_HASH_BITS > 0: los términos se reemplazan por su hash desde la ingesta.
+# Los segmentos tampoco quedan en el índice en memoria: van al snapshot aparte
+# (save_snapshot) y _update_doc_index los relee solo si algo cambió.
+def _compact_counts(counts: sp.csr_matrix, terms: List[str]) -> Tuple[sp.csr_matrix, Optional[List[str]]]:
+    """Conteos de un segmento en la forma que se guarda según el modo."""
+    if INDEX_HASH_BITS:
+        c = counts.tocoo()
+        counts = sp.csr_matrix((c.data, (c.row, hash_cols(terms, INDEX_HASH_BITS)[c.col])),
+                               shape=(c.shape[0], 1 << INDEX_HASH_BITS))
+        terms = None
+    elif INDEX_COMPACT:
+        terms = [sys.intern(t) for t in terms]
+    if INDEX_COMPACT:
+        counts = counts.astype(np.int32)
+    return counts, terms
+
+def _sent_key(sent: str):
+    if not INDEX_COMPACT:
+        return sent
+    return int.from_bytes(hashlib.blake2b(sent.encode("utf-8"), digest_size=8).digest(), "little")
+
+class _HashedTfidf:
+    """Vectorizador del modo hash: mismo análisis que _VECT_KW, columna = hash del
+       término, IDF del corpus y norma l2. No guarda vocabulario."""
+
+    def __init__(self, bits: int, idf: np.ndarray):
+        self.bits = bits
+        self.idf_ = idf
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        mask, idf, murmurhash3_32 = (1 << self.bits) - 1, self.idf_, _sk_utils.murmurhash3_32
+        return _weighted_rows(texts, lambda tok: murmurhash3_32(tok, positive=True) & mask, idf)
+
+class _PlainTfidf:
+    """TF-IDF ya ajustado, reducido a vocabulario (dict) + idf (ndarray): es lo que se
+       guarda en el snapshot, así cargarlo no importa sklearn. El analizador (sklearn,
+       vía _analyzer) recién se arma en la primera consulta. Mismo resultado que
+       TfidfVectorizer.transform con norma l2."""
+
+    def __init__(self, vocabulary: Dict[str,int], idf: np.ndarray, analyzer=None, sublinear_tf: bool = False):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+        self.analyzer = analyzer  # None = el de _VECT_KW
+        self.sublinear_tf = sublinear_tf
+
+    @classmethod
+    def from_sklearn(cls, vect) -> "_PlainTfidf":
+        return cls({t: int(j) for t, j in vect.vocabulary_.items()}, np.asarray(vect.idf_, dtype=np.float64),
+                   analyzer=vect.analyzer if callable(vect.analyzer) else None,
+                   sublinear_tf=vect.sublinear_tf)
+
+    def transform(self, texts: List[str]) -> sp.csr_matrix:
+        return _weighted_rows(texts, self.vocabulary_.get, self.idf_, self.analyzer, self.sublinear_tf)
+
 # ---------------------- KB ----------------------
-def _load_kb_df() -> pd.DataFrame:
+def _load_kb() -> KBTable:
+    """CSV de la KB con los campos internos de KB_COLUMNS (pregunta, intencion, emocion,
+       respuesta, respuesta_emocional, link). Si falta la columna mapeada se usa la que
+       ya tenga el nombre interno (CSV antiguos); si tampoco está, el campo queda vacío."""
     if not KB_CSV or not os.path.isfile(KB_CSV):
-        return pd.DataFrame(columns=["pregunta","respuesta","link"])
-    df = pd.read_csv(KB_CSV)
-    for col in ["pregunta","respuesta","link"]:
-        if col not in df.columns:
-            df[col] = ""
-        df[col] = df[col].fillna("")
-    return df
-
-def _build_kb_index(df: pd.DataFrame):
-    if df.empty:
-        return {"vectorizer": None, "X": None, "df": df}
-    corpus = [_norm(f"{r.pregunta} || {r.respuesta}") for r in df.itertuples()]
-    vect = TfidfVectorizer(strip_accents="unicode", ngram_range=(1,2),
-                           max_df=0.9, min_df=1, token_pattern=r"(?u)\b\w+\b")
+        return KBTable.from_columns({f: [] for f in KB_COLUMNS})
+    raw = read_csv_columns(KB_CSV)
+    n = len(next(iter(raw.values()), []))
+    cols = {}
+    for field, col in KB_COLUMNS.items():
+        src = col if col in raw else field
+        cols[field] = raw[src] if src in raw else [""] * n
+    missing = [f for f in ("pregunta", "respuesta") if not any(cols[f])]
+    if missing and n:
+        print(f"[WARN] KB sin {', '.join(missing)}: revisa KB_COLUMNS ({list(raw)})")
+    return KBTable.from_columns(cols)
+
+def _build_kb_index(table: KBTable):
+    if not len(table):
+        return {"vectorizer": None, "X": None, "table": table}
+    corpus = [_norm(f"{p} || {r}") for p, r in zip(table["pregunta"], table["respuesta"])]
+    vect = _sk_text.TfidfVectorizer(max_df=_MAX_DF, min_df=1, **_VECT_KW)
     try:
         X = vect.fit_transform(corpus)
     except ValueError:
-        return {"vectorizer": None, "X": None, "df": df}
-    return {"vectorizer": vect, "X": X, "df": df}
+        return {"vectorizer": None, "X": None, "table": table}
+    counts, terms = None, None
+    if RETRIEVAL_MODE == "bm25":
+        cv = _sk_text.CountVectorizer(**_VECT_KW)
+        counts, terms = cv.fit_transform(corpus).tocsr(), cv.get_feature_names_out().tolist()
+    return {"vectorizer": _PlainTfidf.from_sklearn(vect), "X": X, "table": table,
+            "intents": _kb_intents(table, X, counts, terms)}
+
+def _kb_intents(table: KBTable, X: sp.csr_matrix, counts: Optional[sp.csr_matrix],
+                terms: Optional[List[str]]) -> Dict[str,Any]:
+    """Partición por intención: centroide l2 de cada intención (para clasificar la
+       consulta con un solo producto) y, por partición, sus filas y postings (o BM25)."""
+    label_of = np.array(list(table["intencion"]), dtype=object)
+    labels = sorted(set(label_of))
+    rows = [np.flatnonzero(label_of == lab) for lab in labels]
+    C = _sk_pre.normalize(sp.vstack([sp.csr_matrix(X[r].mean(axis=0)) for r in rows]).tocsr())
+    parts = []
+    for r in rows:
+        Xp = X[r]
+        parts.append({"rows": r, "X": Xp, "postings": build_postings(Xp),
+                      "bm25": _maybe_bm25(counts[r], terms) if counts is not None else None})
+    return {"labels": labels, "C": C, "parts": parts}
 
-def _query_kb(query: str, kb_index, top_n: int = 1):
+def _intent_scores(v: sp.csr_matrix, kb_index) -> np.ndarray:
+    """Coseno de la consulta (fila TF-IDF l2 de la KB) con el centroide de cada intención,
+       en el orden de kb_index["intents"]["labels"]."""
+    return (kb_index["intents"]["C"] @ v.T).toarray().ravel()
+
+def _query_kb(query: str, kb_index, top_n: int = 1, emotional: bool = False,
+              min_score: float = KB_MIN_SCORE):
+    """Mejor fila de la KB: la consulta se vectoriza una vez, se clasifica por el
+       centroide de intención más parecido y solo se busca en esa partición. None si
+       no hay KB o la pregunta más parecida no llega a min_score (coseno)."""
     if not kb_index or kb_index["vectorizer"] is None:
         return None
-    v = kb_index["vectorizer"].transform([_norm(query)])
-    sims = cosine_similarity(v, kb_index["X"]).ravel()
-    i = sims.argsort()[::-1][:top_n][0]
-    row = kb_index["df"].iloc[i]
+    q = _norm(query)
+    v = _tfidf_rows(kb_index["vectorizer"], [q])
+    intents = kb_index["intents"]
+    sims = _intent_scores(v, kb_index)
+    p = int(np.argmax(sims))
+    if sims[p] <= 0:
+        return None
+    part = intents["parts"][p]
+    if RETRIEVAL_MODE == "bm25" and part["bm25"]:
+        j = bm25_top_k(part["bm25"], _analyzer()(q), top_n)[:1]
+    else:
+        j = top_k(v, part["postings"], top_n)[:1]
+    if not len(j):
+        return None
+    score = float((part["X"][j[0]] @ v.T).toarray()[0, 0])
+    if score < min_score:
+        metrics.incr("kb.below_min_score")
+        return None
+    row = kb_index["table"].row(part["rows"][j[0]])
+    answer = row["respuesta_emocional"] if emotional and row["respuesta_emocional"] else row["respuesta"]
     return {
-        "pregunta": row.get("pregunta", ""),
-        "respuesta": row.get("respuesta", ""),
-        "link": row.get("link", "")
+        "pregunta": row["pregunta"],
+        "respuesta": answer,
+        "link": row["link"],
+        "intencion": intents["labels"][p],
+        "score": score,
     }
 
 # ---------------------- DOCS ----------------------
@@ -77,87 +284,536 @@ def _infer_doc_paths(root=DOCS_DIR) -> List[str]:
             out.append(os.path.join(root, f))
     return sorted(out)
 
-def _build_doc_index(paths: List[str]):
-    chunks, metas = [], []
-    for p in paths:
-        txt = load_text_from_path(p)
-        if not txt or not txt.strip():
-            print(f"[INFO] Sin texto útil: {p}")
-            continue
-        for k, ch in enumerate(_chunk_text(txt)):
-            chunks.append(_norm(ch))
-            metas.append({"name": os.path.basename(p), "path": p, "chunk_id": k})
+_META_FIELDS = ("doc", "chunk_id", "page_start", "page_end")
+
+def _empty_doc_index(segments=None):
+    # índice vacío pero válido
+    metas = {f: np.zeros(0, dtype=np.int32) for f in _META_FIELDS + ("alt_doc", "alt_page")}
+    metas["alt_ptr"] = np.zeros(1, dtype=np.int64)
+    return {"vectorizer": None, "X": None, "chunks": [], "docs": [], "metas": metas,
+            "segments": segments or {}}
+
+def _meta(doc_index: dict, i: int) -> Dict[str,Any]:
+    """Metadatos del chunk i. Se guardan como arreglos int32 (página 0 = sin página) con
+       un id de documento que apunta a doc_index["docs"] = [{"name", "path"}, ...].
+       "alts" son las otras ubicaciones de un chunk que tenía casi duplicados."""
+    m, docs = doc_index["metas"], doc_index["docs"]
+    doc = docs[m["doc"][i]]
+    a, b = m["alt_ptr"][i], m["alt_ptr"][i + 1]
+    alts = [{"name": docs[d]["name"], "path": docs[d]["path"], "page_start": int(pg) or None}
+            for d, pg in zip(m["alt_doc"][a:b], m["alt_page"][a:b])]
+    return {"name": doc["name"], "path": doc["path"], "chunk_id": int(m["chunk_id"][i]),
+            "page_start": int(m["page_start"][i]) or None, "page_end": int(m["page_end"][i]) or None,
+            "alts": alts}
 
+def _collapse_near_dups(segs: List[Dict[str,Any]], counts: sp.csr_matrix, chunks: List[str],
+                        metas: Dict[str,np.ndarray]) -> Tuple[sp.csr_matrix, List[str], Dict[str,np.ndarray]]:
+    """Deja un solo chunk por grupo de casi duplicados (el primero, en orden de ruta) y
+       le cuelga las ubicaciones (documento, página) de los demás en alt_*."""
+    n = len(chunks)
+    metas["alt_ptr"] = np.zeros(n + 1, dtype=np.int64)
+    metas["alt_doc"] = metas["alt_page"] = np.zeros(0, dtype=np.int32)
+    sigs = [seg.get("minhash") for seg in segs]
+    if not NEAR_DUP_THRESHOLD or any(s is None for s in sigs):
+        return counts, chunks, metas
+    rep = near_duplicate_groups(np.vstack(sigs), NEAR_DUP_THRESHOLD)
+    kept = np.flatnonzero(rep == np.arange(n))
+    if len(kept) == n:
+        return counts, chunks, metas
+    dropped = np.flatnonzero(rep != np.arange(n))
+    owner = np.searchsorted(kept, rep[dropped])  # fila nueva del representante
+    order = np.argsort(owner, kind="stable")
+    alt_ptr = np.zeros(len(kept) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(owner, minlength=len(kept)), out=alt_ptr[1:])
+    out = {f: metas[f][kept] for f in _META_FIELDS}
+    out.update(alt_ptr=alt_ptr, alt_doc=metas["doc"][dropped[order]],
+               alt_page=metas["page_start"][dropped[order]])
+    metrics.incr("ingest.near_dup_chunks", len(dropped))
+    return counts[kept], [chunks[i] for i in kept], out
+
+def _ingest_file(path: str, fp: Optional[Dict[str,Any]] = None, workers: int = 1) -> Dict[str,Any]:
+    """Extrae y trocea un archivo. El segmento guarda sus chunks y los conteos crudos de
+       términos, así el índice se puede recomponer sin volver a leer el archivo."""
+    seg = {"path": path, "name": os.path.basename(path), "fp": fp or file_fingerprint(path),
+           "chunks": [], "pages": [], "terms": [], "counts": None,
+           "sents": [], "sent_terms": [], "sent_counts": None, "procedures": [], "minhash": None}
+    parser = ProcedureParser()  # lee las mismas páginas que el troceo, en la misma pasada
+
+    def _pages():
+        for page, text in iter_pages(path, workers=workers):
+            parser.feed(page, text)  # el parser tiene su propio filtro de encabezados/pies
+            yield page, text
+
+    chunks, pages = [], []
+    clean = strip_repeated_lines(_pages(), BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_SHARE,
+                                 BOILERPLATE_EDGE_LINES, BOILERPLATE_SAMPLE_PAGES)
+    for ch, p0, p1 in _iter_chunks(clean):
+        chunks.append(_norm(ch))
+        pages.append((p0, p1))
+    seg["procedures"] = parser.close()
     if not chunks:
-        # índice vacío pero válido
-        return {"vectorizer": None, "X": None, "chunks": [], "metas": []}
+        print(f"[INFO] Sin texto útil: {path}")
+        return seg
+    if NEAR_DUP_THRESHOLD:
+        seg["minhash"] = minhash_signatures(chunks, MINHASH_PERM)
+    cv = _sk_text.CountVectorizer(**_VECT_KW)
+    try:
+        counts = cv.fit_transform(chunks)
+    except ValueError:  # chunks sin ningún token
+        return seg
+    counts, terms = _compact_counts(counts.tocsr(), cv.get_feature_names_out().tolist())
+    seg.update(chunks=chunks, pages=pages, terms=terms, counts=counts)
 
-    vect = TfidfVectorizer(strip_accents="unicode", ngram_range=(1,2),
-                           max_df=0.9, min_df=1, token_pattern=r"(?u)\b\w+\b")
+    # oraciones de los chunks (sin repetir: el solape las duplica) para los resúmenes
+    sents = list(dict.fromkeys(s for ch in chunks for s in split_sentences(ch)))
+    scv = _sk_text.CountVectorizer(**_VECT_KW)
     try:
-        X = vect.fit_transform(chunks)
+        sent_counts = scv.fit_transform(sents).tocsr()
     except ValueError:
-        return {"vectorizer": None, "X": None, "chunks": [], "metas": []}
-    return {"vectorizer": vect, "X": X, "chunks": chunks, "metas": metas}
+        return seg
+    sent_counts, sent_terms = _compact_counts(sent_counts, scv.get_feature_names_out().tolist())
+    seg.update(sents=[_sent_key(x) for x in sents], sent_counts=sent_counts, sent_terms=sent_terms)
+    return seg
+
+def _assemble_doc_index(segments: Dict[str, Dict[str,Any]]):
+    """Une los segmentos (en orden de ruta) y recalcula df/idf con las mismas reglas que
+       TfidfVectorizer(max_df=0.9, min_df=1): da la misma matriz que un fit desde cero."""
+    chunks, docs, metas, vocab, segs = [], [], {f: [] for f in _META_FIELDS}, {}, []
+    data, indices, indptr = [], [], [np.zeros(1, dtype=np.int64)]
+    for path in sorted(segments):
+        seg = segments[path]
+        if seg["counts"] is None:
+            continue
+        segs.append(seg)
+        c = seg["counts"]
+        data.append(c.data)
+        if INDEX_HASH_BITS:  # las columnas ya son globales
+            indices.append(c.indices)
+        else:  # columnas locales del segmento -> columnas del vocabulario global
+            cols = np.array([vocab.setdefault(t, len(vocab)) for t in seg["terms"]], dtype=np.int64)
+            indices.append(cols[c.indices])
+        indptr.append(c.indptr[1:] + indptr[-1][-1])
+        chunks.extend(seg["chunks"])
+        metas["doc"].append(np.full(len(seg["chunks"]), len(docs), dtype=np.int32))
+        metas["chunk_id"].append(np.arange(len(seg["chunks"]), dtype=np.int32))
+        metas["page_start"].append(np.array([p0 or 0 for p0, _ in seg["pages"]], dtype=np.int32))
+        metas["page_end"].append(np.array([p1 or 0 for _, p1 in seg["pages"]], dtype=np.int32))
+        docs.append({"name": seg["name"], "path": path})
+
+    n = len(chunks)
+    if not n or _MAX_DF * n < 1:  # mismo caso en que el fit de sklearn lanza ValueError
+        return _empty_doc_index(segments)
+    n_cols = (1 << INDEX_HASH_BITS) if INDEX_HASH_BITS else len(vocab)
+    counts = sp.csr_matrix((np.concatenate(data), np.concatenate(indices), np.concatenate(indptr)),
+                           shape=(n, n_cols))
+    counts.sum_duplicates()
+    counts, chunks, metas = _collapse_near_dups(segs, counts, chunks,
+                                                {f: np.concatenate(v) for f, v in metas.items()})
+    n = len(chunks)
+    df = np.bincount(counts.indices, minlength=n_cols)
+    keep = np.flatnonzero((df > 0) & (df <= _MAX_DF * n))
+    if not len(keep):
+        return _empty_doc_index(segments)
+
+    if INDEX_HASH_BITS:  # mismo ancho que el espacio de hash; idf 0 = columna descartada
+        idf = np.zeros(n_cols)
+        idf[keep] = np.log((1 + n) / (1 + df[keep])) + 1
+        vect, terms = _HashedTfidf(INDEX_HASH_BITS, idf), None
+        X = _sk_pre.normalize(counts.multiply(idf).tocsr())
+        X.eliminate_zeros()
+        to_col = np.where(idf > 0, np.arange(n_cols), -1)
+    else:
+        terms = np.array(list(vocab), dtype=object)
+        keep = keep[np.argsort(terms[keep])]  # orden alfabético, como get_feature_names_out
+        idf = np.log((1 + n) / (1 + df[keep])) + 1
+        vect = _PlainTfidf({t: j for j, t in enumerate(terms[keep].tolist())}, idf)
+        X = _sk_pre.normalize(counts[:, keep].multiply(idf).tocsr())
+        to_col = np.full(n_cols, -1, dtype=np.int64)
+        to_col[keep] = np.arange(len(keep))
+
+    if INDEX_COMPACT:  # solo la vista CSC, en float32: X y postings son el mismo objeto
+        postings = X = build_postings(X.astype(np.float32))
+    else:
+        postings = build_postings(X)
+    return {"vectorizer": vect, "X": X, "postings": postings,
+            "bm25": _maybe_bm25(counts, terms.tolist() if terms is not None else None, INDEX_HASH_BITS),
+            "lsa": _maybe_lsa(X),
+            "sentences": _assemble_sentences(segments, vocab, to_col, vect.idf_),
+            "procedures": _assemble_procedures(segments),
+            "chunks": chunks, "docs": docs, "metas": metas, "segments": segments}
+
+def _assemble_procedures(segments: Dict[str, Dict[str,Any]]) -> Dict[str,Any]:
+    """Procedimientos de todos los documentos + un TF-IDF propio (pocas filas, términos
+       recortados; ver procedures.proc_terms) para encontrarlos desde la consulta."""
+    items = []
+    for path in sorted(segments):
+        seg = segments[path]
+        for k, proc in enumerate(seg.get("procedures") or []):
+            items.append(dict(proc, doc=seg["name"], path=path, proc_id=f"{seg['name']}#{k}",
+                              url=_doc_url(seg["name"], path)))
+    vect, P = None, None
+    if items:
+        vect = _sk_text.TfidfVectorizer(analyzer=proc_terms, sublinear_tf=True)
+        try:
+            P = vect.fit_transform([search_text(p, p["doc"]) for p in items])
+            vect = _PlainTfidf.from_sklearn(vect)
+        except ValueError:
+            vect = None
+    return {"items": items, "vectorizer": vect, "P": P}
+
+def _assemble_sentences(segments: Dict[str, Dict[str,Any]], vocab: Dict[str,int],
+                        to_col: np.ndarray, idf: np.ndarray) -> Dict[str,Any]:
+    """Almacén de oraciones: {"lookup": clave de oración -> fila, "S": TF-IDF l2 con el
+       IDF del corpus}. to_col lleva cada columna de `vocab` (o del espacio de hash) a la
+       del índice final, o -1 si el término se descartó (max_df)."""
+    lookup, blocks = {}, []
+    for path in sorted(segments):
+        seg = segments[path]
+        if seg.get("sent_counts") is None:
+            continue
+        new = [k for k, sent in enumerate(seg["sents"]) if sent not in lookup]
+        for k in new:
+            lookup[seg["sents"][k]] = len(lookup)
+        c = seg["sent_counts"][new].tocoo()
+        if seg["sent_terms"] is None:  # modo hash
+            cols = to_col[c.col]
+        else:
+            cols = np.array([to_col[vocab[t]] if t in vocab else -1 for t in seg["sent_terms"]],
+                            dtype=np.int64)[c.col]
+        ok = cols >= 0
+        blocks.append(sp.csr_matrix((c.data[ok], (c.row[ok], cols[ok])), shape=(len(new), len(idf))))
+    S = sp.vstack(blocks).tocsr() if blocks else sp.csr_matrix((0, len(idf)))
+    S = _sk_pre.normalize(S.multiply(idf).tocsr())
+    return {"lookup": lookup, "S": S.astype(np.float32) if INDEX_COMPACT else S}
+
+def _ingest_many(todo: List[Tuple[str, Optional[Dict[str,Any]]]],
+                 workers: int = EXTRACT_WORKERS) -> Dict[str, Dict[str,Any]]:
+    """Ingresa varios archivos. Con workers > 1 reparte por archivo entre procesos (o por
+       páginas si hay uno solo). Los chunk_id son locales a cada archivo, así que el orden
+       final no depende de qué worker termine primero. Si un worker falla, ese archivo se
+       reintenta en serie; si vuelve a fallar se omite y se reintentará en la próxima
+       actualización."""
+    if workers <= 1 or len(todo) < 2:
+        return {p: _ingest_file(p, fp, workers=workers) for p, fp in todo}
+
+    out = {}
+    with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as ex:
+        futures = [(p, fp, ex.submit(_ingest_file, p, fp)) for p, fp in todo]
+        for p, fp, fut in futures:
+            try:
+                out[p] = fut.result()
+                continue
+            except Exception as e:
+                print(f"[WARN] Worker de extracción falló en {p}: {e}; reintento en serie")
+            try:
+                out[p] = _ingest_file(p, fp)
+            except Exception as e:
+                print(f"[ERROR] No se pudo ingerir {p}: {e}")
+    return out
+
+def _same_content(a: Optional[Dict[str,Any]], b: Optional[Dict[str,Any]]) -> bool:
+    return bool(a and b) and (a["size"], a["sha1"]) == (b["size"], b["sha1"])
+
+def _update_doc_index(base: Optional[dict], paths: List[str]):
+    """Reutiliza los segmentos cuyo contenido no cambió, extrae solo los nuevos o
+       modificados y descarta los que ya no están. Devuelve `base` si no hubo cambios.
+       El índice compartido (load_shared) y el compacto (save_snapshot con INDEX_COMPACT)
+       no traen segmentos sino las huellas de sus archivos ("files"): se comparan esas, y
+       si algo cambió los segmentos del resto se leen del disco (load_segments) en vez de
+       volver a extraerlos."""
+    old = (base or {}).get("segments") or {}
+    files = {p: seg["fp"] for p, seg in old.items()} if old else ((base or {}).get("files") or {})
+    fps = {p: file_fingerprint(p) for p in paths}
+    same = {p for p in paths if _same_content(files.get(p), fps[p])}
+    if base is not None and len(same) == len(paths) == len(files):
+        return base
+    if same and not old:
+        old = load_segments(base) or {}
+    segments, todo = {}, []
+    for p in paths:
+        fp, prev = fps[p], old.get(p)
+        if p in same and prev and _same_content(prev["fp"], fp):
+            segments[p] = dict(prev, fp=fp) if prev["fp"] != fp else prev
+            continue
+        todo.append((p, fp))
+    if todo:
+        with metrics.timed("ingest_files"):
+            segments.update(_ingest_many(todo))
+        metrics.incr("docs.ingested", len(todo))
+    with metrics.timed("assemble_doc_index"):
+        return _assemble_doc_index(segments)
+
+def _build_doc_index(paths: List[str]):
+    with metrics.timed("build_doc_index"):
+        return _update_doc_index(None, paths)
+
+def _doc_url(name: str, path: str) -> str:
+    return f"{PUBLIC_DOC_BASE_URL}/{name}" if PUBLIC_DOC_BASE_URL else path
+
+def _find_procedure(query: str, doc_index, min_score: float = PROCEDURE_MIN_SCORE) -> Optional[Dict[str,Any]]:
+    store = (doc_index or {}).get("procedures")
+    if not store or store["P"] is None:
+        return None
+    scores = (store["P"] @ store["vectorizer"].transform([query]).T).toarray().ravel()
+    best = int(np.argmax(scores))
+    return store["items"][best] if scores[best] >= min_score else None
 
 def _retrieve_docs(query: str, doc_index, k: int = TOP_K) -> Tuple[str, List[Dict[str,Any]]]:
     if (not doc_index) or (not doc_index.get("chunks")) or (doc_index.get("vectorizer") is None):
         return "", []
-    v = doc_index["vectorizer"].transform([_norm(query)])
-    sims = cosine_similarity(v, doc_index["X"]).ravel()
-    order = sims.argsort()[::-1][:k]
+    order = _rank(doc_index, query, k)
 
     joined = " ".join([doc_index["chunks"][i] for i in order[:2]])  # resumen con 2 top
     sources, seen = [], set()
     for i in order:
-        m = doc_index["metas"][i]
-        name = m["name"]
-        if name in seen: 
-            continue
-        seen.add(name)
-        url = f"{PUBLIC_DOC_BASE_URL}/{name}" if PUBLIC_DOC_BASE_URL else m["path"]
-        sources.append({"name": name, "path": url})
+        m = _meta(doc_index, i)
+        for loc in [m] + m["alts"]:  # el chunk y las ubicaciones de sus casi duplicados
+            name = loc["name"]
+            if name in seen:
+                continue
+            seen.add(name)
+            url = _doc_url(name, loc["path"])
+            page = loc.get("page_start")
+            if page:  # enlace directo a la página (visores de PDF: #page=N)
+                url = f"{url}#page={page}"
+            sources.append({"name": name, "path": url, "page": page})
     return joined, sources
 
+def _index_gauges(doc_index: Optional[dict], kb_index: Optional[dict]) -> None:
+    if not metrics.enabled():
+        return
+    for name, index in (("doc_index", doc_index), ("kb_index", kb_index)):
+        X = (index or {}).get("X")
+        metrics.gauge(f"{name}.rows", X.shape[0] if X is not None else 0)
+        metrics.gauge(f"{name}.vocab", X.shape[1] if X is not None else 0)
+        metrics.gauge(f"{name}.nnz", X.nnz if X is not None else 0)
+    doc_index = doc_index or {}
+    metrics.gauge("doc_index.files", len(doc_index.get("segments") or doc_index.get("files") or {}))
+
+def _tfidf_rows(vect, texts: List[str]) -> sp.csr_matrix:
+    """Filas TF-IDF de `texts` con el vectorizador de un índice (_PlainTfidf o _HashedTfidf)."""
+    return vect.transform(texts)
+
+def _weighted_rows(texts: List[str], col_of, idf: np.ndarray, analyze=None,
+                   sublinear_tf: bool = False) -> sp.csr_matrix:
+    """Filas tf * idf normalizadas (l2); col_of(término) da la columna o None.
+       sublinear_tf: tf = 1 + log(tf), como en TfidfVectorizer."""
+    data, indices, indptr, analyze = [], [], [0], analyze or _analyzer()
+    for t in texts:
+        cols = {}
+        for tok in analyze(t):
+            j = col_of(tok)
+            if j is not None and idf[j] > 0:  # idf 0 = término fuera del índice (modo hash)
+                cols[j] = cols.get(j, 0) + 1
+        js = np.array(sorted(cols), dtype=np.int64)
+        tf = np.array([cols[j] for j in js], dtype=np.float64)
+        w = (1 + np.log(tf) if sublinear_tf else tf) * idf[js]
+        norm = np.sqrt(w @ w)
+        indices.append(js)
+        data.append(w / norm if norm else w)
+        indptr.append(indptr[-1] + len(js))
+    return sp.csr_matrix((np.concatenate(data), np.concatenate(indices), indptr),
+                         shape=(len(texts), len(idf)))
+
+def _sentence_vectors(sents: List[str], doc_index) -> Optional[sp.csr_matrix]:
+    """Filas TF-IDF (IDF del corpus, l2) de `sents`: las oraciones indexadas salen del
+       almacén; las demás (bloque de la KB, cortes entre chunks) se transforman con el
+       vectorizador del índice, sin ajustar nada. None si no hay índice documental."""
+    store = (doc_index or {}).get("sentences")
+    if not store or doc_index.get("vectorizer") is None:
+        return None
+    lookup, S = store["lookup"], store["S"]
+    rows = [lookup.get(_sent_key(x), -1) for x in sents]
+    missing = [i for i, r in enumerate(rows) if r < 0]
+    if not missing:
+        return S[rows]
+    hits = [i for i, r in enumerate(rows) if r >= 0]
+    extra = _tfidf_rows(doc_index["vectorizer"], [sents[i] for i in missing])
+    out = sp.vstack([S[[rows[i] for i in hits]], extra]).tocsr()
+    return out[np.argsort(hits + missing)]  # de vuelta al orden de `sents`
+
 # ---------------------- API pública del módulo ----------------------
 _DOC_INDEX = None
 _KB_INDEX  = None
+_INDEX_LOCK = threading.RLock()  # serializa reconstrucciones; las lecturas no lo necesitan
 
-def init_indexes():
+def init_indexes(use_cache: bool = True, use_shared: bool = True):
     """Construye índices (tolerante a vacíos) y también los deja en variables globales.
-       Devuelve (_DOC_INDEX, _KB_INDEX) para quien quiera usarlos explícitamente."""
+       Devuelve (_DOC_INDEX, _KB_INDEX) para quien quiera usarlos explícitamente.
+       Con INDEX_SHARED_DIR abre el índice compartido (mmap) si está al día. Si no,
+       parte del snapshot en disco si existe y solo reprocesa los documentos nuevos o
+       modificados (y la KB si cambió); use_cache=False fuerza la reconstrucción."""
     global _DOC_INDEX, _KB_INDEX
-    doc_paths = _infer_doc_paths()
-    _DOC_INDEX = _build_doc_index(doc_paths)
+    with _INDEX_LOCK:
+        key = snapshot_key()
+        shared = load_shared(key, _infer_doc_paths(), KB_CSV or None) if use_shared else None
+        if shared is not None:
+            # sin segmentos: si luego cambia un documento, update_doc_index extrae solo ese
+            # (el resto sale del build) y el índice nuevo queda en memoria propia del proceso;
+            # lo normal es volver a correr app.build_index
+            _DOC_INDEX, _KB_INDEX = shared
+            ANSWER_CACHE.clear()
+            _index_gauges(_DOC_INDEX, _KB_INDEX)
+            return _DOC_INDEX, _KB_INDEX
+
+        prev_doc, prev_kb = (load_snapshot(key) if use_cache else None) or (None, None)
+
+        doc_index = _update_doc_index(prev_doc, _infer_doc_paths())
 
-    kb_df = _load_kb_df()
-    _KB_INDEX = _build_kb_index(kb_df)
+        kb_fp = file_fingerprint(KB_CSV) if KB_CSV else None
+        if prev_kb is not None and prev_kb.get("fp") == kb_fp:
+            kb_index = prev_kb
+        else:
+            kb_index = _build_kb_index(_load_kb())
+            kb_index["fp"] = kb_fp
 
+        if doc_index is not prev_doc or kb_index is not prev_kb:
+            doc_index = save_snapshot(key, doc_index, kb_index)  # compacto: sin segmentos
+        _DOC_INDEX, _KB_INDEX = doc_index, kb_index
+        ANSWER_CACHE.clear()
+        _index_gauges(doc_index, kb_index)
     return _DOC_INDEX, _KB_INDEX
 
+def update_doc_index(paths: Optional[List[str]] = None) -> bool:
+    """Ingesta incremental sobre el índice global. `paths` es el conjunto completo de
+       documentos (por defecto, lo que hay en DOCS_DIR): se extraen solo los nuevos o
+       modificados y se quitan las filas de los que faltan. El índice nuevo se arma
+       aparte y se publica con una sola asignación, así ninguna consulta ve uno a medias.
+       Devuelve True si hubo cambios."""
+    global _DOC_INDEX
+    with _INDEX_LOCK:
+        paths = _infer_doc_paths() if paths is None else sorted(paths)
+        new_index = _update_doc_index(_DOC_INDEX, paths)
+        if new_index is _DOC_INDEX:
+            return False
+        _DOC_INDEX = save_snapshot(snapshot_key(), new_index, _KB_INDEX)  # compacto: sin segmentos
+        ANSWER_CACHE.clear()
+        _index_gauges(_DOC_INDEX, _KB_INDEX)
+    return True
+
+# ---------------------- watcher de DOCS_DIR ----------------------
+_WATCHER: Optional[threading.Thread] = None
+_WATCH_STOP = threading.Event()
+
+def _dir_signature(root: str) -> Tuple:
+    sig = []
+    for p in _infer_doc_paths(root):
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue
+        sig.append((p, st.st_size, st.st_mtime_ns))
+    return tuple(sig)
+
+def _indexed_signature() -> Tuple:
+    """_dir_signature de los archivos tal como los vio el índice global al armarse."""
+    index = _DOC_INDEX or {}
+    fps = {p: seg["fp"] for p, seg in (index.get("segments") or {}).items()} or (index.get("files") or {})
+    return tuple((p, fp["size"], fp["mtime_ns"]) for p, fp in sorted(fps.items()) if fp)
+
+def start_docs_watcher(interval: float = DOCS_WATCH_INTERVAL, root: str = DOCS_DIR) -> bool:
+    """Hilo que revisa `root` cada `interval` segundos (solo os.stat) y llama a
+       update_doc_index() cuando algo cambia. interval <= 0 lo desactiva. La primera
+       comparación es contra los archivos del índice ya cargado, así arrancar no dispara
+       una actualización y un cambio ocurrido durante la carga no se pierde."""
+    global _WATCHER
+    if interval <= 0 or (_WATCHER is not None and _WATCHER.is_alive()):
+        return False
+    _WATCH_STOP.clear()
+
+    def _loop():
+        last = _indexed_signature()
+        while not _WATCH_STOP.wait(interval):
+            sig = _dir_signature(root)
+            if sig == last:
+                continue
+            last = sig
+            try:
+                if update_doc_index(_infer_doc_paths(root)):
+                    print(f"[INFO] Índice documental actualizado ({len(sig)} archivos)")
+            except Exception as e:
+                print(f"[WARN] Falló la actualización incremental del índice: {e}")
+
+    _WATCHER = threading.Thread(target=_loop, name="gobi-docs-watcher", daemon=True)
+    _WATCHER.start()
+    return True
+
+def stop_docs_watcher() -> None:
+    _WATCH_STOP.set()
+
+def _version(index: Optional[dict]) -> Optional[str]:
+    """Identificador único de un índice construido (para las claves de caché)."""
+    if index is None:
+        return None
+    return index.setdefault("version", uuid.uuid4().hex[:12])
+
+def index_version(DOC_INDEX: Optional[dict]=None, KB_INDEX: Optional[dict]=None) -> Tuple:
+    """Versión de los índices (por defecto, los globales). Cambia con cada reconstrucción."""
+    return (_version(DOC_INDEX if DOC_INDEX is not None else _DOC_INDEX),
+            _version(KB_INDEX if KB_INDEX is not None else _KB_INDEX))
+
+def find_procedure(query: str, DOC_INDEX: Optional[dict]=None) -> Optional[Dict[str,Any]]:
+    """Procedimiento indexado más parecido a la consulta ("cómo hago..."), o None si
+       ninguno supera PROCEDURE_MIN_SCORE."""
+    return _find_procedure(query, DOC_INDEX if DOC_INDEX is not None else _DOC_INDEX)
+
+def sentence_vectors(sents: List[str], DOC_INDEX: Optional[dict]=None) -> Optional[sp.csr_matrix]:
+    """Vectores de oraciones para compose.summarize_text (por defecto, índice global)."""
+    return _sentence_vectors(sents, DOC_INDEX if DOC_INDEX is not None else _DOC_INDEX)
+
+def answer_parts(query: str,
+                 DOC_INDEX: Optional[dict]=None,
+                 KB_INDEX: Optional[dict]=None,
+                 max_words: int = MAX_WORDS,
+                 emotion: Optional[str] = None) -> Tuple[str, str, List[Dict[str,Any]]]:
+    """(respuesta de la KB, texto documental, fuentes), por separado: la respuesta de la
+       KB se muestra tal cual y solo el texto documental (recortado a max_words) pasa
+       por el resumen. Índices por defecto: los globales de init_indexes().
+       `emotion` es la etiqueta ya detectada (app.emotion_ml): si está en
+       KB_EMOTIONAL_LABELS se usa la respuesta emocional de la KB.
+       Se guardan en ANSWER_CACHE por (consulta normalizada, versión de los índices,
+       modo de ranking, max_words, respuesta emocional o no)."""
+    d_index = DOC_INDEX if DOC_INDEX is not None else _DOC_INDEX
+    k_index = KB_INDEX  if KB_INDEX  is not None else _KB_INDEX
+    emotional = emotion in KB_EMOTIONAL_LABELS
+    key = ("answer", _norm(query), _version(d_index), _version(k_index), RETRIEVAL_MODE, max_words, emotional)
+    with metrics.timed("answer_with_sources"):
+        return ANSWER_CACHE.get_or_compute(key, lambda: _answer_parts(query, d_index, k_index, max_words, emotional))
+
 def answer_with_sources(query: str,
                         DOC_INDEX: Optional[dict]=None,
                         KB_INDEX: Optional[dict]=None,
-                        max_words: int = MAX_WORDS) -> Tuple[str, List[Dict[str,Any]]]:
+                        max_words: int = MAX_WORDS,
+                        emotion: Optional[str] = None) -> Tuple[str, List[Dict[str,Any]]]:
     """Puede usarse de dos formas:
        - answer_with_sources(q, DOC_INDEX, KB_INDEX)
-       - answer_with_sources(q)  # usa los índices globales creados por init_indexes()"""
-    d_index = DOC_INDEX if DOC_INDEX is not None else _DOC_INDEX
-    k_index = KB_INDEX  if KB_INDEX  is not None else _KB_INDEX
+       - answer_with_sources(q)  # usa los índices globales creados por init_indexes()
+       Texto crudo (KB + "Resumen documental: " + documentos) y fuentes; ver answer_parts."""
+    return _combine(*answer_parts(query, DOC_INDEX, KB_INDEX, max_words, emotion), max_words)
 
-    kb_best = _query_kb(query, k_index)
-    doc_text, doc_sources = _retrieve_docs(query, d_index)
-
-    kb_block = kb_best["respuesta"] if kb_best else ""
-    combined = (kb_block + ("\n\nResumen documental: " + doc_text if doc_text else "")).strip()
-    final = _cap_words(combined, max_words)
+def _answer_parts(query: str, d_index: Optional[dict], k_index: Optional[dict],
+                  max_words: int, emotional: bool = False) -> Tuple[str, str, List[Dict[str,Any]]]:
+    with metrics.timed("query_kb"):
+        kb_best = _query_kb(query, k_index, emotional=emotional)
+    with metrics.timed("retrieve_docs"):
+        doc_text, doc_sources = _retrieve_docs(query, d_index)
 
     sources = []
     if kb_best and kb_best.get("link"):
         sources.append({"name": "KB", "path": kb_best["link"]})
     sources.extend(doc_sources)
+    kb_block = (kb_best["respuesta"] if kb_best else "").strip()
+    return kb_block, _cap_words(doc_text, max_words) if doc_text.strip() else "", sources
 
+def _combine(kb_block: str, doc_text: str, sources: List[Dict[str,Any]],
+             max_words: int) -> Tuple[str, List[Dict[str,Any]]]:
+    combined = (kb_block + ("\n\nResumen documental: " + doc_text if doc_text else "")).strip()
+    final = _cap_words(combined, max_words)
     if not final.strip():  # corpus vacío
         return ("Por el momento no cuento con la información necesaria para responderte, ¿tienes alguna otra duda?"
                 " si no, pregúnta algo sobre mi"), []
     return final, sources
+
+def _answer(query: str, d_index: Optional[dict], k_index: Optional[dict],
+            max_words: int, emotional: bool = False) -> Tuple[str, List[Dict[str,Any]]]:
+    return _combine(*_answer_parts(query, d_index, k_index, max_words, emotional), max_words)
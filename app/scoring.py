@@ -0,0 +1,118 @@
+# app/scoring.py
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import numpy as np
+import scipy.sparse as sp
+
+from app.lazy import lazy_import
+
+_sk_utils = lazy_import("sklearn.utils")
+
+# Motor de top-k sobre los índices. En lugar de puntuar todo el corpus, usa listas de
+# postings por término (vista CSC) y solo toca las filas que comparten algún término
+# con la consulta; luego elige el top-k con selección parcial.
+#  - TF-IDF: filas L2-normalizadas, así que el producto punto ya es el coseno.
+#  - BM25: el peso de cada posting (idf * tf saturado) se precalcula al construir.
+
+def build_postings(X) -> sp.csc_matrix:
+    """Vista invertida de X: la columna t lista las filas (chunks) que contienen t."""
+    P = sp.csc_matrix(X)
+    P.sort_indices()
+    return P
+
+def _gather(indptr, rows_arr, data, cols, w) -> Tuple[np.ndarray, np.ndarray]:
+    """Suma w[j] * data de los postings de cada columna cols[j], agrupando por fila."""
+    starts = indptr[cols]
+    lens = indptr[cols + 1] - starts
+    total = int(lens.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    # posiciones de todos los postings de los términos de la consulta, sin bucle Python
+    offs = np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(total)
+    rows = rows_arr[offs]
+    vals = data[offs] * np.repeat(w, lens)
+    uniq, inv = np.unique(rows, return_inverse=True)
+    return uniq, np.bincount(inv, weights=vals)
+
+def score_query(q, postings: sp.csc_matrix) -> Tuple[np.ndarray, np.ndarray]:
+    """(filas, puntajes) de las filas con puntaje > 0 para la consulta q (fila 1×V)."""
+    q = sp.csr_matrix(q)
+    return _gather(postings.indptr, postings.indices, postings.data, q.indices, q.data)
+
+def select_top_k(rows: np.ndarray, scores: np.ndarray, n: int, k: int) -> np.ndarray:
+    """Las k mejores filas, de mayor a menor puntaje. Los empates se rompen por fila mayor
+       primero (como un argsort estable invertido). Si hay menos de k filas puntuadas, se
+       completa con las demás (puntaje 0) en ese mismo orden."""
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if len(rows) > k:
+        # selección parcial O(m): umbral = k-ésimo mayor puntaje; se toman todos los que
+        # lo superan y, entre los empatados en el umbral, las filas mayores
+        thr = np.partition(scores, len(scores) - k)[len(scores) - k]
+        above = scores > thr
+        tied = np.flatnonzero(scores == thr)[::-1][:k - int(above.sum())]
+        sel = np.concatenate([np.flatnonzero(above), tied])
+        rows, scores = rows[sel], scores[sel]
+    out = rows[np.lexsort((-rows, -scores))].astype(np.int64)
+
+    if len(out) < k:  # relleno con puntaje 0, de la última fila hacia atrás
+        taken = set(out.tolist())
+        fill, r = [], n - 1
+        while len(fill) < k - len(out):
+            if r not in taken:
+                fill.append(r)
+            r -= 1
+        out = np.concatenate([out, np.array(fill, dtype=np.int64)])
+    return out
+
+def top_k(q, postings: sp.csc_matrix, k: int) -> np.ndarray:
+    """Índices de las k filas con mayor coseno, de mayor a menor. Mismo orden que
+       `cosine_similarity(q, X).ravel().argsort()[::-1][:k]` (ver select_top_k)."""
+    rows, scores = score_query(q, postings)
+    return select_top_k(rows, scores, postings.shape[0], k)
+
+def hash_cols(terms: Iterable[str], bits: int) -> np.ndarray:
+    """Columna de cada término en un espacio de 2**bits (murmurhash3, sin signo)."""
+    mask, murmurhash3_32 = (1 << bits) - 1, _sk_utils.murmurhash3_32
+    return np.array([murmurhash3_32(t, positive=True) & mask for t in terms], dtype=np.int64)
+
+# ---------------------- BM25 ----------------------
+def build_bm25(counts, terms: Optional[List[str]], k1: float = 1.5, b: float = 0.75,
+               hash_bits: int = 0) -> Dict[str, Any]:
+    """Precalcula BM25 en arreglos planos: para cada término (columna de `counts`), sus
+       filas y el impacto idf * tf*(k1+1) / (tf + k1*(1 - b + b*dl/avgdl)).
+       Con hash_bits > 0 las columnas ya son hashes (ver hash_cols) y no hay vocabulario."""
+    C = sp.csc_matrix(counts, dtype=np.float32)
+    C.sort_indices()
+    n = C.shape[0]
+    doc_len = np.asarray(C.sum(axis=1)).ravel().astype(np.float32)
+    avgdl = float(doc_len.mean()) if n else 0.0
+    df = np.diff(C.indptr)
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    tf = C.data
+    rows = C.indices.astype(np.int32)
+    norm = k1 * (1 - b + b * doc_len[rows] / max(avgdl, 1e-9))
+    cols = np.repeat(np.arange(C.shape[1]), df)
+    impact = (idf[cols] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+    return {
+        "vocab": {t: j for j, t in enumerate(terms)} if not hash_bits else None,
+        "hash_bits": hash_bits,
+        "indptr": C.indptr.astype(np.int64),
+        "rows": rows,
+        "impact": impact,
+        "idf": idf,
+        "doc_len": doc_len,
+        "n": n,
+        "k1": k1, "b": b,
+    }
+
+def bm25_top_k(bm25: Dict[str, Any], tokens: List[str], k: int) -> np.ndarray:
+    """Top-k BM25 para los tokens de la consulta (cada término distinto cuenta una vez)."""
+    vocab = bm25["vocab"]
+    if vocab is None:
+        cols = np.unique(hash_cols(tokens, bm25["hash_bits"]))
+    else:
+        cols = np.array(sorted({vocab[t] for t in tokens if t in vocab}), dtype=np.int64)
+    rows, scores = _gather(bm25["indptr"], bm25["rows"], bm25["impact"], cols, np.ones(len(cols)))
+    return select_top_k(rows, scores, bm25["n"], k)
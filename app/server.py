@@ -0,0 +1,184 @@
+# app/server.py
+"""Servicio HTTP asíncrono de GOBI, sin Streamlit (p. ej. para el bot de Telegram).
+
+    python -m app.server [--host 127.0.0.1] [--port 8000] [--workers 4]
+
+Rutas:
+  GET  /health  -> estado de índices, modelos y caché
+  GET  /metrics -> métricas por etapa en formato Prometheus (con GOBI_METRICS=memory)
+  POST /chat    {"text": "...", "session": "id opcional"}
+                -> {"answer", "sources", "emotion": {"label", "info"}, "route"}
+
+El event loop solo atiende sockets; ChatEngine.reply (CPU) corre en un pool de hilos
+acotado, así todas las peticiones comparten la única copia de índices y modelos del
+proceso. Si hay más de max_pending peticiones en vuelo se responde 503.
+"""
+import argparse, asyncio, json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_MAX_PENDING
+from app.engine import ChatEngine, get_engine
+from app.retrieval import index_version
+from app.emotion_ml import warmup_status
+from app.answer_cache import ANSWER_CACHE
+from app import metrics
+
+_MAX_BODY = 64 * 1024
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+class ChatServer:
+    def __init__(self, engine: ChatEngine, workers: int = SERVER_WORKERS,
+                 max_pending: int = SERVER_MAX_PENDING, max_sessions: int = 10000):
+        self.engine = engine
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gobi-chat")
+        self.max_pending = max_pending
+        self.pending = 0  # solo se toca desde el event loop
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    # ---------------------- rutas ----------------------
+    def _session(self, sid: Optional[str]) -> Dict[str, Any]:
+        if not sid:
+            return {}
+        state = self.sessions.pop(sid, None) or {}
+        self.sessions[sid] = state
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+        return state
+
+    async def _chat(self, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "JSON inválido"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "JSON inválido: se espera un objeto"}
+        text, sid = payload.get("text"), payload.get("session")
+        if not isinstance(text, str) or not text.strip():
+            return 400, {"error": "falta 'text' (texto no vacío)"}
+        if sid is not None and not isinstance(sid, str):
+            return 400, {"error": "'session' debe ser texto"}
+        if self.pending >= self.max_pending:
+            return 503, {"error": "servidor ocupado, reintenta en unos segundos"}
+
+        text, session = text.strip(), self._session(sid)
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            res = await loop.run_in_executor(self.executor, self.engine.reply, text, session)
+        finally:
+            self.pending -= 1
+        label, info = res["emotion"]
+        return 200, {"answer": res["answer"], "sources": res["sources"],
+                     "emotion": {"label": label, "info": info}, "route": res["route"]}
+
+    def _health(self) -> Tuple[int, Dict[str, Any]]:
+        doc_v, kb_v = index_version()
+        return 200, {"status": "ok", "index_version": {"docs": doc_v, "kb": kb_v},
+                     "emotion_models": warmup_status(), "pending": self.pending,
+                     "answer_cache": ANSWER_CACHE.stats()}
+
+    async def _route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        path = path.split("?", 1)[0]
+        if path == "/health":
+            return self._health() if method == "GET" else (405, {"error": "usa GET"})
+        if path == "/metrics":
+            if method != "GET":
+                return 405, {"error": "usa GET"}
+            if metrics.memory_sink() is None:
+                return 404, {"error": "métricas desactivadas (GOBI_METRICS=memory)"}
+            return 200, metrics.prometheus_text()
+        if path == "/chat":
+            return await self._chat(body) if method == "POST" else (405, {"error": "usa POST"})
+        return 404, {"error": f"ruta desconocida: {path}"}
+
+    # ---------------------- HTTP/1.1 mínimo ----------------------
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:  # keep-alive: varias peticiones por conexión
+                try:
+                    line = await reader.readline()
+                    headers = await self._read_headers(reader) if line else {}
+                except (ValueError, asyncio.LimitOverrunError):  # línea más larga que el límite del reader
+                    await self._send(writer, 400, {"error": "línea de petición o cabecera demasiado larga"},
+                                     close=True)
+                    break
+                if not line:
+                    break
+                try:
+                    method, path, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "línea de petición inválida"}, close=True)
+                    break
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Content-Length inválido"}, close=True)
+                    break
+                close = headers.get("connection", "").lower() == "close" or version == "HTTP/1.0"
+                if length > _MAX_BODY:
+                    await self._send(writer, 413, {"error": "cuerpo demasiado grande"}, close=True)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    status, payload = await self._route(method.upper(), path, body)
+                except Exception as e:
+                    print(f"[ERROR] {method} {path}: {e}")
+                    status, payload = 500, {"error": "error interno"}
+                await self._send(writer, status, payload, close=close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers = {}
+        while True:
+            h = await reader.readline()
+            if h in (b"\r\n", b"\n", b""):
+                return headers
+            k, _, v = h.decode("latin-1").partition(":")
+            headers[k.strip().lower()] = v.strip()
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, payload: Any, close: bool):
+        if isinstance(payload, str):  # texto plano (p. ej. /metrics)
+            data, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            data, ctype = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {ctype}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def serve(self, host: str = SERVER_HOST, port: int = SERVER_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"[INFO] GOBI escuchando en http://{host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+def main():
+    ap = argparse.ArgumentParser(description="Servicio HTTP de GOBI")
+    ap.add_argument("--host", default=SERVER_HOST)
+    ap.add_argument("--port", type=int, default=SERVER_PORT)
+    ap.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    ap.add_argument("--max-pending", type=int, default=SERVER_MAX_PENDING)
+    a = ap.parse_args()
+    srv = ChatServer(get_engine(), workers=a.workers, max_pending=a.max_pending)
+    try:
+        asyncio.run(srv.serve(a.host, a.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
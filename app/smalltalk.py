@@ -1,6 +1,8 @@
 import re
 from typing import Optional
 
+from app.textrules import RuleSet, KeywordSet
+
 # Patrones estrictos: anclados y pensados para frases cortas
 SMALLTALK_PATTERNS = [
     (re.compile(r"^\s*(hola|buenas|buenos dias|buenas tardes|buenas noches)\s*$", re.I),
@@ -24,9 +26,12 @@ DOMAIN_HINTS = {
     "perfil","instructivo","consulta","módulo","modulo"
 }
 
+# Compilados una vez: una sola búsqueda por mensaje para cada conjunto
+_SMALLTALK_RULES = RuleSet([(pat.pattern, "") for pat, _ in SMALLTALK_PATTERNS], re.I)
+_DOMAIN_HINTS = KeywordSet(DOMAIN_HINTS)
+
 def _looks_domain(text: str) -> bool:
-    t = (text or "").lower()
-    return any(k in t for k in DOMAIN_HINTS)
+    return _DOMAIN_HINTS.search((text or "").lower())
 
 def smalltalk_reply(text: str, emo_label: str = "neutral", emo_score: float = 0.0) -> Optional[str]:
     """
@@ -56,8 +61,6 @@ def smalltalk_reply(text: str, emo_label: str = "neutral", emo_score: float = 0.
     if _looks_domain(t):
         return None
 
-    # 4) Patrones
-    for pat, resp in SMALLTALK_PATTERNS:
-        if pat.search(t):
-            return resp
-    return None
\ No newline at end of file
+    # 4) Patrones (anclados: gana el primero de la lista que coincide)
+    i = _SMALLTALK_RULES.first(t)
+    return SMALLTALK_PATTERNS[i][1] if i is not None else None
\ No newline at end of file
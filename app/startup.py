@@ -0,0 +1,114 @@
+# app/startup.py
+"""Reporte de arranque: cuánto tardó cada etapa (imports de la app, índices, modelos de
+emoción), qué paquetes importó cada una y cada import diferido (app.lazy). Las etapas se
+registran una vez por proceso.
+
+    python -m app.startup [--budget-ms 600] [--models]
+
+Mide el import de app.engine en un intérprete nuevo (-X importtime, agrupado por
+paquete), arranca el motor como lo hace la UI y termina con código 1 si el import pasa
+el presupuesto.
+"""
+import argparse, subprocess, sys, threading
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Dict, List
+
+from app.config import STARTUP_IMPORT_BUDGET_MS
+from app.lazy import deferred_imports, preloaded_imports
+from app import metrics
+
+_T0 = perf_counter()
+_STAGES: Dict[str, Dict[str, Any]] = {}  # etapa -> {"start_ms", "ms", "imports"} (en orden)
+_LOCK = threading.Lock()
+_HEAVY = ("sklearn", "scipy", "pandas", "torch", "transformers", "pysentimiento", "pdfplumber")
+
+@contextmanager
+def stage(name: str):
+    """Mide una etapa del arranque (si termina sin error) y anota los paquetes de primer
+       nivel que se importaron durante ella (de cualquier hilo). Si ya se registró (p. ej.
+       un rerun de Streamlit vuelve a pasar por acá) se conserva la primera medición."""
+    before = _top_packages()
+    t0 = perf_counter()
+    yield
+    ms = (perf_counter() - t0) * 1000
+    imports = sorted(_top_packages() - before - {"app"})
+    with _LOCK:
+        if name in _STAGES:
+            return
+        _STAGES[name] = {"start_ms": round((t0 - _T0) * 1000, 1), "ms": round(ms, 1), "imports": imports}
+    metrics.observe(f"startup.{name}", ms)
+
+def _top_packages() -> set:
+    return {m.partition(".")[0] for m in list(sys.modules)}
+
+def report() -> Dict[str, Any]:
+    """{"stages": {etapa: {"start_ms", "ms", "imports"}}, "deferred_imports": {módulo: ms},
+       "preloaded_imports": [módulo]}; start_ms cuenta desde que se importó este módulo.
+       Un módulo en preloaded_imports no se difirió de verdad: lo trajo antes otro código
+       y su costo está en la etapa que lo lista en "imports" (con un snapshot al día,
+       cargar los índices no importa sklearn: ver retrieval._PlainTfidf)."""
+    with _LOCK:
+        stages = {k: dict(v) for k, v in _STAGES.items()}
+    return {"stages": stages,
+            "deferred_imports": {k: round(v, 1) for k, v in deferred_imports().items()},
+            "preloaded_imports": preloaded_imports()}
+
+def import_profile(modules: List[str]) -> Dict[str, Any]:
+    """Costo de importar `modules` en un intérprete nuevo: total (ms) y tiempo propio por
+       paquete de primer nivel, de mayor a menor."""
+    cmd = [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)]
+    err = subprocess.run(cmd, capture_output=True, text=True, check=True).stderr
+    total, by_pkg = 0.0, {}
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cum, name = line[len("import time:"):].split("|", 2)
+        pkg = name.strip().split(".")[0]
+        by_pkg[pkg] = by_pkg.get(pkg, 0.0) + int(own) / 1000
+        if not name.startswith("  "):  # import de primer nivel: su acumulado ya incluye a los hijos
+            total += int(cum) / 1000
+    return {"modules": modules, "total_ms": round(total, 1),
+            "by_package": {k: round(v, 1) for k, v in sorted(by_pkg.items(), key=lambda kv: -kv[1])}}
+
+def main():
+    ap = argparse.ArgumentParser(description="Reporte de arranque de GOBI")
+    ap.add_argument("--budget-ms", type=float, default=STARTUP_IMPORT_BUDGET_MS)
+    ap.add_argument("--models", action="store_true", help="esperar también los modelos de emoción")
+    ap.add_argument("--top", type=int, default=8, help="paquetes a listar")
+    a = ap.parse_args()
+    # con -m este archivo corre como __main__, otra copia: las etapas que registran el
+    # motor y emotion_ml van a app.startup
+    from app import startup
+
+    prof = import_profile(["app.engine"])
+    print(f"Import de app.engine (intérprete nuevo): {prof['total_ms']:.0f} ms")
+    for pkg, ms in list(prof["by_package"].items())[:a.top]:
+        print(f"  {pkg:<24}{ms:>9.1f} ms")
+
+    with startup.stage("import_engine"):
+        from app.engine import ChatEngine
+        from app.emotion_ml import start_warmup
+    with startup.stage("engine_ready"):  # lo que espera la UI antes de dibujar el chat
+        engine = ChatEngine(warmup=a.models, watch_docs=False)
+    engine.wait_indexes()
+    if a.models:
+        start_warmup().join()
+
+    rep = startup.report()
+    print("Etapas (ms desde el inicio):")
+    for name, st in rep["stages"].items():
+        heavy = [p for p in st["imports"] if p in _HEAVY]
+        print(f"  {name:<24}{st['start_ms']:>9.1f} +{st['ms']:>9.1f} ms"
+              + (f"  (importa {', '.join(heavy)})" if heavy else ""))
+    print("Imports diferidos:" + ("" if rep["deferred_imports"] else " (ninguno todavía)"))
+    for mod, ms in rep["deferred_imports"].items():
+        note = "  ya importado antes (no diferido)" if mod in rep["preloaded_imports"] else ""
+        print(f"  {mod:<40}{ms:>9.1f} ms{note}")
+    ok = prof["total_ms"] <= a.budget_ms
+    print(f"[{'INFO' if ok else 'ERROR'}] Import de app.engine: {prof['total_ms']:.0f} ms "
+          f"(presupuesto {a.budget_ms:.0f} ms)")
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# app/textrules.py
+"""Conjuntos de reglas de texto compilados una sola vez y aplicados en una pasada.
+
+RuleSet junta reglas (patrón, reemplazo) en una sola alternancia con un grupo con
+nombre por regla: re.sub recorre el texto una vez y, en cada posición, gana la primera
+regla de la lista que coincide ahí. Da lo mismo que aplicar las reglas una tras otra
+mientras ninguna coincidencia se solape con la de otra regla que empiece antes, y
+ningún reemplazo arme texto que otra regla posterior reconozca. Las reglas de
+compose/smalltalk cumplen eso (bench.bench_textrules lo verifica contra el código
+anterior).
+
+KeywordSet responde "¿aparece alguna de estas palabras?" con una sola búsqueda (el
+motor de re recorre la alternancia en C) en vez de un `k in texto` por palabra.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+def _top_level_bar(pat: str) -> bool:
+    """¿El patrón tiene un "|" fuera de grupos y clases? (entonces no se le puede sacar
+       el \\b inicial: \\ba|b no es \\b(?:a|b))."""
+    depth, i = 0, 0
+    while i < len(pat):
+        c = pat[i]
+        if c == "\\":
+            i += 1
+        elif c == "[":
+            i += 2 if pat[i + 1:i + 2] == "^" else 1
+            i += 1 if pat[i:i + 1] == "]" else 0  # "]" inicial es literal
+            while i < len(pat) and pat[i] != "]":
+                i += 2 if pat[i] == "\\" else 1
+        elif c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif c == "|" and not depth:
+            return True
+        i += 1
+    return False
+
+class RuleSet:
+    def __init__(self, rules: Sequence[Tuple[str, str]], flags: int = 0):
+        self.replacements: List[str] = []
+        parts, run = [], []  # run: reglas seguidas que empiezan con \b
+        for i, (pat, rep) in enumerate(rules):
+            if "\\" in rep:
+                raise ValueError(f"RuleSet solo acepta reemplazos literales: {rep!r}")
+            self.replacements.append(rep)
+            if pat.startswith(r"\b") and not _top_level_bar(pat):
+                run.append(f"(?P<r{i}>{pat[2:]})")
+                continue
+            if run:
+                parts.append(r"\b(?:" + "|".join(run) + ")")
+                run = []
+            parts.append(f"(?P<r{i}>{pat})")
+        if run:
+            parts.append(r"\b(?:" + "|".join(run) + ")")
+        # \b(?:a|b|c) en vez de \ba|\bb|\bc: en la mayoría de las posiciones (dentro de
+        # una palabra) falla con una sola prueba en lugar de entrar a cada alternativa
+        self.pattern = re.compile("|".join(parts), flags)
+
+    def _replace(self, m: re.Match) -> str:
+        return self.replacements[int(m.lastgroup[1:])]
+
+    def sub(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
+
+    def first(self, text: str) -> Optional[int]:
+        """Índice de la regla de la coincidencia más a la izquierda (con patrones anclados
+           con ^, la primera de la lista que coincide), o None."""
+        m = self.pattern.search(text)
+        return int(m.lastgroup[1:]) if m else None
+
+class KeywordSet:
+    def __init__(self, keywords: Iterable[str]):
+        # las más largas primero: con prefijos comunes el resultado no cambia, pero la
+        # alternancia corta antes
+        words = sorted(set(keywords), key=len, reverse=True)
+        self.pattern = re.compile("|".join(map(re.escape, words))) if words else None
+
+    def search(self, text: str) -> bool:
+        """Igual que `any(k in text for k in keywords)` (subcadena, sin bajar a minúsculas)."""
+        return self.pattern is not None and self.pattern.search(text) is not None
+
+@lru_cache(maxsize=32)
+def keyword_set(keywords: Tuple[str, ...]) -> KeywordSet:
+    """KeywordSet compartido para una tupla de palabras (p. ej. un argumento por defecto)."""
+    return KeywordSet(keywords)
@@ -0,0 +1,53 @@
+# bench/bench_ann.py
+"""Benchmark de la recuperación densa (app.dense): búsqueda exacta en el espacio LSA
+contra el IVF, para varios tamaños de corpus y recall@k buscados. Usa el corpus
+sintético por temas (bench.synth.synth_topic_docs) y reporta el recall@k real con
+consultas sintéticas (no las de ajuste) y qué fracción del corpus se recorre.
+
+    python -m bench.bench_ann [--sizes 2000 10000 50000] [--recall 0.9 0.95 0.99]
+"""
+import argparse, json, time
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.dense import build_lsa, project, exact_search, ivf_search, recall_at_k
+from bench.synth import synth_topic_docs, synth_topic_queries
+
+def _ms_per_query(fn, Z) -> float:
+    t0 = time.perf_counter()
+    for z in Z:
+        fn(z)
+    return (time.perf_counter() - t0) * 1000 / len(Z)
+
+def run(sizes, targets, n_queries=200, k=4, dim=128):
+    for n in sizes:
+        vect = TfidfVectorizer(strip_accents="unicode", ngram_range=(1, 2), max_df=0.9,
+                               min_df=1, token_pattern=r"(?u)\b\w+\b")
+        X = vect.fit_transform(synth_topic_docs(n, words_per_doc=100))
+        Qs = vect.transform(synth_topic_queries(n_queries))
+        for target in targets:
+            t0 = time.perf_counter()
+            lsa = build_lsa(X, dim=dim, target_recall=target, k=k, min_rows=0)
+            build_s = time.perf_counter() - t0
+            Z = np.array([project(lsa, Qs[i]) for i in range(n_queries)])
+            ivf = lsa["ivf"]
+            sizes_probed = np.sort(np.diff(ivf["offsets"]))[::-1][:lsa["nprobe"]].sum()
+            print(json.dumps({
+                "bench": "ann", "chunks": n, "dim": lsa["Z"].shape[1], "k": k,
+                "target_recall": target, "lists": len(ivf["centroids"]), "nprobe": lsa["nprobe"],
+                "recall_at_k": round(recall_at_k(lsa, Z, k, lsa["nprobe"]), 3),
+                "max_scanned_frac": round(float(sizes_probed) / n, 3),
+                "exact_ms": round(_ms_per_query(lambda z: exact_search(lsa, z, k), Z), 3),
+                "ivf_ms": round(_ms_per_query(lambda z: ivf_search(lsa, z, k), Z), 3),
+                "build_s": round(build_s, 2),
+            }))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 50000])
+    ap.add_argument("--recall", type=float, nargs="+", default=[0.9, 0.95, 0.99])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=4)
+    ap.add_argument("--dim", type=int, default=128)
+    a = ap.parse_args()
+    run(a.sizes, a.recall, a.queries, a.k, a.dim)
@@ -0,0 +1,104 @@
+# bench/bench_textrules.py
+"""Micro-benchmark de las reglas de texto: un re.sub / any() por regla (código anterior)
+contra los conjuntos compilados de app.textrules. Verifica que la salida sea idéntica.
+
+    python -m bench.bench_textrules [--texts 400] [--repeat 5]
+"""
+import argparse, json, random, re, time
+from typing import Callable, List
+
+from app import compose, smalltalk
+from bench.run_bench import _kb_questions
+from bench.synth import synth_docs, synth_queries
+
+# ---------------------- código anterior ----------------------
+def _old_rephrase(text):
+    out = text
+    for pat, rep in compose._REWRITE:
+        out = re.sub(pat, rep, out, flags=re.IGNORECASE)
+    return out
+
+def _old_compress(text):
+    repl = [(r"\bpor lo tanto\b", "en consecuencia"), (r"\bes decir\b", "o sea"),
+            (r"\bmediante\b", "a través de"), (r"\bbarra de herramientas\b", "barra superior"),
+            (r"\s{2,}", " ")]
+    out = text
+    for pat, rep in repl:
+        out = re.sub(pat, rep, out, flags=re.I)
+    return " ".join(s if len(s) < 240 else s[:240].rstrip() + "…" for s in compose.split_sentences(out))
+
+def _old_steps(text, max_items=6, keywords=("paso","clic","seleccione","ingrese","verifique","enviar","derivar","mesa de partes","glosa")):
+    sents = compose.split_sentences(text)
+    kept = [s for s in sents if any(k in s.lower() for k in keywords)] or sents[:max_items]
+    bullets = []
+    for s in kept[:max_items]:
+        s2 = re.sub(r"^\s*(Paso\s*\d+[:\-]?)\s*", "", s, flags=re.I)
+        s2 = re.sub(r"\bse debe\b", "debe", s2, flags=re.I)
+        s2 = re.sub(r"\busted\b", "", s2, flags=re.I)
+        bullets.append("• " + s2.strip().capitalize())
+    return "\n".join(bullets)
+
+def _old_smalltalk(text):
+    t = (text or "").strip()
+    if not t or len(t.split()) > 8 or any(k in t.lower() for k in smalltalk.DOMAIN_HINTS):
+        return None
+    for pat, resp in smalltalk.SMALLTALK_PATTERNS:
+        if pat.search(t):
+            return resp
+    return None
+
+# ---------------------- entradas ----------------------
+_PHRASES = ["por lo tanto", "Es decir", "por ejemplo", "MEDIANTE", "mediante el cual", "con el cual",
+            "barra de herramientas", "verificación de documentos electrónicos firmados digitalmente",
+            "se debe", "Se deben", "usted", "Paso 2:", "paso 03 -", "haga clic", "Mesa de Partes", "  "]
+
+def _texts(n: int, seed: int = 0) -> List[str]:
+    """Textos sintéticos con las frases de las reglas sembradas (mayúsculas, bordes de
+       oración, espacios dobles) para que todas las reglas se activen y se crucen."""
+    rnd = random.Random(seed)
+    out = []
+    for doc in synth_docs(n, words_per_doc=120, seed=seed):
+        words = doc.split(" ")
+        for _ in range(rnd.randint(2, 10)):
+            words.insert(rnd.randrange(len(words) + 1), rnd.choice(_PHRASES))
+        out.append(" ".join(words))
+    return out
+
+def _messages(n: int) -> List[str]:
+    chat = ["hola", "Buenas tardes", " gracias ", "quién eres", "qué puedes hacer", "no sé",
+            "chao", "ayuda con el documento", "hola, cómo derivo un expediente", "perfecto"]
+    return chat + _kb_questions() + synth_queries(n)
+
+def _bench(name: str, old: Callable, new: Callable, inputs: List[str], repeat: int) -> None:
+    same = sum(old(x) == new(x) for x in inputs)
+    t_old = t_new = float("inf")
+    for _ in range(repeat):  # el mejor de `repeat` recorridos
+        t0 = time.perf_counter()
+        for x in inputs:
+            old(x)
+        t1 = time.perf_counter()
+        for x in inputs:
+            new(x)
+        t2 = time.perf_counter()
+        t_old, t_new = min(t_old, t1 - t0), min(t_new, t2 - t1)
+    print(json.dumps({
+        "bench": "textrules", "rule_set": name, "inputs": len(inputs),
+        "old_us": round(t_old * 1e6 / len(inputs), 2),
+        "compiled_us": round(t_new * 1e6 / len(inputs), 2),
+        "speedup": round(t_old / max(t_new, 1e-12), 2),
+        "same_output": f"{same}/{len(inputs)}",
+    }))
+
+def run(n_texts: int = 400, repeat: int = 5):
+    texts, msgs = _texts(n_texts), _messages(n_texts)
+    _bench("light_rephrase_es", _old_rephrase, compose.light_rephrase_es, texts, repeat)
+    _bench("compress_rules", _old_compress, compose.compress_rules, texts, repeat)
+    _bench("to_steps", _old_steps, compose.to_steps, texts, repeat)
+    _bench("smalltalk_reply", _old_smalltalk, smalltalk.smalltalk_reply, msgs, repeat)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=400)
+    ap.add_argument("--repeat", type=int, default=5)
+    a = ap.parse_args()
+    run(a.texts, a.repeat)
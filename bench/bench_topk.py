@@ -0,0 +1,47 @@
+# bench/bench_topk.py
+"""Micro-benchmark del top-k: coseno denso + argsort completo (código anterior) contra
+postings + selección parcial (app.scoring). Verifica que el ranking sea el mismo.
+
+    python -m bench.bench_topk [--sizes 1000 10000 50000] [--queries 200]
+"""
+import argparse, json, time
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.scoring import build_postings, top_k
+from bench.synth import synth_docs, synth_queries
+
+def _dense_topk(v, X, k):
+    return cosine_similarity(v, X).ravel().argsort(kind="stable")[::-1][:k]
+
+def run(sizes, n_queries=200, k=4):
+    for n in sizes:
+        vect = TfidfVectorizer(strip_accents="unicode", ngram_range=(1, 2), max_df=0.9,
+                               min_df=1, token_pattern=r"(?u)\b\w+\b")
+        X = vect.fit_transform(synth_docs(n, words_per_doc=180))
+        P = build_postings(X)
+        Q = vect.transform(synth_queries(n_queries))
+
+        t0 = time.perf_counter()
+        base = [_dense_topk(Q[i], X, k) for i in range(n_queries)]
+        t1 = time.perf_counter()
+        fast = [top_k(Q[i], P, k) for i in range(n_queries)]
+        t2 = time.perf_counter()
+
+        same = sum(np.array_equal(a, b) for a, b in zip(base, fast))
+        print(json.dumps({
+            "bench": "topk", "chunks": n, "nnz": int(X.nnz), "queries": n_queries, "k": k,
+            "dense_ms": round((t1 - t0) * 1000 / n_queries, 3),
+            "postings_ms": round((t2 - t1) * 1000 / n_queries, 3),
+            "speedup": round((t1 - t0) / max(t2 - t1, 1e-9), 1),
+            "same_ranking": f"{same}/{n_queries}",
+        }))
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=4)
+    a = ap.parse_args()
+    run(a.sizes, a.queries, a.k)
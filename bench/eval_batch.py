@@ -0,0 +1,185 @@
+# bench/eval_batch.py
+"""Evaluación offline por lotes: corre el pipeline completo (smalltalk -> emoción ->
+recuperación -> composición, ChatEngine.reply) sobre un archivo de consultas en un pool
+de procesos y escribe, por consulta, la respuesta, las fuentes elegidas, la latencia y
+el rango de lo esperado; al final, hit@k, MRR y latencias agregadas.
+
+    python -m bench.eval_batch [consultas] [--out eval.jsonl] [--workers 4] [--ks 1 3 5]
+                               [--holdout 0.2] [--emotion] [--cache] [--limit N]
+
+Consultas (si no se da archivo, las preguntas de la KB con su intención):
+  .jsonl  {"query": "...", "intent": "opcional", "docs": ["opcional.pdf", ...]}
+  .csv    columnas de la KB (KB_COLUMNS) o query/intent
+  otro    una consulta por línea, sin etiquetas
+
+Etiquetas: "intent" se busca en el ranking de intenciones de la KB (centroides, el mismo
+que usa _query_kb para elegir partición); "docs" en los documentos que devuelve
+_retrieve_docs, en orden. --holdout F evalúa una fracción F de las filas de la KB contra
+una KB armada con el resto (si no, cada pregunta está en el índice y el hit@1 es casi 1).
+"""
+import argparse, json, os, platform, random, statistics, subprocess, sys, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import KB_COLUMNS, KB_CSV
+
+# ---------------------- consultas ----------------------
+def _kb_queries() -> List[Dict[str, Any]]:
+    from app.retrieval import _load_kb
+    table = _load_kb()
+    return [{"query": q, "intent": lab or None, "kb_row": i}
+            for i, (q, lab) in enumerate(zip(table["pregunta"], table["intencion"])) if q]
+
+def load_queries(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return _kb_queries()
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            items = [json.loads(ln) for ln in f if ln.strip()]
+        return [{"query": it["query"], "intent": it.get("intent"), "docs": it.get("docs")}
+                for it in items if it.get("query")]
+    if ext == ".csv":
+        from app.kbtable import read_csv_columns
+        cols = read_csv_columns(path)
+        q = cols.get(KB_COLUMNS["pregunta"]) or cols.get("query") or []
+        lab = cols.get(KB_COLUMNS["intencion"]) or cols.get("intent") or [""] * len(q)
+        return [{"query": a, "intent": b or None} for a, b in zip(q, lab) if a]
+    with open(path, "r", encoding="utf-8") as f:
+        return [{"query": ln.strip()} for ln in f if ln.strip()]
+
+# ---------------------- worker ----------------------
+_ENGINE = None
+
+def _init_worker(kb_rows: Optional[List[int]], emotion: bool, cache: bool) -> None:
+    """Un motor por proceso (índices desde el snapshot o el índice compartido)."""
+    global _ENGINE
+    from app import retrieval as r
+    from app.answer_cache import ANSWER_CACHE
+    from app.emotion_ml import wait_ready
+    from app.engine import ChatEngine
+    from app.kbtable import KBTable
+
+    _ENGINE = ChatEngine(warmup=emotion, watch_docs=False, background=False)
+    if emotion:
+        wait_ready()  # si no cargan, la emoción queda "neutral" como en la app
+    if kb_rows is not None:  # KB sin las filas que se evalúan
+        full = r._load_kb()
+        r._KB_INDEX = r._build_kb_index(KBTable.from_columns(
+            {f: [col[i] for i in kb_rows] for f, col in full.columns.items()}))
+    if not cache:
+        ANSWER_CACHE.max_entries = 0
+    ANSWER_CACHE.clear()
+
+def _rank(ranked: Sequence[str], relevant: Sequence[str]) -> Optional[int]:
+    """Posición (1-based) del primer elemento relevante, o None."""
+    rel = set(relevant)
+    return next((i + 1 for i, x in enumerate(ranked) if x in rel), None)
+
+def _eval_one(item: Dict[str, Any], max_k: int) -> Dict[str, Any]:
+    from app import retrieval as r
+    q = item["query"]
+    t0 = time.perf_counter()
+    res = _ENGINE.reply(q, {})
+    latency_ms = (time.perf_counter() - t0) * 1000
+    rec = {"record": "query", "query": q, "route": res["route"], "emotion": res["emotion"][0],
+           "answer": res["answer"], "sources": [s["name"] for s in res["sources"]],
+           "latency_ms": round(latency_ms, 3)}
+    if item.get("intent"):
+        kb = r._KB_INDEX
+        ranked = []
+        if kb and kb["vectorizer"] is not None:
+            sims = r._intent_scores(r._tfidf_rows(kb["vectorizer"], [r._norm(q)]), kb)
+            ranked = [kb["intents"]["labels"][i] for i in np.argsort(-sims, kind="stable")
+                      if sims[i] > 0][:max_k]
+        rec.update(intent=item["intent"], intent_ranked=ranked,
+                   intent_rank=_rank(ranked, [item["intent"]]))
+    if item.get("docs"):
+        _, sources = r._retrieve_docs(q, r._DOC_INDEX, k=max_k) if r._DOC_INDEX else ("", [])
+        ranked = [s["name"] for s in sources][:max_k]
+        rec.update(docs=item["docs"], docs_ranked=ranked, docs_rank=_rank(ranked, item["docs"]))
+    if "kb_row" in item:
+        rec["kb_row"] = item["kb_row"]
+    return rec
+
+# ---------------------- agregados ----------------------
+def summarize(records: List[Dict[str, Any]], ks: Sequence[int], wall_s: float) -> Dict[str, Any]:
+    lat = sorted(r["latency_ms"] for r in records)
+    out = {"record": "summary", "queries": len(records), "wall_s": round(wall_s, 2),
+           "throughput_per_s": round(len(records) / wall_s, 2) if wall_s else None}
+    if lat:
+        out.update(p50_ms=round(statistics.median(lat), 3),
+                   p95_ms=round(lat[min(len(lat) - 1, int(round(0.95 * (len(lat) - 1))))], 3),
+                   mean_ms=round(statistics.fmean(lat), 3))
+    routes: Dict[str, int] = {}
+    for r in records:
+        routes[r["route"]] = routes.get(r["route"], 0) + 1
+    out["routes"] = routes
+    for target in ("intent", "docs"):
+        ranks = [r[f"{target}_rank"] for r in records if f"{target}_rank" in r]
+        if ranks:
+            out[target] = {"n": len(ranks),
+                           **{f"hit@{k}": round(sum(1 for x in ranks if x and x <= k) / len(ranks), 4)
+                              for k in ks},
+                           "mrr": round(sum(1 / x for x in ranks if x) / len(ranks), 4)}
+    return out
+
+def _holdout(items: List[Dict[str, Any]], frac: float, seed: int):
+    """(consultas evaluadas, filas de la KB que quedan en el índice)."""
+    from app.retrieval import _load_kb
+    n = len(_load_kb())
+    test = set(random.Random(seed).sample(range(n), max(1, int(round(frac * n)))))
+    return ([it for it in items if it.get("kb_row") in test],
+            [i for i in range(n) if i not in test])
+
+def main():
+    ap = argparse.ArgumentParser(description="Evaluación offline por lotes de GOBI")
+    ap.add_argument("queries", nargs="?", help="archivo de consultas (por defecto, la KB)")
+    ap.add_argument("--out", default="eval.jsonl", help="JSONL con un registro por consulta + resumen")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5])
+    ap.add_argument("--holdout", type=float, default=0.0,
+                    help="fracción de la KB a evaluar fuera del índice (solo sin archivo)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--emotion", action="store_true", help="cargar los modelos de emoción en cada worker")
+    ap.add_argument("--cache", action="store_true", help="dejar activa la caché de respuestas")
+    ap.add_argument("--limit", type=int, default=0)
+    a = ap.parse_args()
+
+    items, kb_rows = load_queries(a.queries), None
+    if a.holdout and not a.queries:
+        items, kb_rows = _holdout(items, a.holdout, a.seed)
+    if a.limit:
+        items = items[:a.limit]
+    if not items:
+        print(f"[ERROR] Sin consultas para evaluar ({a.queries or KB_CSV})")
+        sys.exit(1)
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    meta = {"record": "meta", "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+            "python": platform.python_version(), "cpus": os.cpu_count(), "workers": a.workers,
+            "queries_file": a.queries, "holdout": a.holdout, "emotion": a.emotion, "cache": a.cache}
+    print(json.dumps(meta, ensure_ascii=False), flush=True)
+
+    max_k = max(a.ks)
+    workers = max(1, min(a.workers, len(items)))
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(kb_rows, a.emotion, a.cache)) as ex:
+        records = list(ex.map(_eval_one, items, [max_k] * len(items),
+                              chunksize=max(1, len(items) // (4 * workers))))
+    wall_s = time.perf_counter() - t0  # incluye el arranque de los workers
+
+    summary = summarize(records, a.ks, wall_s)
+    with open(a.out, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in [meta] + records + [summary])
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+
+if __name__ == "__main__":
+    main()
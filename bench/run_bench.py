@@ -0,0 +1,178 @@
+# bench/run_bench.py
+"""Benchmarks por etapa del pipeline de GOBI, sobre el corpus real (data/docs + KB) y
+sobre corpus sintéticos de 10 a 10.000 documentos.
+
+    python -m bench.run_bench [--sizes 10 100 1000 10000] [--queries 200] [--out res.jsonl]
+                              [--baseline prev.jsonl] [--budgets budgets.json]
+
+Cada caso (corpus) corre en un proceso nuevo, así el pico de RSS es el de ese caso.
+Salida: una línea JSON por etapa con p50/p95/media en ms, throughput (ops/s) y pico de
+RSS en MB; la primera línea ("record": "meta") describe la máquina y el commit.
+
+--baseline compara p50/p95 contra una corrida anterior (ratio > 1 = más lento).
+--budgets  es un JSON {"etapa": {"p95_ms": 50, "peak_rss_mb": 800}, ...}; si alguna
+           etapa lo excede el proceso sale con código 1.
+"""
+import argparse, json, multiprocessing as mp, os, platform, resource, statistics, subprocess
+import sys, tempfile, time
+from typing import Any, Callable, Dict, List, Sequence
+
+def _peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # bytes en macOS, KB en Linux
+
+def _time_calls(fn: Callable, inputs: Sequence, warmup: int = 1) -> List[float]:
+    for x in inputs[:warmup]:
+        fn(x)
+    out = []
+    for x in inputs:
+        t0 = time.perf_counter()
+        fn(x)
+        out.append((time.perf_counter() - t0) * 1000)
+    return out
+
+def _record(stage: str, corpus: str, times_ms: List[float], **extra) -> Dict[str, Any]:
+    ts = sorted(times_ms)
+    p95 = ts[min(len(ts) - 1, int(round(0.95 * (len(ts) - 1))))]
+    total_s = sum(ts) / 1000
+    return {"record": "stage", "stage": stage, "corpus": corpus, "iters": len(ts),
+            "p50_ms": round(statistics.median(ts), 4), "p95_ms": round(p95, 4),
+            "mean_ms": round(statistics.fmean(ts), 4),
+            "throughput_per_s": round(len(ts) / total_s, 2) if total_s else None,
+            "peak_rss_mb": round(_peak_rss_mb(), 1), **extra}
+
+def _kb_questions() -> List[str]:
+    import csv
+    from app.config import KB_CSV
+    if not KB_CSV or not os.path.isfile(KB_CSV):
+        return []
+    with open(KB_CSV, newline="", encoding="utf-8") as f:
+        return [r.get("pregunta_usuario") or r.get("pregunta") or "" for r in csv.DictReader(f)]
+
+# ---------------------- casos (cada uno en su proceso) ----------------------
+def _case_real(n_queries: int) -> List[Dict[str, Any]]:
+    from app import retrieval as r
+    from app.smalltalk import smalltalk_reply
+    from app.compose import summarize_text, to_steps
+    from bench.synth import synth_queries
+
+    out = []
+    paths = r._infer_doc_paths()
+    t0 = time.perf_counter()
+    doc_index = r._build_doc_index(paths)
+    kb_index = r._build_kb_index(r._load_kb())
+    build_ms = (time.perf_counter() - t0) * 1000
+    n_chunks = len(doc_index["chunks"])
+    out.append(_record("init_indexes_cold", "real", [build_ms], n_docs=len(paths), n_chunks=n_chunks))
+    out.append(_record("init_indexes_warm", "real",
+                       _time_calls(lambda _: r.init_indexes(), [None] * 5),
+                       n_docs=len(paths), n_chunks=n_chunks))
+
+    queries = ((_kb_questions() + synth_queries(n_queries)) * 2)[:n_queries]
+    smalltalk = (["hola", "gracias", "quién eres", "qué puedes hacer", "adiós"] + queries)[:n_queries]
+    out.append(_record("smalltalk_reply", "real", _time_calls(smalltalk_reply, smalltalk)))
+    out.append(_record("_query_kb", "real", _time_calls(lambda q: r._query_kb(q, kb_index), queries)))
+    out.append(_record("_retrieve_docs", "real", _time_calls(lambda q: r._retrieve_docs(q, doc_index), queries),
+                       n_chunks=n_chunks))
+
+    raws = [r._answer(q, doc_index, kb_index, r.MAX_WORDS)[0] for q in queries]
+    vectors = lambda sents: r.sentence_vectors(sents, doc_index)
+    out.append(_record("summarize_text", "real", _time_calls(lambda t: summarize_text(t, vectors=vectors), raws)))
+    out.append(_record("summarize_text_fit", "real", _time_calls(summarize_text, raws)))  # TF-IDF local
+    out.append(_record("to_steps", "real", _time_calls(to_steps, raws)))
+
+    try:
+        from app.emotion_ml import detect_emotion, wait_ready
+        if not wait_ready(timeout=600):
+            raise RuntimeError("los modelos no cargaron")
+        out.append(_record("detect_emotion", "real", _time_calls(detect_emotion, queries[:50])))
+    except Exception as e:
+        out.append({"record": "stage", "stage": "detect_emotion", "corpus": "real", "skipped": str(e)})
+    return out
+
+def _case_synth(n_docs: int, n_queries: int) -> List[Dict[str, Any]]:
+    from app import retrieval as r
+    from bench.synth import write_corpus, synth_queries
+
+    out = []
+    with tempfile.TemporaryDirectory(prefix="gobi_bench_") as root:
+        paths = write_corpus(root, n_docs, words_per_doc=400)
+        t0 = time.perf_counter()
+        doc_index = r._build_doc_index(paths)
+        build_ms = (time.perf_counter() - t0) * 1000
+    n_chunks = len(doc_index["chunks"])
+    corpus = f"synth_{n_docs}"
+    out.append(_record("init_indexes_cold", corpus, [build_ms], n_docs=n_docs, n_chunks=n_chunks))
+    queries = synth_queries(n_queries)
+    out.append(_record("_retrieve_docs", corpus, _time_calls(lambda q: r._retrieve_docs(q, doc_index), queries),
+                       n_docs=n_docs, n_chunks=n_chunks))
+    return out
+
+def _run_isolated(fn: Callable, *args) -> List[Dict[str, Any]]:
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        return pool.apply(fn, args)
+
+# ---------------------- comparación ----------------------
+def _key(rec):
+    return rec.get("stage"), rec.get("corpus")
+
+def compare(records: List[Dict[str, Any]], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        base = {_key(r): r for r in map(json.loads, f) if r.get("record") == "stage"}
+    for rec in records:
+        old = base.get(_key(rec))
+        if not old or "p50_ms" not in rec or "p50_ms" not in old:
+            continue
+        print(json.dumps({"record": "compare", "stage": rec["stage"], "corpus": rec["corpus"],
+                          "p50_ratio": round(rec["p50_ms"] / max(old["p50_ms"], 1e-9), 2),
+                          "p95_ratio": round(rec["p95_ms"] / max(old["p95_ms"], 1e-9), 2)}))
+
+def check_budgets(records: List[Dict[str, Any]], budgets_path: str) -> bool:
+    with open(budgets_path, encoding="utf-8") as f:
+        budgets = json.load(f)
+    ok = True
+    for rec in records:
+        for metric, limit in budgets.get(rec.get("stage"), {}).items():
+            if metric in rec and rec[metric] > limit:
+                ok = False
+                print(json.dumps({"record": "over_budget", "stage": rec["stage"], "corpus": rec["corpus"],
+                                  "metric": metric, "value": rec[metric], "budget": limit}))
+    return ok
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmarks por etapa de GOBI")
+    ap.add_argument("--sizes", type=int, nargs="*", default=[10, 100, 1000, 10000])
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--no-real", action="store_true", help="omite el corpus real")
+    ap.add_argument("--out", help="además de stdout, escribe el JSONL aquí")
+    ap.add_argument("--baseline")
+    ap.add_argument("--budgets")
+    a = ap.parse_args()
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    records = [{"record": "meta", "ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+                "python": platform.python_version(), "platform": platform.platform(),
+                "cpus": os.cpu_count()}]
+    print(json.dumps(records[0]), flush=True)
+
+    cases = ([] if a.no_real else [(_case_real, a.queries)]) + [(_case_synth, n, a.queries) for n in a.sizes]
+    for fn, *args in cases:
+        for rec in _run_isolated(fn, *args):
+            records.append(rec)
+            print(json.dumps(rec, ensure_ascii=False), flush=True)
+
+    if a.out:
+        with open(a.out, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+    if a.baseline:
+        compare(records, a.baseline)
+    if a.budgets and not check_budgets(records, a.budgets):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
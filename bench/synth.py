@@ -0,0 +1,82 @@
+# bench/synth.py
+"""Corpus sintético con aspecto de español para los benchmarks: palabras armadas con
+sílabas, frecuencia tipo Zipf y vocabulario del SGD mezclado para que las consultas
+tengan con qué coincidir."""
+import os
+import random
+from typing import List
+
+_SYLLABLES = ["ca", "de", "pro", "ra", "ci", "on", "men", "to", "ta", "ble", "cer", "ges",
+              "ti", "do", "cu", "mi", "es", "tra", "na", "li", "da", "re", "por", "sa"]
+DOMAIN_WORDS = ["documento", "expediente", "derivar", "firma", "digital", "mesa", "partes",
+                "bandeja", "recepcion", "archivo", "tramite", "usuario", "contrasena",
+                "sistema", "referencias", "glosa", "pendientes", "oficio", "interoperabilidad",
+                "seleccione", "clic", "boton", "paso", "registrar", "enviar", "consulta"]
+STOP_WORDS = ["el", "la", "de", "en", "y", "que", "los", "las", "por", "para", "con", "se", "un", "una"]
+
+def make_vocab(n: int = 5000, seed: int = 0) -> List[str]:
+    rnd = random.Random(seed)
+    words = set()
+    while len(words) < n:
+        words.add("".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4))))
+    return STOP_WORDS + DOMAIN_WORDS + sorted(words)
+
+def synth_docs(n_docs: int, words_per_doc: int = 200, seed: int = 0, vocab_size: int = 5000) -> List[str]:
+    rnd = random.Random(seed)
+    vocab = make_vocab(vocab_size, seed)
+    weights = [1.0 / (r + 1) for r in range(len(vocab))]  # Zipf
+    docs = []
+    for _ in range(n_docs):
+        words = rnd.choices(vocab, weights=weights, k=words_per_doc)
+        sents, i = [], 0
+        while i < len(words):
+            n = rnd.randint(6, 18)
+            sents.append(" ".join(words[i:i + n]).capitalize() + ".")
+            i += n
+        docs.append(" ".join(sents))
+    return docs
+
+def synth_topic_docs(n_docs: int, n_topics: int = 50, words_per_doc: int = 100, seed: int = 0,
+                     vocab_size: int = 20000) -> List[str]:
+    """Como synth_docs, pero cada documento sale de un tema: 70% de sus palabras del
+       vocabulario propio del tema y el resto del general (para los benchmarks de la
+       búsqueda densa, que necesita estructura temática para agrupar)."""
+    rnd = random.Random(seed)
+    vocab = make_vocab(vocab_size, seed)
+    common = vocab[:200]
+    per_topic = (len(vocab) - 200) // n_topics
+    topics = [vocab[200 + t * per_topic:200 + (t + 1) * per_topic] for t in range(n_topics)]
+    docs = []
+    for _ in range(n_docs):
+        topic = rnd.choice(topics)
+        words = [rnd.choice(topic) if rnd.random() < 0.7 else rnd.choice(common)
+                 for _ in range(words_per_doc)]
+        docs.append(" ".join(words).capitalize() + ".")
+    return docs
+
+def synth_topic_queries(n: int, n_topics: int = 50, seed: int = 1, vocab_size: int = 20000) -> List[str]:
+    """Consultas de 3 palabras de un mismo tema (mismos temas que synth_topic_docs)."""
+    rnd = random.Random(seed)
+    vocab = make_vocab(vocab_size, seed=0)
+    per_topic = (len(vocab) - 200) // n_topics
+    out = []
+    for _ in range(n):
+        t = rnd.randrange(n_topics)
+        out.append(" ".join(rnd.sample(vocab[200 + t * per_topic:200 + (t + 1) * per_topic], 3)))
+    return out
+
+def synth_queries(n: int, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    vocab = make_vocab(seed=0)
+    return [" ".join(rnd.sample(DOMAIN_WORDS, 2) + rnd.sample(vocab[40:400], 2)) for _ in range(n)]
+
+def write_corpus(root: str, n_docs: int, words_per_doc: int = 200, seed: int = 0) -> List[str]:
+    """Escribe n_docs archivos .txt en `root` y devuelve sus rutas."""
+    os.makedirs(root, exist_ok=True)
+    paths = []
+    for i, text in enumerate(synth_docs(n_docs, words_per_doc, seed)):
+        p = os.path.join(root, f"synth_{i:05d}.txt")
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(text)
+        paths.append(p)
+    return paths
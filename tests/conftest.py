@@ -0,0 +1,5 @@
+# tests/conftest.py
+import os, sys
+
+# los tests importan `app` y `bench` desde la raíz del repo, también con `pytest` a secas
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,47 @@
+# tests/test_compose.py
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from app.compose import split_sentences, summarize_text
+
+_CONTENT = [
+    "Ingrese al sistema con su usuario y contraseña institucional.",
+    "Seleccione la opción firma digital en el menú principal.",
+    "El sistema verifica el certificado digital del usuario.",
+    "Adjunte el documento que desea firmar en formato PDF.",
+    "Presione el botón firmar y espere la confirmación.",
+    "El documento firmado se guarda en la bandeja de salida.",
+]
+
+def _text(boiler, times=8):
+    out = []
+    for i, s in enumerate(_CONTENT):
+        out.append(s)
+        out.extend([boiler] * (times if i == 0 else 1))
+    return " ".join(out)
+
+def _corpus_vectors():
+    # IDF "del corpus": el rótulo y los artículos aparecen en muchos documentos
+    vect = TfidfVectorizer(strip_accents="unicode").fit(
+        _CONTENT + ["ver figura siguiente."] * 3 + ["la de el en"] * 20)
+    return lambda sents: vect.transform(sents)
+
+def test_repeated_sentence_cannot_fill_summary():
+    text = _text("ver figura siguiente.")
+    for vectors in (_corpus_vectors(), None):
+        sents = split_sentences(summarize_text(text, max_sent=5, vectors=vectors))
+        assert len(sents) == 5
+        assert sum(s.lower() == "ver figura siguiente." for s in sents) <= 1
+        assert len(set(sents)) == len(sents)
+
+def test_near_duplicates_count_once():
+    variants = ["Ver figura siguiente.", "Ver la figura siguiente.", "VER FIGURA SIGUIENTE!"]
+    text = " ".join(s + " " + variants[i % 3] + " " + variants[(i + 1) % 3]
+                    for i, s in enumerate(_CONTENT))
+    sents = split_sentences(summarize_text(text, max_sent=5, vectors=_corpus_vectors()))
+    assert sum("figura siguiente" in s.lower() for s in sents) <= 1
+
+def test_summary_keeps_original_order_and_short_text():
+    text = " ".join(_CONTENT)
+    sents = split_sentences(summarize_text(text, max_sent=4, vectors=_corpus_vectors()))
+    assert sents == sorted(sents, key=_CONTENT.index)
+    assert summarize_text("Una. Dos.", max_sent=5) == "Una. Dos."
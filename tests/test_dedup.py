@@ -0,0 +1,50 @@
+# tests/test_dedup.py
+from app.dedup import strip_repeated_lines
+
+_HEADER = "Sistema de Gestión Documental - Manual de Usuario"
+_STEP = "Haga clic en el botón Aceptar para continuar."
+
+def _page(n, body, total=6):
+    return "\n".join([_HEADER, f"Capítulo {n}: recepción de documentos"] + body + [f"Página {n} de {total}"])
+
+def _doc(total=6):
+    return [(n, _page(n, [f"Contenido propio de la página {n} con detalle.",
+                          f"Segundo párrafo de la página {n}, sin repetir.", _STEP,
+                          f"Otro párrafo distinto número {n} del manual.",
+                          f"Cierre de la sección de la página {n}."], total))
+            for n in range(1, total + 1)]
+
+def test_header_and_footer_kept_only_on_first_page():
+    out = list(strip_repeated_lines(_doc()))
+    assert [p for p, _ in out] == list(range(1, 7))
+    assert _HEADER in out[0][1] and "Página 1 de 6" in out[0][1]
+    for _, text in out[1:]:
+        assert _HEADER not in text and "Página" not in text
+
+def test_repeated_line_in_the_middle_of_the_page_is_kept():
+    for _, text in strip_repeated_lines(_doc()):
+        assert _STEP in text
+
+def test_edge_line_on_few_pages_is_kept():
+    pages = _doc(10)
+    pages[3] = (4, "Nota importante sobre la firma digital\n" + pages[3][1])
+    pages[7] = (8, "Nota importante sobre la firma digital\n" + pages[7][1])
+    out = dict(strip_repeated_lines(pages))
+    assert "Nota importante" in out[4] and "Nota importante" in out[8]
+
+def test_unpaged_chunks_pass_through_and_zero_disables():
+    pages = [(None, _HEADER), (None, _HEADER)] + _doc()
+    out = list(strip_repeated_lines(pages))
+    assert out[:2] == pages[:2]
+    assert list(strip_repeated_lines(pages, min_pages=0)) == pages
+
+def test_only_the_sample_is_held_before_streaming():
+    read = []
+    def pages():
+        for n, text in _doc(100):
+            read.append(n)
+            yield n, text
+    out = strip_repeated_lines(pages(), sample_pages=10)
+    assert next(out)[0] == 1 and len(read) == 10
+    rest = list(out)
+    assert len(read) == 100 and all(_HEADER not in t for _, t in rest)
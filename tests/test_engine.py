@@ -0,0 +1,44 @@
+# tests/test_engine.py
+import pytest
+
+from app import engine as eng, retrieval as r
+from app.answer_cache import ANSWER_CACHE
+from app.kbtable import KBTable
+
+_KB_ANSWER = "Ingrese a la opción olvidé mi contraseña del SCA y siga el enlace que llega a su correo."
+_KB_EMOTIONAL = "Tranquilo, es muy común. " + _KB_ANSWER
+
+# texto de manual largo: el resumen tiene que elegir oraciones
+_MANUAL = " ".join(
+    f"En la pantalla {i} del sistema de gestión documental el usuario revisa la contraseña, "
+    f"el formulario de acceso y la opción número {i} del menú principal." for i in range(1, 15))
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    (tmp_path / "manual.txt").write_text(_MANUAL, encoding="utf-8")
+    cols = {"pregunta": ["olvidé mi contraseña", "cómo derivo un documento"],
+            "intencion": ["acceso", "tramite"], "emocion": ["", ""],
+            "respuesta": [_KB_ANSWER, "Use la opción derivar de la bandeja."],
+            "respuesta_emocional": [_KB_EMOTIONAL, ""], "link": ["", ""]}
+    monkeypatch.setattr(r, "_DOC_INDEX", r._build_doc_index([str(tmp_path / "manual.txt")]))
+    monkeypatch.setattr(r, "_KB_INDEX", r._build_kb_index(KBTable.from_columns(cols)))
+    monkeypatch.setattr(eng, "init_indexes", lambda: None)
+    monkeypatch.setattr(eng, "detect_emotion", lambda q: ("neutral", {"model": "test"}))
+    ANSWER_CACHE.clear()
+    yield eng.ChatEngine(warmup=False, watch_docs=False, background=False)
+    ANSWER_CACHE.clear()
+
+def test_kb_answer_is_kept_verbatim_before_the_summary(engine):
+    res = engine.reply("olvidé mi contraseña", {})
+    assert res["route"] == "auto"
+    assert res["answer"].startswith(_KB_ANSWER)
+    assert "pantalla" in res["answer"]  # y después el resumen documental
+
+def test_emotional_kb_answer_on_the_auto_route(engine, monkeypatch):
+    monkeypatch.setattr(eng, "detect_emotion", lambda q: ("triste", {"model": "test"}))
+    res = engine.reply("olvidé mi contraseña", {})
+    assert _KB_EMOTIONAL in res["answer"]
+
+def test_stream_joins_to_the_reply(engine):
+    events = list(engine.reply_stream("olvidé mi contraseña", {}))
+    assert "".join(e["text"] for e in events if e["event"] == "delta") == events[-1]["result"]["answer"]
@@ -0,0 +1,59 @@
+# tests/test_index_compact.py
+import os
+
+import pytest
+
+from app import index_store as ix
+from app import retrieval as r
+
+_TEXTS = {
+    "mesa_partes.txt": "La mesa de partes recibe los documentos externos y los deriva al área. " * 20,
+    "firma.txt": "Para firmar un documento seleccione la opción firma digital y su certificado. " * 20,
+    "pide.txt": "La PIDE permite consultar datos de otras entidades desde el sistema de gestión. " * 20,
+}
+
+@pytest.fixture
+def compact(tmp_path, monkeypatch):
+    monkeypatch.setattr(r, "INDEX_COMPACT", True)
+    monkeypatch.setattr(ix, "INDEX_COMPACT", True)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name, text in _TEXTS.items():
+        (docs / name).write_text(text, encoding="utf-8")
+    paths = r._infer_doc_paths(str(docs))
+    cache = str(tmp_path / "cache")
+    live = ix.save_snapshot(ix.snapshot_key(), r._build_doc_index(paths), {"fp": None}, cache)
+
+    ingested = []
+    real = r._ingest_many
+    monkeypatch.setattr(r, "_ingest_many", lambda todo: ingested.extend(p for p, _ in todo) or real(todo))
+    return docs, paths, cache, live, ingested
+
+def test_live_index_keeps_no_segments(compact):
+    _, paths, cache, live, ingested = compact
+    assert live["segments"] == {}
+    assert sorted(live["files"]) == paths
+    assert os.path.isfile(os.path.join(cache, "segments.pkl"))
+    assert r._update_doc_index(live, paths) is live
+    assert ingested == []
+
+def test_update_reloads_segments_and_extracts_only_changed_file(compact):
+    docs, paths, cache, live, ingested = compact
+    (docs / "firma.txt").write_text("El certificado digital se renueva cada dos años. " * 20, encoding="utf-8")
+    for base in (live, ix.load_snapshot(ix.snapshot_key(), cache)[0]):
+        ingested.clear()
+        new = r._update_doc_index(base, paths)
+        assert ingested == [str(docs / "firma.txt")]
+        assert sorted(new["segments"]) == paths
+        text = " ".join(new["chunks"])
+        assert "renueva" in text and "mesa de partes" in text and "opcion firma digital" not in text
+
+def test_stale_segments_file_is_not_reused(compact):
+    docs, paths, cache, live, ingested = compact
+    # otro proceso reescribió segments.pkl con un contenido distinto de mesa_partes.txt
+    segments = ix.load_segments(live)
+    segments[str(docs / "mesa_partes.txt")]["fp"] = dict(segments[str(docs / "mesa_partes.txt")]["fp"], sha1="0" * 40)
+    ix._dump_atomic(segments, os.path.join(cache, "segments.pkl"))
+    (docs / "pide.txt").write_text("La PIDE se consulta con el DNI del ciudadano. " * 20, encoding="utf-8")
+    r._update_doc_index(live, paths)
+    assert sorted(ingested) == sorted([str(docs / "mesa_partes.txt"), str(docs / "pide.txt")])
@@ -0,0 +1,55 @@
+# tests/test_index_shared.py
+import pytest
+
+from app import retrieval as r
+from app.index_store import load_shared, save_shared, snapshot_key
+
+_TEXTS = {
+    "mesa_partes.txt": "La mesa de partes recibe los documentos externos y los deriva al área. " * 20,
+    "firma.txt": "Para firmar un documento seleccione la opción firma digital y su certificado. " * 20,
+    "pide.txt": "La PIDE permite consultar datos de otras entidades desde el sistema de gestión. " * 20,
+}
+
+@pytest.fixture
+def shared(tmp_path, monkeypatch):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for name, text in _TEXTS.items():
+        (docs / name).write_text(text, encoding="utf-8")
+    paths = r._infer_doc_paths(str(docs))
+    key = snapshot_key()
+    save_shared(key, r._build_doc_index(paths), {"fp": None}, str(tmp_path / "shared"))
+    doc_index, _ = load_shared(key, paths, None, str(tmp_path / "shared"))
+
+    ingested = []
+    real = r._ingest_many
+    monkeypatch.setattr(r, "_ingest_many", lambda todo: ingested.extend(p for p, _ in todo) or real(todo))
+    return docs, paths, doc_index, ingested
+
+def test_unchanged_shared_index_is_returned_as_is(shared):
+    _, paths, doc_index, ingested = shared
+    assert doc_index["segments"] == {}
+    assert r._update_doc_index(doc_index, paths) is doc_index
+    assert ingested == []
+
+def test_only_changed_file_is_extracted(shared):
+    docs, paths, doc_index, ingested = shared
+    (docs / "firma.txt").write_text("El certificado digital se renueva cada dos años. " * 20, encoding="utf-8")
+    new = r._update_doc_index(doc_index, paths)
+    assert new is not doc_index
+    assert ingested == [str(docs / "firma.txt")]
+    assert sorted(new["segments"]) == paths
+    text = " ".join(new["chunks"])
+    assert "renueva" in text and "mesa de partes" in text and "opcion firma digital" not in text
+
+def test_removed_file_drops_its_rows(shared):
+    docs, paths, doc_index, ingested = shared
+    new = r._update_doc_index(doc_index, paths[1:])
+    assert ingested == []
+    assert sorted(new["segments"]) == paths[1:]
+    assert "firma digital" not in " ".join(new["chunks"])
+
+def test_watcher_starts_from_indexed_signature(shared, monkeypatch):
+    docs, _, doc_index, _ = shared
+    monkeypatch.setattr(r, "_DOC_INDEX", doc_index)
+    assert r._indexed_signature() == r._dir_signature(str(docs))
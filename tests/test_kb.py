@@ -0,0 +1,29 @@
+# tests/test_kb.py
+from app import retrieval as r
+from app.kbtable import KBTable
+
+def _kb():
+    rows = [
+        ("como renuevo mi firma digital", "firma", "Solicite un nuevo certificado."),
+        ("olvide mi contraseña del sistema", "acceso", "Use la opción olvidé mi contraseña."),
+        ("como derivo un documento", "tramite", "Seleccione derivar en la bandeja."),
+    ]
+    cols = {f: [] for f in ("pregunta", "intencion", "emocion", "respuesta", "respuesta_emocional", "link")}
+    for q, lab, ans in rows:
+        for f, v in zip(cols, (q, lab, "", ans, "", "")):
+            cols[f].append(v)
+    return r._build_kb_index(KBTable.from_columns(cols))
+
+def test_no_score_gate_by_default():
+    hit = r._query_kb("quiero saber algo de la firma, gracias por todo y saludos cordiales", _kb())
+    assert hit is not None and hit["intencion"] == "firma"
+    assert hit["score"] < 0.25
+
+def test_min_score_when_configured():
+    kb = _kb()
+    q = "quiero saber algo de la firma, gracias por todo y saludos cordiales"
+    assert r._query_kb(q, kb, min_score=0.5) is None
+    assert r._query_kb("como renuevo mi firma digital", kb, min_score=0.5)["intencion"] == "firma"
+
+def test_unrelated_query_has_no_match():
+    assert r._query_kb("xyzzy", _kb()) is None
@@ -0,0 +1,123 @@
+# tests/test_ocr.py
+import shutil, sys, types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import document_reader as dr
+
+def _write_pdf(path):
+    """PDF mínimo de dos páginas: 1) texto digital, 2) solo una imagen (escaneada)."""
+    text = b"BT /F1 14 Tf 72 720 Td (Mesa de partes: recepcion de documentos externos) Tj ET"
+    draw = b"q 300 0 0 300 100 300 cm /Im0 Do Q"
+    pixels = bytes((x * 16 + y * 8) % 256 for y in range(16) for x in range(16))
+    objs = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R 4 0 R] /Count 2 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 5 0 R"
+        b" /Resources << /Font << /F1 7 0 R >> >> >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 6 0 R"
+        b" /Resources << /XObject << /Im0 8 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(text), text),
+        b"<< /Length %d >>\nstream\n%s\nendstream" % (len(draw), draw),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        b"<< /Type /XObject /Subtype /Image /Width 16 /Height 16 /ColorSpace /DeviceGray"
+        b" /BitsPerComponent 8 /Length %d >>\nstream\n%s\nendstream" % (len(pixels), pixels),
+    ]
+    path.write_bytes(_serialize(objs))
+    return str(path)
+
+def _write_text_pdf(path, texts):
+    """PDF con una página por texto (Helvetica); un texto de espacios es una página en blanco."""
+    n = len(texts)
+    kids = b" ".join(b"%d 0 R" % (4 + i) for i in range(n))
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, n),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    objs += [b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R"
+             b" /Resources << /Font << /F1 3 0 R >> >> >>" % (4 + n + i) for i in range(n)]
+    for t in texts:
+        body = b"BT /F1 14 Tf 72 720 Td (%s) Tj ET" % t.encode("latin-1")
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(body), body))
+    path.write_bytes(_serialize(objs))
+    return str(path)
+
+def _serialize(objs):
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for i, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % o for o in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
+
+@pytest.fixture
+def ocr(tmp_path, monkeypatch):
+    calls = []
+    def image_to_string(img, lang=None):
+        calls.append((img.size, lang))
+        return "Texto reconocido de la pagina escaneada"
+    monkeypatch.setitem(sys.modules, "pytesseract", types.SimpleNamespace(image_to_string=image_to_string))
+    monkeypatch.setattr(dr, "ProcessPoolExecutor", ThreadPoolExecutor)  # mismo proceso: se ve el fake
+    monkeypatch.setattr(dr, "OCR_ENABLED", True)
+    monkeypatch.setattr(dr, "OCR_CACHE_DIR", str(tmp_path / "ocr_cache"))
+    return calls
+
+def test_only_image_page_goes_to_ocr(tmp_path, ocr):
+    pdf = _write_pdf(tmp_path / "mixto.pdf")
+    pages = dict(dr.iter_pages(pdf))
+    assert sorted(pages) == [1, 2]
+    assert "Mesa de partes" in pages[1]
+    assert pages[2].strip() == "Texto reconocido de la pagina escaneada"
+    assert len(ocr) == 1 and ocr[0][1] == dr.OCR_LANG
+
+def test_second_run_reuses_hash_cache(tmp_path, ocr):
+    pdf = _write_pdf(tmp_path / "mixto.pdf")
+    first = list(dr.iter_pages(pdf))
+    assert len(ocr) == 1
+    assert list(dr.iter_pages(pdf)) == first
+    copy = shutil.copy(pdf, tmp_path / "renombrado.pdf")  # la clave es el contenido, no la ruta
+    assert list(dr.iter_pages(str(copy))) == first
+    assert len(ocr) == 1
+
+# ---- páginas en blanco y fallback a PyMuPDF ----
+@pytest.fixture
+def fitz_pages(monkeypatch):
+    """PyMuPDF falso: cada página devuelve el texto dado; anota si se abrió."""
+    opened, texts = [], []
+    class _Page:
+        def __init__(self, t):
+            self.t = t
+        def get_text(self, kind):
+            return self.t
+    class _Doc(list):
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+    def open_(path):
+        opened.append(path)
+        return _Doc(_Page(t) for t in texts)
+    monkeypatch.setitem(sys.modules, "fitz", types.SimpleNamespace(open=open_))
+    monkeypatch.setattr(dr, "OCR_ENABLED", False)
+    return opened, texts
+
+def test_blank_first_page_is_not_repeated(tmp_path, fitz_pages):
+    opened, _ = fitz_pages
+    pdf = _write_text_pdf(tmp_path / "blanco.pdf", ["   ", "Mesa de partes: recepcion de documentos"])
+    pages = list(dr.iter_pages(pdf))
+    assert [no for no, _ in pages] == [2]
+    assert "Mesa de partes" in pages[0][1]
+    assert opened == []
+
+def test_fallback_runs_once_when_pdfplumber_gets_nothing(tmp_path, fitz_pages, monkeypatch):
+    opened, texts = fitz_pages
+    texts += ["", "Texto que solo ve PyMuPDF"]
+    pdf = _write_text_pdf(tmp_path / "vacio.pdf", ["   ", "  "])
+    # algunos PDFs dan solo espacios o saltos en vez de "" para una página sin texto
+    real = dr._plumber_serial
+    monkeypatch.setattr(dr, "_plumber_serial", lambda path: ((no, t or " \n") for no, t in real(path)))
+    assert list(dr.iter_pages(pdf)) == [(2, "Texto que solo ve PyMuPDF\n")]
+    assert opened == [pdf]
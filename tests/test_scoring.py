@@ -0,0 +1,69 @@
+# tests/test_scoring.py
+"""top_k con postings y selección parcial == orden completo del coseno (el ranking que
+reemplazó): argsort estable invertido, con empates por fila mayor y relleno con las
+filas de puntaje 0."""
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+from app.scoring import build_postings, select_top_k, top_k
+
+def _full_sort(q, X, k):
+    return cosine_similarity(q, X).ravel().argsort(kind="stable")[::-1][:k]
+
+def _rand_matrix(rnd, n, v, density, levels=None):
+    X = sp.random(n, v, density=density, format="csr", random_state=rnd)
+    if levels:  # pocos valores distintos: muchos empates de puntaje
+        X.data = np.ceil(X.data * levels) / levels
+    return normalize(X)
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_matches_full_sort(seed):
+    rnd = np.random.RandomState(seed)
+    X = _rand_matrix(rnd, 60, 40, 0.08)
+    P = build_postings(X)
+    for _ in range(10):
+        q = _rand_matrix(rnd, 1, 40, 0.1)
+        for k in (1, 3, 10, 60):
+            assert top_k(q, P, k).tolist() == _full_sort(q, X, k).tolist()
+
+@pytest.mark.parametrize("seed", range(20))
+def test_top_k_with_many_ties(seed):
+    # empates "iguales" pueden diferir en el último bit según el orden de la suma
+    # (postings vs. producto denso): se exige la misma secuencia de puntajes
+    rnd = np.random.RandomState(seed)
+    X = _rand_matrix(rnd, 60, 40, 0.08, levels=2)
+    P = build_postings(X)
+    for _ in range(10):
+        q = _rand_matrix(rnd, 1, 40, 0.1, levels=2)
+        cos = cosine_similarity(q, X).ravel()
+        for k in (1, 3, 10, 60):
+            got = top_k(q, P, k)
+            assert len(set(got.tolist())) == len(got) == k
+            np.testing.assert_allclose(cos[got], cos[_full_sort(q, X, k)], atol=1e-12)
+
+def test_ties_prefer_higher_rows():
+    X = normalize(sp.csr_matrix(np.array([[1, 0], [1, 0], [0, 1], [1, 0]], dtype=float)))
+    q = sp.csr_matrix(np.array([[1.0, 0.0]]))
+    assert top_k(q, build_postings(X), 2).tolist() == [3, 1]
+    assert top_k(q, build_postings(X), 2).tolist() == _full_sort(q, X, 2).tolist()
+
+def test_k_larger_than_n():
+    rnd = np.random.RandomState(0)
+    X = _rand_matrix(rnd, 5, 10, 0.3)
+    q = _rand_matrix(rnd, 1, 10, 0.3)
+    out = top_k(q, build_postings(X), 50)
+    assert out.tolist() == _full_sort(q, X, 50).tolist()
+    assert len(out) == 5
+
+def test_empty_query_returns_rows_in_full_sort_order():
+    rnd = np.random.RandomState(1)
+    X = _rand_matrix(rnd, 8, 10, 0.3)
+    q = sp.csr_matrix((1, 10))
+    assert top_k(q, build_postings(X), 3).tolist() == _full_sort(q, X, 3).tolist() == [7, 6, 5]
+
+def test_select_top_k_edge_cases():
+    assert select_top_k(np.array([], dtype=np.int64), np.array([]), 0, 5).tolist() == []
+    assert select_top_k(np.array([2]), np.array([0.5]), 4, 0).tolist() == []
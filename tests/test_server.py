@@ -0,0 +1,57 @@
+# tests/test_server.py
+import asyncio
+
+import pytest
+
+from app.server import ChatServer
+
+class _Writer:
+    def __init__(self):
+        self.data, self.closed = b"", False
+    def write(self, b):
+        self.data += b
+    async def drain(self):
+        pass
+    def close(self):
+        self.closed = True
+
+def _request(raw: bytes) -> bytes:
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        writer = _Writer()
+        await ChatServer(engine=None, workers=1).handle(reader, writer)
+        assert writer.closed
+        return writer.data
+    return asyncio.run(run())
+
+@pytest.mark.parametrize("value", [b"abc", b"-5", b"1.5"])
+def test_bad_content_length_is_400(value):
+    out = _request(b"POST /chat HTTP/1.1\r\nContent-Length: " + value + b"\r\n\r\n{}")
+    assert out.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in out
+
+def test_valid_request_still_routed():
+    out = _request(b"GET /nada HTTP/1.1\r\nContent-Length: 0\r\nConnection: close\r\n\r\n")
+    assert out.startswith(b"HTTP/1.1 404 ")
+
+def _post(body: bytes) -> bytes:
+    return _request(b"POST /chat HTTP/1.1\r\nContent-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body)
+
+@pytest.mark.parametrize("body", [
+    b'{"text": "hola", "session": ["a"]}',
+    b'{"text": "hola", "session": {"id": 1}}',
+    b'{"text": null}',
+    b'{"text": 123}',
+    b'{"text": "   "}',
+    b'["hola"]',
+    b'{"text": ',
+])
+def test_bad_chat_payload_is_400(body):
+    assert _post(body).startswith(b"HTTP/1.1 400 ")
+
+def test_header_line_over_limit_is_400():
+    out = _request(b"POST /chat HTTP/1.1\r\nX-Relleno: " + b"a" * (1 << 17) + b"\r\n\r\n")
+    assert out.startswith(b"HTTP/1.1 400 ")
+    assert b"Connection: close" in out
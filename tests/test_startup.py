@@ -0,0 +1,51 @@
+# tests/test_startup.py
+import pickle, sys
+
+from app import startup
+from app.lazy import lazy_import
+
+def test_stage_records_packages_imported_during_it(monkeypatch):
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    with startup.stage("test_import_colorsys"):
+        import colorsys  # noqa: F401
+    assert "colorsys" in startup.report()["stages"]["test_import_colorsys"]["imports"]
+
+def test_module_imported_before_its_proxy_is_not_reported_as_deferred(monkeypatch):
+    monkeypatch.delitem(sys.modules, "fractions", raising=False)
+    proxy = lazy_import("fractions")
+    with startup.stage("test_unpickle"):  # como el snapshot: deserializar importa el módulo
+        pickle.loads(b"cfractions\nFraction\n.")
+    assert proxy.Fraction(1, 2) == 0.5
+    rep = startup.report()
+    assert "fractions" in rep["stages"]["test_unpickle"]["imports"]
+    assert "fractions" in rep["preloaded_imports"]
+
+def test_proxy_that_pays_the_import_is_deferred(monkeypatch):
+    monkeypatch.delitem(sys.modules, "calendar", raising=False)
+    assert lazy_import("calendar").isleap(2024)
+    rep = startup.report()
+    assert "calendar" in rep["deferred_imports"]
+    assert "calendar" not in rep["preloaded_imports"]
+
+def test_warm_start_does_not_import_sklearn(tmp_path):
+    import os, subprocess
+    from app import retrieval as r
+    from app.index_store import save_snapshot, snapshot_key
+    from app.kbtable import KBTable
+
+    (tmp_path / "manual.txt").write_text(" ".join(f"Paso {i}: la mesa de partes recibe el documento {i * 7}."
+                                                  for i in range(200)), encoding="utf-8")
+    cols = {"pregunta": ["olvidé mi contraseña", "cómo derivo un documento"], "intencion": ["acceso", "tramite"],
+            "emocion": ["", ""], "respuesta": ["Use la opción olvidé mi contraseña.", "Use derivar."],
+            "respuesta_emocional": ["", ""], "link": ["", ""]}
+    save_snapshot(snapshot_key(), r._build_doc_index([str(tmp_path / "manual.txt")]),
+                  r._build_kb_index(KBTable.from_columns(cols)), str(tmp_path))
+    code = ("import sys\n"
+            "from app.index_store import load_snapshot, snapshot_key\n"
+            f"doc, kb = load_snapshot(snapshot_key(), {str(tmp_path)!r})\n"
+            "assert doc['chunks'] and kb['vectorizer'] is not None\n"
+            "print(sorted({m.split('.')[0] for m in sys.modules} & {'sklearn'}))\n")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    assert out.stdout.strip().splitlines()[-1] == "[]"